@@ -233,11 +233,28 @@ async function saveTranscript(interviewId, role, text, timestamp) {
     );
     
     console.log(`💾 Saved ${role} transcript for interview ${interviewId}`);
+    
+    if (process.env.ML_LIVE_ANALYSIS === 'true') {
+      forwardLiveSegment(interviewId, role, text, timestamp);
+    }
   } catch (error) {
     console.error('❌ Error saving transcript:', error);
   }
 }
 
+// Send a final segment to the ML API so answers are scored while the interview runs
+// (fire-and-forget: the stored transcript remains the source of truth)
+function forwardLiveSegment(interviewId, role, text, timestamp) {
+  const ML_API_URL = process.env.ML_API_URL || 'http://localhost:8000';
+  fetch(`${ML_API_URL}/api/live/${encodeURIComponent(interviewId)}/segments`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ segments: [{ role, text, timestamp, isFinal: true }] })
+  }).catch((error) => {
+    console.error('⚠️ Live analysis segment not delivered:', error.message);
+  });
+}
+
 // Finalize interview and trigger ML analysis
 async function finalizeInterview(interviewId) {
   try {
@@ -3,20 +3,126 @@ AI-NEXUS ML API
 Post-interview analysis service using FastAPI
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import Dict, List, Optional
 import os
+import json
+import logging
 from dotenv import load_dotenv
-import pymongo
 import re
+from pymongo import ReturnDocument
+from contextlib import asynccontextmanager
 from services.analysis_service import AnalysisService
-from services.file_parser import parse_jd_file, parse_mock_transcript
+from services.llm_client import LLMClients
+from services.answer_cache import IdealAnswerCache
+from services.question_bank import QuestionBank
+from services.job_queue import AnalysisJobQueue, serialize_job
+from services.checkpoint_store import checkpoint_store_from_env
+from services.database import (
+    DATABASE_NAME, mongo_client_from_env, connect as connect_mongo, report_link, report_upsert
+)
+from services.batch_analysis import (
+    BatchAnalysisRunner, INTERVIEW_PROJECTION, analysis_inputs, serialize_batch
+)
+from services.live_analysis import LiveAnalysisManager, LiveAnalysisDisabled
+from services.completion_consumer import CompletedInterviewConsumer
+from services.file_parser import JDFileParser, FileTooLargeError, UploadSizeLimitMiddleware
+from services.transcript_parser import TranscriptParser, split_roles, upload_text_chunks
+from services.logging_config import configure_logging
+from services.metrics import trace_scope, stage, render_metrics
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger("ai_nexus.api")
+
+# Per-process resources. Each server worker creates its own in the lifespan (Mongo and
+# HTTP connection pools, caches and background tasks must not be shared across a fork).
+llm_clients: Optional[LLMClients] = None
+mongo_client = None
+db = None
+ideal_answer_cache: Optional[IdealAnswerCache] = None
+analysis_checkpoints = None
+question_bank: Optional[QuestionBank] = None
+analysis_service: Optional[AnalysisService] = None
+jd_parser: Optional[JDFileParser] = None
+live_analysis: Optional[LiveAnalysisManager] = None
+analysis_jobs: Optional[AnalysisJobQueue] = None
+completion_consumer: Optional[CompletedInterviewConsumer] = None
+batch_runner: Optional[BatchAnalysisRunner] = None
+
+# Stateless, safe to share
+transcript_parser = TranscriptParser.from_env()
+
+
+def create_resources():
+    """Build this process's clients, caches and services (no I/O; the lifespan connects them)"""
+    global llm_clients, mongo_client, db, ideal_answer_cache, analysis_checkpoints, question_bank
+    global analysis_service, jd_parser, live_analysis, analysis_jobs, completion_consumer, batch_runner
+
+    # LLM clients share one HTTP connection pool, opened on startup
+    llm_clients = LLMClients()
+
+    # MongoDB (async driver, pooled)
+    try:
+        mongo_client = mongo_client_from_env()
+        db = mongo_client[DATABASE_NAME]
+    except Exception as e:
+        logger.warning("MongoDB client configuration failed: %s", e)
+        mongo_client = None
+        db = None
+
+    ideal_answer_cache = IdealAnswerCache.from_env(db)
+    analysis_checkpoints = checkpoint_store_from_env(db)
+    question_bank = QuestionBank.from_env(db)
+    analysis_service = AnalysisService(llm_clients, ideal_answer_cache, analysis_checkpoints, question_bank)
+    jd_parser = JDFileParser.from_env()
+    live_analysis = LiveAnalysisManager.from_env(analysis_service, db)
 
-app = FastAPI(title="AI-NEXUS ML API", version="1.0.0")
+    analysis_jobs = AnalysisJobQueue.from_env(db.analysisjobs, run_interview_analysis) if db is not None else None
+    # Queues an analysis for every interview marked completed, even if /api/analyze is never called
+    completion_consumer = (
+        CompletedInterviewConsumer.from_env(db, analysis_jobs.enqueue) if analysis_jobs is not None else None
+    )
+    batch_runner = (
+        BatchAnalysisRunner.from_env(db, analysis_service, analysis_checkpoints) if db is not None else None
+    )
+
+
+async def close_resources():
+    await live_analysis.close()
+    await llm_clients.close()
+    jd_parser.close()
+    if mongo_client is not None:
+        mongo_client.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    create_resources()
+    app.state.mongodb_connected = db is not None and await connect_mongo(db)
+    if not app.state.mongodb_connected:
+        # Otherwise every lookup waits for the server selection timeout
+        question_bank.use_memory_store()
+    await llm_clients.start()
+    if analysis_jobs is not None:
+        await analysis_jobs.start()
+    if completion_consumer is not None and app.state.mongodb_connected:
+        completion_consumer.start()
+    yield
+    if completion_consumer is not None:
+        await completion_consumer.stop()
+    if batch_runner is not None:
+        await batch_runner.stop()
+    if analysis_jobs is not None:
+        # Let running analyses finish; unfinished ones stay queued for the next start
+        await analysis_jobs.stop(drain_seconds=float(os.getenv("ANALYSIS_DRAIN_SECONDS", "30")))
+    await close_resources()
+
+
+app = FastAPI(title="AI-NEXUS ML API", version="1.0.0", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -27,18 +133,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# MongoDB connection
-MONGODB_URI = os.getenv("MONGODB_URI", "mongodb://localhost:27017/ai-nexus")
-try:
-    client = pymongo.MongoClient(MONGODB_URI)
-    db = client["ai-nexus"]
-    print("✅ Connected to MongoDB")
-except Exception as e:
-    print(f"⚠️ MongoDB connection failed: {e}")
-    db = None
-
-# Initialize analysis service
-analysis_service = AnalysisService()
+# Oversized uploads are refused from their Content-Length, before the body is received
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=int(os.getenv("MAX_UPLOAD_BYTES", str(32 * 1024 * 1024)))
+)
 
 
 class AnalyzeRequest(BaseModel):
@@ -47,6 +146,24 @@ class AnalyzeRequest(BaseModel):
 class RealTimeIdealAnswerRequest(BaseModel):
     question: str
     jobDescription: str
+    bypassCache: bool = False
+
+class BatchAnalyzeRequest(BaseModel):
+    interviewIds: Optional[List[str]] = None
+    filter: Optional[Dict] = None    # Mongo filter on the interviews collection
+    limit: int = 0
+    dryRun: bool = False
+    resumeRunId: Optional[str] = None
+
+class TranscriptSegment(BaseModel):
+    role: str
+    text: str
+    timestamp: Optional[float] = None
+    isFinal: bool = True
+
+class LiveSegmentsRequest(BaseModel):
+    segments: List[TranscriptSegment]
+    jobDescription: Optional[str] = None
 
 
 @app.get("/")
@@ -58,24 +175,24 @@ def root():
 async def analyze_mock_interview(
     jobDescription: Optional[UploadFile] = File(None),
     jobDescriptionText: Optional[str] = Form(None),
-    mockTranscript: str = Form(...)
+    mockTranscript: Optional[str] = Form(None),
+    mockTranscriptFile: Optional[UploadFile] = File(None)
 ):
     """
     🎯 PRIORITY 2 SPIKE: Test endpoint for AI analysis pipeline
-    Accepts JD (file or text) and mock transcript, returns full analysis report
+    Accepts JD (file or text) and mock transcript (text or file), returns full analysis report
     """
     try:
-        print("\n" + "="*80)
-        print("🧠 Starting Mock Interview Analysis")
-        print("="*80)
-        
         # Extract Job Description
         jd_text = ""
         if jobDescription:
-            print(f"📄 Processing JD file: {jobDescription.filename}")
-            jd_text = await parse_jd_file(jobDescription)
+            try:
+                jd_text = await jd_parser.parse(jobDescription)
+            except FileTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         elif jobDescriptionText:
-            print("📄 Using JD text")
             jd_text = jobDescriptionText
         else:
             raise HTTPException(status_code=400, detail="Job Description is required (file or text)")
@@ -83,13 +200,22 @@ async def analyze_mock_interview(
         if not jd_text.strip():
             raise HTTPException(status_code=400, detail="Job Description cannot be empty")
         
-        print(f"✅ JD loaded ({len(jd_text)} characters)")
-        
-        # Parse mock transcript
-        print("📝 Parsing mock transcript...")
-        hr_transcript, candidate_transcript = parse_mock_transcript(mockTranscript)
-        print(f"✅ HR transcript: {len(hr_transcript)} chars")
-        print(f"✅ Candidate transcript: {len(candidate_transcript)} chars")
+        # Parse mock transcript into ordered speaker turns
+        if mockTranscriptFile:
+            turns = [turn async for turn in transcript_parser.parse_chunks(upload_text_chunks(mockTranscriptFile))]
+        elif mockTranscript:
+            turns = transcript_parser.parse(mockTranscript)
+        else:
+            raise HTTPException(status_code=400, detail="Mock transcript is required (text or file)")
+        hr_transcript, candidate_transcript = split_roles(turns)
+        # Labeled turns keep their boundaries and are paired locally
+        labeled = any(turn["speaker"] for turn in turns)
+        logger.info("Starting mock interview analysis", extra={
+            "jdChars": len(jd_text),
+            "turns": len(turns),
+            "hrChars": len(hr_transcript),
+            "candidateChars": len(candidate_transcript)
+        })
         
         # Run analysis pipeline
         interview_id = f"mock-{os.urandom(4).hex()}"
@@ -99,85 +225,159 @@ async def analyze_mock_interview(
             candidate_transcript=candidate_transcript,
             job_description=jd_text,
             candidate_id="mock-candidate",
-            hr_id="mock-hr"
+            hr_id="mock-hr",
+            resume=False,
+            utterances=turns if labeled else None
         )
         
-        print("="*80)
-        print("✅ Analysis Complete!")
-        print("="*80 + "\n")
-        
         return report
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error in mock analysis: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error in mock analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/analyze")
-async def analyze_interview(request: AnalyzeRequest):
+async def run_interview_analysis(interview_id: str, progress_callback=None) -> Dict:
     """
-    Main analysis endpoint triggered after interview ends.
-    Performs:
+    Full analysis for a stored interview (run by the job queue workers):
     1. Fetch transcripts and JD from MongoDB
     2. Q&A Pairing using LLM
     3. Generate Ideal Answers
     4. Score and generate feedback
-    5. Save report to MongoDB
+    5. Save report to MongoDB and set Interview.reportId
+    """
+    # One trace covers fetch, analysis and save so the report timings include the fetch
+    with trace_scope():
+        return await _run_interview_analysis(interview_id, progress_callback)
+
+
+async def _run_interview_analysis(interview_id: str, progress_callback) -> Dict:
+    # Fetch interview data (only the fields the pipeline reads)
+    with stage("fetch"):
+        interview = await db.interviews.find_one({"interviewId": interview_id}, INTERVIEW_PROJECTION)
+    if not interview:
+        raise ValueError(f"Interview {interview_id} not found")
+    
+    # Pairs already scored while the interview was running, if this process followed it live
+    inputs = analysis_inputs(interview)
+    live_pairs = await live_analysis.finish(interview_id, len(inputs["utterances"]))
+    
+    # Run analysis pipeline
+    report = await analysis_service.analyze_interview(
+        **inputs,
+        progress_callback=progress_callback,
+        live_pairs=live_pairs
+    )
+    
+    # Save report to MongoDB (one report per interview: reruns replace it)
+    with stage("save"):
+        saved = await db.interviewreports.find_one_and_update(
+            *report_upsert(report),
+            upsert=True,
+            projection={"_id": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        # The backend finds the report through the interview
+        await db.interviews.update_one(*report_link(interview_id, saved["_id"]))
+        await analysis_checkpoints.clear(interview_id)
+    
+    return {"reportId": str(saved["_id"]), "overallScore": report["overallScore"]}
+
+
+@app.post("/api/analyze")
+async def analyze_interview(request: AnalyzeRequest):
+    """
+    Main analysis endpoint triggered after interview ends.
+    Queues the analysis and returns a job id immediately; when the job completes the
+    report is saved and Interview.reportId points to it. Poll /api/jobs/{jobId} for
+    progress and the result. Duplicate submissions for the same interview return the
+    existing job, and unknown interviews are rejected with 404 before queuing.
     """
     try:
         interview_id = request.interviewId
         
-        if not db:
+        if analysis_jobs is None:
             raise HTTPException(status_code=500, detail="MongoDB not connected")
         
-        # Fetch interview data
-        interview = db.interviews.find_one({"interviewId": interview_id})
+        interview = await db.interviews.find_one({"interviewId": interview_id}, {"_id": 1})
         if not interview:
             raise HTTPException(status_code=404, detail="Interview not found")
         
-        # Extract transcripts
-        hr_transcript = " ".join([
-            t["text"] for t in interview.get("transcripts", [])
-            if t.get("role") == "hr" and t.get("isFinal")
-        ])
+        job = await analysis_jobs.enqueue(interview_id)
         
-        candidate_transcript = " ".join([
-            t["text"] for t in interview.get("transcripts", [])
-            if t.get("role") == "candidate" and t.get("isFinal")
-        ])
-        
-        # Get JD
-        jd = interview.get("jobDescription", {}).get("text", "")
-        if not jd and interview.get("jobDescription", {}).get("fileUrl"):
-            # In production, read from file storage
-            jd = "Job description from file"
-        
-        # Run analysis pipeline
-        report = await analysis_service.analyze_interview(
-            interview_id=interview_id,
-            hr_transcript=hr_transcript,
-            candidate_transcript=candidate_transcript,
-            job_description=jd,
-            candidate_id=str(interview["candidateId"]),
-            hr_id=str(interview["hrId"])
-        )
-        
-        # Save report to MongoDB
-        db.interviewreports.insert_one(report)
-        
-        return {"success": True, "reportId": str(report.get("_id", ""))}
+        return {"success": True, "jobId": job["_id"], "status": job["status"]}
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in analysis: {str(e)}")
+        logger.exception("Error in analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """Status, progress and result of a queued analysis job"""
+    if analysis_jobs is None:
+        raise HTTPException(status_code=500, detail="MongoDB not connected")
+    
+    job = await analysis_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return serialize_job(job)
+
+
+@app.post("/api/analyze-batch")
+async def analyze_batch(request: BatchAnalyzeRequest):
+    """
+    Re-analyze many stored interviews (e.g. after a rubric or model change).
+    Select them by interviewIds and/or a Mongo filter. dryRun returns what would be
+    analyzed; otherwise the run starts in the background: poll /api/analyze-batch/{runId}.
+    resumeRunId continues an interrupted run, skipping interviews it already reported.
+    """
+    if batch_runner is None:
+        raise HTTPException(status_code=500, detail="MongoDB not connected")
+    
+    try:
+        if request.resumeRunId:
+            run = await batch_runner.get(request.resumeRunId)
+            if not run:
+                raise HTTPException(status_code=404, detail="Batch run not found")
+            if batch_runner.is_running(run["_id"]):
+                raise HTTPException(status_code=409, detail="Batch run is already running")
+            if request.dryRun:
+                return await batch_runner.plan(
+                    run.get("interviewIds"),
+                    serialize_batch(run)["filter"],
+                    run.get("limit", 0),
+                    resume_run_id=run["_id"]
+                )
+        elif request.dryRun:
+            return await batch_runner.plan(request.interviewIds, request.filter, request.limit)
+        else:
+            run = await batch_runner.create(request.interviewIds, request.filter, request.limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    batch_runner.start(run["_id"])
+    return {"success": True, "runId": run["_id"], "status": "running"}
+
+
+@app.get("/api/analyze-batch/{run_id}")
+async def get_batch_run(run_id: str):
+    """Status and counts of a batch analysis run"""
+    if batch_runner is None:
+        raise HTTPException(status_code=500, detail="MongoDB not connected")
+    
+    run = await batch_runner.get(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Batch run not found")
+    
+    return serialize_batch(run)
+
+
 @app.post("/api/generate-ideal-answer")
 async def generate_ideal_answer_realtime(request: RealTimeIdealAnswerRequest):
     """
@@ -185,11 +385,13 @@ async def generate_ideal_answer_realtime(request: RealTimeIdealAnswerRequest):
     Called immediately when HR asks a question during live interview.
     """
     try:
-        print(f"🧠 Generating ideal answer for question: {request.question[:50]}...")
+        logger.info("Generating ideal answer", extra={"question": request.question[:50]})
         
         ideal_answer = await analysis_service.generate_ideal_answer(
             request.question,
-            request.jobDescription
+            request.jobDescription,
+            use_cache=not request.bypassCache,
+            hedge=True
         )
         
         return {
@@ -199,12 +401,42 @@ async def generate_ideal_answer_realtime(request: RealTimeIdealAnswerRequest):
         }
         
     except Exception as e:
-        print(f"❌ Error generating ideal answer: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error generating ideal answer: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/generate-ideal-answer/stream")
+async def stream_ideal_answer_realtime(request: RealTimeIdealAnswerRequest):
+    """
+    Streaming variant of /api/generate-ideal-answer (Server-Sent Events).
+    Emits "token" events as the answer is generated and a final "done" event
+    carrying the complete answer, so the live UI can render immediately and still save it.
+    """
+    logger.info("Streaming ideal answer", extra={"question": request.question[:50]})
+    
+    async def events():
+        try:
+            async for kind, text in analysis_service.stream_ideal_answer(
+                request.question,
+                request.jobDescription,
+                use_cache=not request.bypassCache
+            ):
+                if kind == "token":
+                    payload = {"text": text}
+                else:
+                    payload = {"question": request.question, "idealAnswer": text}
+                yield f"event: {kind}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            logger.exception("Error streaming ideal answer: %s", e)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.post("/api/score-answer-realtime")
 async def score_answer_realtime(
     question: str = Form(...),
@@ -217,13 +449,14 @@ async def score_answer_realtime(
     Called when candidate finishes answering a question.
     """
     try:
-        print(f"📊 Scoring answer for question: {question[:50]}...")
+        logger.info("Scoring answer", extra={"question": question[:50]})
         
         scoring_result = await analysis_service.score_answer(
             question,
             candidateAnswer,
             idealAnswer,
-            jobDescription
+            jobDescription,
+            hedge=True
         )
         
         return {
@@ -235,15 +468,95 @@ async def score_answer_realtime(
         }
         
     except Exception as e:
-        print(f"❌ Error scoring answer: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error scoring answer: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/live/{interview_id}/segments")
+async def append_live_segments(interview_id: str, request: LiveSegmentsRequest):
+    """
+    Append transcript segments while the interview is running.
+    Completed question/answer pairs are scored in the background;
+    returns the rolling report.
+    """
+    try:
+        return await live_analysis.append(
+            interview_id, [segment.dict() for segment in request.segments], request.jobDescription
+        )
+    except LiveAnalysisDisabled as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@app.get("/api/live/{interview_id}")
+def get_live_report(interview_id: str):
+    """Rolling report of an interview in progress"""
+    report = live_analysis.report(interview_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="No live session for this interview")
+    return report
+
+
+@app.websocket("/api/live/{interview_id}/ws")
+async def live_segments_socket(websocket: WebSocket, interview_id: str):
+    """Same as the append endpoint over one connection: each message is a segment or a list of segments"""
+    if not live_analysis.enabled:
+        await websocket.close(code=1013)  # try again later
+        return
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = live_segments_message(await websocket.receive_text())
+            except ValueError as e:
+                # Malformed message: report it and keep the connection
+                await websocket.send_json({"error": str(e)})
+                continue
+            await websocket.send_json(await live_analysis.append(
+                interview_id, [segment.dict() for segment in request.segments], request.jobDescription
+            ))
+    except WebSocketDisconnect:
+        pass
+
+
+def live_segments_message(text: str) -> LiveSegmentsRequest:
+    """Validate a websocket message: {segments, jobDescription}, one segment, or a list of segments"""
+    try:
+        message = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if isinstance(message, list):
+        message = {"segments": message}
+    elif isinstance(message, dict) and "segments" not in message:
+        message = {"segments": [message]}
+    elif not isinstance(message, dict):
+        raise ValueError("Expected a segment, a list of segments or an object with segments")
+    try:
+        return LiveSegmentsRequest.model_validate(message)
+    except ValidationError as e:
+        raise ValueError(f"Invalid segments: {e.errors(include_url=False)}")
+
+
 @app.get("/api/health")
 def health():
-    return {"status": "healthy", "mongodb": "connected" if db else "disconnected"}
+    return {
+        "status": "healthy",
+        "mongodb": "connected" if getattr(app.state, "mongodb_connected", False) else "disconnected",
+        "idealAnswerCache": ideal_answer_cache.stats(),
+        "questionBank": question_bank.stats()
+    }
+
+
+@app.get("/api/prescoring/calibration")
+def prescoring_calibration():
+    """Local pre-scores vs LLM scores for the answers this process has scored"""
+    return analysis_service.prescorer.calibration_report()
+
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus scrape endpoint: LLM latency, tokens, retries, cache hits and stage timings"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 if __name__ == "__main__":
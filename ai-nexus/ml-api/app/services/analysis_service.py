@@ -6,18 +6,79 @@ Handles the full post-interview analysis pipeline
 import os
 import json
 import re
-from typing import Dict, List
-from openai import OpenAI
-from anthropic import Anthropic
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from services.llm_client import LLMClients
+from services.llm_router import LLMRouter
+from services.answer_cache import IdealAnswerCache, make_cache_key
+from services.question_bank import QuestionBank, canonicalize_question, token_similarity
+from services.checkpoint_store import analysis_fingerprint, empty_checkpoint
+from services.qa_pairing import segment_utterances, chunk_transcripts, merge_window_pairs
+from services.tokens import estimate_tokens
+from services.jd_context import JDContext
+from services.prescoring import AnswerPreScorer
+from services.metrics import trace_scope, stage, record_analysis, record_prescore
 
-# Initialize LLM clients
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-anthropic_client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")) if os.getenv("ANTHROPIC_API_KEY") else None
+logger = logging.getLogger(__name__)
+
+# Bump when the ideal answer prompt changes so cached answers are not reused
+IDEAL_ANSWER_PROMPT_VERSION = "v2"
+
+SCORING_CRITERIA = """Scoring Criteria:
+- 9-10: Excellent - Covers all key points, demonstrates deep understanding
+- 7-8: Good - Covers most key points, shows solid understanding
+- 5-6: Average - Covers some key points, basic understanding
+- 3-4: Below Average - Missing key points, limited understanding
+- 0-2: Poor - Does not address the question or job requirements"""
+
+
+# progress_callback(stage, completed, total)
+ProgressCallback = Callable[[str, int, int], Awaitable[None]]
+
+# Raw JD text, or one already prepared for section selection
+JobDescription = Union[str, JDContext]
 
 
 class AnalysisService:
-    def __init__(self):
-        self.llm_provider = os.getenv("LLM_PROVIDER", "openai")  # or "anthropic"
+    def __init__(
+        self,
+        llm_clients: LLMClients,
+        ideal_answer_cache: Optional[IdealAnswerCache] = None,
+        checkpoints=None,
+        question_bank: Optional[QuestionBank] = None
+    ):
+        self.llm_clients = llm_clients
+        # Ordered provider/model targets with failover (LLM_TARGETS, else LLM_PROVIDER)
+        self.llm_router = LLMRouter.from_env(llm_clients)
+        self.ideal_answer_cache = ideal_answer_cache
+        self.checkpoints = checkpoints
+        # Canonical questions per JD, so wording variants reuse one ideal answer
+        self.question_bank = question_bank
+        self.pipeline_mode = os.getenv("ANALYSIS_PIPELINE_MODE", "concurrent")  # or "sequential"
+        # Caps how many LLM calls this service has in flight at once
+        self.max_concurrent_llm_calls = max(1, int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "5")))
+        self._llm_semaphore = asyncio.Semaphore(self.max_concurrent_llm_calls)
+        self.scoring_mode = os.getenv("ANALYSIS_SCORING_MODE", "single")  # or "batch"
+        # Max prompt tokens packed into one batch scoring request
+        self.batch_scoring_token_budget = int(os.getenv("BATCH_SCORING_TOKEN_BUDGET", "6000"))
+        # Build the report from Q&A pairs already scored during the live interview
+        self.reuse_realtime_pairs = os.getenv("ANALYSIS_REUSE_REALTIME_PAIRS", "true").lower() == "true"
+        # "timestamp" pairs time-ordered utterances locally; "llm" sends whole transcripts to the LLM
+        self.pairing_mode = os.getenv("ANALYSIS_PAIRING_MODE", "timestamp")
+        # Transcripts above this size are paired in overlapping windows (0 disables chunking)
+        self.pairing_chunk_tokens = int(os.getenv("PAIRING_CHUNK_TOKENS", "3000"))
+        self.pairing_chunk_overlap_tokens = int(os.getenv("PAIRING_CHUNK_OVERLAP_TOKENS", "300"))
+        # JD sections sent per prompt: the most relevant ones, up to these token budgets
+        self.jd_context_top_k = int(os.getenv("JD_CONTEXT_TOP_K", "4"))
+        self.jd_ideal_answer_tokens = int(os.getenv("JD_IDEAL_ANSWER_TOKENS", "500"))
+        self.jd_scoring_tokens = int(os.getenv("JD_SCORING_TOKENS", "250"))
+        self.jd_summary_tokens = int(os.getenv("JD_SUMMARY_TOKENS", "250"))
+        # Local similarity scoring of clear-cut answers (PRESCORE_MODE: off, hybrid or offline)
+        self.prescorer = AnswerPreScorer.from_env()
+        # Prepared JDs by text, so real-time calls for the same JD skip re-indexing
+        self._jd_contexts: "OrderedDict[str, JDContext]" = OrderedDict()
     
     async def analyze_interview(
         self,
@@ -26,7 +87,12 @@ class AnalysisService:
         candidate_transcript: str,
         job_description: str,
         candidate_id: str = "mock-candidate",
-        hr_id: str = "mock-hr"
+        hr_id: str = "mock-hr",
+        progress_callback: Optional[ProgressCallback] = None,
+        resume: bool = True,
+        realtime_pairs: Optional[List[Dict]] = None,
+        utterances: Optional[List[Dict]] = None,
+        live_pairs: Optional[List[Dict]] = None
     ) -> Dict:
         """
         Main analysis pipeline:
@@ -34,63 +100,153 @@ class AnalysisService:
         2. Generate Ideal Answers
         3. Score and Generate Feedback
         4. Create Report
+        
+        With a checkpoint store configured (and resume=True), the pairs, each finished
+        qaBreakdown entry and each summary are saved as they complete, and a rerun for
+        the same interview and inputs only computes what is missing.
+        
+        realtime_pairs are the Interview document's qaPairs from the live endpoints.
+        When reuse is enabled, those with an answer are matched to the transcript pairs:
+        fully scored ones go straight into the report and partial ones only get their
+        missing ideal answer or score. Transcript pairs the live UI missed are analyzed
+        as usual. live_pairs (same shape, from the live incremental analysis, which sees
+        every transcript segment) replace pairing entirely.
+        
+        utterances are the individual {role, text, timestamp} transcript entries; with
+        timestamp pairing they are paired locally instead of via the transcript prompt.
+        
+        The report carries a "timings" breakdown (stage durations, LLM calls, tokens,
+        retries and cache hits) for this analysis.
         """
         
-        print(f"🔍 Starting analysis for interview {interview_id}")
+        logger.info("Starting analysis", extra={"interviewId": interview_id})
         
-        # Step 1: Q&A Pairing
-        print("📝 Step 1: Pairing questions and answers...")
-        qa_pairs = await self.pair_questions_and_answers(
-            hr_transcript, candidate_transcript
+        with trace_scope() as trace:
+            try:
+                report = await self._analyze(
+                    interview_id, hr_transcript, candidate_transcript, job_description,
+                    candidate_id, hr_id, progress_callback, resume, live_pairs,
+                    realtime_pairs if self.reuse_realtime_pairs and not live_pairs else None, utterances
+                )
+            except Exception:
+                record_analysis(False)
+                raise
+            record_analysis(True)
+            report["timings"] = trace.summary()
+        
+        logger.info("Analysis complete", extra={
+            "interviewId": interview_id,
+            "overallScore": report["overallScore"],
+            "totalMs": report["timings"]["totalMs"],
+            "llmCalls": report["timings"]["llmCalls"]
+        })
+        return report
+    
+    async def _analyze(
+        self,
+        interview_id: str,
+        hr_transcript: str,
+        candidate_transcript: str,
+        job_description: str,
+        candidate_id: str,
+        hr_id: str,
+        progress_callback: Optional[ProgressCallback],
+        resume: bool,
+        live_pairs: Optional[List[Dict]],
+        realtime_pairs: Optional[List[Dict]],
+        utterances: Optional[List[Dict]]
+    ) -> Dict:
+        reused_pairs, reused_entries = [], {}
+        if live_pairs:
+            reused_pairs, reused_entries = self._pairs_from_realtime(live_pairs)
+        # Only answered pairs are matched against the transcript; they are part of the inputs
+        answered_pairs = [
+            pair for pair in realtime_pairs or []
+            if isinstance(pair, dict) and pair.get("question") and pair.get("candidateAnswer")
+        ]
+        
+        checkpoints = self.checkpoints if resume else None
+        fingerprint = analysis_fingerprint(
+            hr_transcript, candidate_transcript, job_description,
+            json.dumps(reused_pairs or answered_pairs, default=str)
         )
-        print(f"✅ Found {len(qa_pairs)} Q&A pairs")
+        checkpoint = empty_checkpoint()
+        if checkpoints is not None:
+            try:
+                checkpoint = await checkpoints.load(interview_id, fingerprint)
+            except Exception as e:
+                logger.warning("Could not load checkpoint: %s", e, extra={"interviewId": interview_id})
+        
+        # Step 1: Q&A Pairing
+        if reused_pairs:
+            qa_pairs = reused_pairs
+            checkpoint["entries"] = {**checkpoint["entries"], **reused_entries}
+            logger.info("Reusing live Q&A pairs", extra={
+                "interviewId": interview_id, "pairs": len(qa_pairs), "alreadyScored": len(reused_entries)
+            })
+        elif checkpoint["qaPairs"]:
+            qa_pairs = checkpoint["qaPairs"]
+            logger.info("Resuming from checkpoint", extra={
+                "interviewId": interview_id, "pairs": len(qa_pairs), "alreadyScored": len(checkpoint["entries"])
+            })
+        else:
+            await self._report_progress(progress_callback, "pairing", 0, 0)
+            with stage("pairing"):
+                if utterances and self.pairing_mode == "timestamp":
+                    qa_pairs = await self.pair_utterances(utterances)
+                else:
+                    qa_pairs = await self.pair_questions_and_answers(
+                        hr_transcript, candidate_transcript
+                    )
+            logger.info("Paired questions and answers", extra={"interviewId": interview_id, "pairs": len(qa_pairs)})
+            if qa_pairs:
+                await self._save_checkpoint(checkpoints, "save_pairs", interview_id, fingerprint, qa_pairs)
+        
+        if answered_pairs:
+            # The checkpoint keeps the transcript pairs; merging is deterministic, so entry indexes stay valid
+            qa_pairs, realtime_entries = self._merge_realtime_pairs(qa_pairs, answered_pairs)
+            checkpoint["entries"] = {**checkpoint["entries"], **realtime_entries}
+            logger.info("Reusing real-time Q&A pairs", extra={
+                "interviewId": interview_id, "pairs": len(qa_pairs), "alreadyScored": len(realtime_entries)
+            })
+        
+        # Sectioned and indexed once; every prompt below selects from it
+        jd_context = self.prepare_job_description(job_description)
         
         # Step 2 & 3: For each Q&A, generate ideal answer and score
-        qa_breakdown = []
-        total_score = 0
+        async def save_entry(index: int, entry: Dict):
+            await self._save_checkpoint(checkpoints, "save_entry", interview_id, fingerprint, index, entry)
         
-        for idx, qa in enumerate(qa_pairs, 1):
-            print(f"🔄 Processing Q&A {idx}/{len(qa_pairs)}...")
-            
-            # Generate ideal answer
-            print(f"  → Generating ideal answer...")
-            ideal_answer = await self.generate_ideal_answer(
-                qa["question"], job_description
-            )
-            
-            # Score and generate feedback
-            print(f"  → Scoring answer...")
-            scoring_result = await self.score_answer(
-                qa["question"],
-                qa["answer"],
-                ideal_answer,
-                job_description
+        with stage("scoring"):
+            qa_breakdown = await self._score_qa_pairs(
+                qa_pairs,
+                jd_context,
+                progress_callback,
+                completed_entries=checkpoint["entries"],
+                entry_callback=save_entry
             )
-            
-            qa_breakdown.append({
-                "question": qa["question"],
-                "candidateAnswer": qa["answer"],
-                "idealAnswer": ideal_answer,
-                "score": scoring_result["score"],
-                "justification": scoring_result["justification"]
-            })
-            
-            total_score += scoring_result["score"]
-            print(f"  ✅ Score: {scoring_result['score']}/10")
+        
+        total_score = sum(qa["score"] for qa in qa_breakdown)
         
         # Calculate overall score (0-100)
         overall_score = (total_score / len(qa_breakdown) * 10) if qa_breakdown else 0
-        print(f"📊 Overall Score: {overall_score:.2f}/100")
         
-        # Generate summaries
-        print("📄 Generating summaries...")
-        ai_summary_hr = await self.generate_hr_summary(
-            qa_breakdown, job_description, overall_score
-        )
+        # Generate summaries (independent of each other, so run them together)
+        await self._report_progress(progress_callback, "summaries", len(qa_breakdown), len(qa_breakdown))
+        summaries = checkpoint["summaries"]
         
-        ai_summary_candidate = await self.generate_candidate_summary(
-            qa_breakdown, overall_score
-        )
+        async def summary(kind: str, generate) -> str:
+            if kind in summaries:
+                return summaries[kind]
+            text = await generate()
+            await self._save_checkpoint(checkpoints, "save_summary", interview_id, fingerprint, kind, text)
+            return text
+        
+        with stage("summaries"):
+            ai_summary_hr, ai_summary_candidate = await asyncio.gather(
+                summary("hr", lambda: self.generate_hr_summary(qa_breakdown, jd_context, overall_score)),
+                summary("candidate", lambda: self.generate_candidate_summary(qa_breakdown, overall_score))
+            )
         
         # Create report
         report = {
@@ -105,13 +261,326 @@ class AnalysisService:
             "jobDescription": job_description
         }
         
-        print("✅ Analysis complete!")
         return report
     
+    @staticmethod
+    def _pairs_from_realtime(realtime_pairs: List[Dict]):
+        """
+        Convert Interview.qaPairs into pipeline pairs plus the entries that are already complete.
+        Returns (qa_pairs, {index: qaBreakdown entry}).
+        """
+        
+        qa_pairs, completed = [], {}
+        for pair in realtime_pairs:
+            if not pair.get("question"):
+                continue
+            qa = {"question": pair["question"], "answer": pair.get("candidateAnswer") or ""}
+            if pair.get("idealAnswer"):
+                qa["idealAnswer"] = pair["idealAnswer"]
+            
+            if qa["answer"] and qa.get("idealAnswer") and pair.get("score") is not None:
+                completed[len(qa_pairs)] = {
+                    "question": qa["question"],
+                    "candidateAnswer": qa["answer"],
+                    "idealAnswer": qa["idealAnswer"],
+                    "score": pair["score"],
+                    "justification": pair.get("justification") or "No justification provided"
+                }
+            qa_pairs.append(qa)
+        return qa_pairs, completed
+    
+    @classmethod
+    def _merge_realtime_pairs(cls, transcript_pairs: List[Dict], realtime_pairs: List[Dict]):
+        """
+        Overlay answered Interview.qaPairs on the transcript pairs, matching questions by
+        canonical form (then by word overlap). The live UI can miss questions, so the
+        transcript decides which questions are in the report; answered real-time pairs it
+        did not find are appended. Returns (qa_pairs, {index: qaBreakdown entry}).
+        """
+        
+        keys = [canonicalize_question(pair.get("question") or "") for pair in transcript_pairs]
+        matched: Dict[int, Dict] = {}
+        unmatched = []
+        for pair in realtime_pairs:
+            key = canonicalize_question(pair["question"])
+            idx = next((i for i, k in enumerate(keys) if k == key and i not in matched), None)
+            if idx is None:
+                unmatched.append((key, pair))
+            else:
+                matched[idx] = pair
+        leftover = []
+        for key, pair in unmatched:
+            candidates = [
+                (token_similarity(key, k), i) for i, k in enumerate(keys)
+                if i not in matched and token_similarity(key, k) >= 0.6
+            ]
+            if candidates:
+                matched[max(candidates)[1]] = pair
+            else:
+                leftover.append(pair)
+        
+        merged = [
+            matched.get(idx) or {"question": qa.get("question", ""), "candidateAnswer": qa.get("answer", "")}
+            for idx, qa in enumerate(transcript_pairs)
+        ]
+        return cls._pairs_from_realtime(merged + leftover)
+    
+    @staticmethod
+    async def _save_checkpoint(checkpoints, method: str, *args):
+        if checkpoints is None:
+            return
+        try:
+            await getattr(checkpoints, method)(*args)
+        except Exception as e:
+            # A lost checkpoint only costs a recompute on retry
+            logger.warning("Checkpoint %s failed: %s", method, e)
+    
+    @staticmethod
+    async def _report_progress(
+        progress_callback: Optional[ProgressCallback], stage: str, completed: int, total: int
+    ):
+        if progress_callback is None:
+            return
+        try:
+            await progress_callback(stage, completed, total)
+        except Exception as e:
+            # Progress reporting must never fail the analysis itself
+            logger.warning("Progress update failed: %s", e)
+    
+    async def _score_qa_pairs(
+        self,
+        qa_pairs: List[Dict],
+        job_description: JobDescription,
+        progress_callback: Optional[ProgressCallback] = None,
+        completed_entries: Optional[Dict[int, Dict]] = None,
+        entry_callback: Optional[Callable[[int, Dict], Awaitable[None]]] = None
+    ) -> List[Dict]:
+        """
+        Generate ideal answers and scores for all pairs, keeping their order.
+        Pairs whose index is in completed_entries are reused as-is;
+        entry_callback(index, entry) is awaited as each remaining pair finishes.
+        """
+        
+        total = len(qa_pairs)
+        results: Dict[int, Dict] = {
+            idx: entry for idx, entry in (completed_entries or {}).items() if idx < total
+        }
+        pending = [idx for idx in range(total) if idx not in results]
+        await self._report_progress(progress_callback, "scoring", len(results), total)
+        
+        async def finish(idx: int, entry: Dict):
+            results[idx] = entry
+            if entry_callback is not None:
+                await entry_callback(idx, entry)
+            await self._report_progress(progress_callback, "scoring", len(results), total)
+        
+        async def process(idx: int):
+            entry = await self._process_qa_pair(qa_pairs[idx], job_description, idx + 1, total)
+            await finish(idx, entry)
+        
+        if self.prescorer.enabled:
+            await self._score_with_prescoring(qa_pairs, pending, job_description, finish)
+        
+        elif self.scoring_mode == "batch":
+            ideal_answers = await asyncio.gather(*[
+                self._ideal_answer_for(qa_pairs[idx], job_description)
+                for idx in pending
+            ])
+            scoring_results = await self.score_answers_batch([
+                {
+                    "question": qa_pairs[idx]["question"],
+                    "candidateAnswer": qa_pairs[idx]["answer"],
+                    "idealAnswer": ideal
+                }
+                for idx, ideal in zip(pending, ideal_answers)
+            ], job_description)
+            for idx, ideal, result in zip(pending, ideal_answers, scoring_results):
+                await finish(idx, self._build_qa_entry(qa_pairs[idx], ideal, result))
+        
+        elif self.pipeline_mode == "sequential":
+            for idx in pending:
+                await process(idx)
+        
+        else:
+            # Each pair runs as its own task. Let every task finish (and checkpoint)
+            # before surfacing the first failure, so a retry has less to redo.
+            outcomes = await asyncio.gather(
+                *[process(idx) for idx in pending], return_exceptions=True
+            )
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+        
+        return [results[idx] for idx in range(total)]
+    
+    async def _score_with_prescoring(
+        self,
+        qa_pairs: List[Dict],
+        pending: List[int],
+        job_description: JobDescription,
+        finish: Callable[[int, Dict], Awaitable[None]]
+    ):
+        """
+        Generate the ideal answers, pre-score every answer locally in one pass, and send
+        only the ambiguous ones (plus calibration samples) to the LLM for scoring.
+        """
+        
+        ideal_answers = await asyncio.gather(*[
+            self._ideal_answer_for(qa_pairs[idx], job_description)
+            for idx in pending
+        ])
+        items = [
+            {
+                "question": qa_pairs[idx]["question"],
+                "candidateAnswer": qa_pairs[idx]["answer"],
+                "idealAnswer": ideal
+            }
+            for idx, ideal in zip(pending, ideal_answers)
+        ]
+        prescores = self.prescorer.score(items, [
+            self._jd_excerpt(job_description, item["question"], self.jd_scoring_tokens) for item in items
+        ])
+        
+        llm_positions = []
+        for position, prescore in enumerate(prescores):
+            sampled = self.prescorer.should_sample(prescore)
+            record_prescore(prescore.band, local=prescore.score is not None and not sampled)
+            if prescore.score is None or sampled:
+                llm_positions.append(position)
+                continue
+            idx = pending[position]
+            await finish(idx, self._build_qa_entry(qa_pairs[idx], ideal_answers[position], {
+                "score": prescore.score, "justification": prescore.justification
+            }))
+        logger.info("Pre-scored answers", extra={
+            "answers": len(items), "sentToLLM": len(llm_positions)
+        })
+        if not llm_positions:
+            return
+        
+        async def complete(position: int, result: Dict):
+            self.prescorer.record(prescores[position], result["score"])
+            idx = pending[position]
+            await finish(idx, self._build_qa_entry(qa_pairs[idx], ideal_answers[position], result))
+        
+        async def score_one(position: int):
+            item = items[position]
+            await complete(position, await self.score_answer(
+                item["question"], item["candidateAnswer"], item["idealAnswer"], job_description
+            ))
+        
+        if self.scoring_mode == "batch":
+            scoring_results = await self.score_answers_batch(
+                [items[position] for position in llm_positions], job_description
+            )
+            for position, result in zip(llm_positions, scoring_results):
+                await complete(position, result)
+        elif self.pipeline_mode == "sequential":
+            for position in llm_positions:
+                await score_one(position)
+        else:
+            outcomes = await asyncio.gather(
+                *[score_one(position) for position in llm_positions], return_exceptions=True
+            )
+            for outcome in outcomes:
+                if isinstance(outcome, BaseException):
+                    raise outcome
+    
+    @staticmethod
+    def _build_qa_entry(qa: Dict, ideal_answer: str, scoring_result: Dict) -> Dict:
+        return {
+            "question": qa["question"],
+            "candidateAnswer": qa["answer"],
+            "idealAnswer": ideal_answer,
+            "score": scoring_result["score"],
+            "justification": scoring_result["justification"]
+        }
+    
+    async def _process_qa_pair(
+        self, qa: Dict, job_description: JobDescription, idx: int, total: int
+    ) -> Dict:
+        """Generate the ideal answer for one Q&A pair, then score it"""
+        
+        logger.debug("Processing Q&A %d/%d", idx, total)
+        
+        ideal_answer = await self._ideal_answer_for(qa, job_description)
+        
+        scoring_result = await self.score_answer(
+            qa["question"],
+            qa["answer"],
+            ideal_answer,
+            job_description
+        )
+        logger.debug("Scored Q&A %d/%d: %s/10", idx, total, scoring_result["score"])
+        
+        return self._build_qa_entry(qa, ideal_answer, scoring_result)
+    
+    async def score_qa_pair(self, question: str, answer: str, job_description: JobDescription) -> Dict:
+        """Ideal answer and score for one pair, as a qaBreakdown entry (live analysis)"""
+        return await self._process_qa_pair({"question": question, "answer": answer}, job_description, 1, 1)
+    
+    async def _ideal_answer_for(self, qa: Dict, job_description: JobDescription) -> str:
+        """Ideal answer already attached to the pair (e.g. from real time), else a generated one"""
+        if qa.get("idealAnswer"):
+            return qa["idealAnswer"]
+        return await self.generate_ideal_answer(qa["question"], job_description)
+    
+    async def pair_utterances(self, utterances: List[Dict]) -> List[Dict]:
+        """
+        Pair time-ordered utterances locally (consecutive HR turns = question,
+        following candidate turns = answer). Only ambiguous stretches go to the LLM.
+        """
+        
+        segments = segment_utterances(utterances)
+        ambiguous = [
+            seg for seg in segments
+            if seg["type"] == "ambiguous" and seg["hr"] and seg["candidate"]
+        ]
+        local_pairs = sum(1 for seg in segments if seg["type"] == "pair")
+        logger.info("Paired utterances", extra={"localPairs": local_pairs, "ambiguousSegments": len(ambiguous)})
+        
+        resolved = await asyncio.gather(*[
+            self.pair_questions_and_answers(seg["hr"], seg["candidate"]) for seg in ambiguous
+        ])
+        resolved_by_segment = {id(seg): pairs for seg, pairs in zip(ambiguous, resolved)}
+        
+        qa_pairs = []
+        for seg in segments:
+            if seg["type"] == "pair":
+                qa_pairs.append({"question": seg["question"], "answer": seg["answer"]})
+            else:
+                qa_pairs.extend(resolved_by_segment.get(id(seg), []))
+        return qa_pairs
+    
     async def pair_questions_and_answers(
         self, hr_transcript: str, candidate_transcript: str
     ) -> List[Dict]:
-        """Extract Q&A pairs from transcripts using LLM"""
+        """
+        Extract Q&A pairs from transcripts using LLM.
+        Long transcripts are split into overlapping token-budgeted windows that are
+        extracted concurrently; pairs repeated across window edges are merged.
+        """
+        
+        windows = chunk_transcripts(
+            hr_transcript,
+            candidate_transcript,
+            self.pairing_chunk_tokens,
+            self.pairing_chunk_overlap_tokens
+        )
+        if len(windows) == 1:
+            return await self._extract_qa_pairs(*windows[0])
+        
+        logger.info("Transcript split into windows for Q&A extraction", extra={"windows": len(windows)})
+        window_pairs = await asyncio.gather(*[
+            self._extract_qa_pairs(hr_window, candidate_window)
+            for hr_window, candidate_window in windows
+        ])
+        return merge_window_pairs(window_pairs)
+    
+    async def _extract_qa_pairs(
+        self, hr_transcript: str, candidate_transcript: str
+    ) -> List[Dict]:
+        """Single LLM extraction call over (a window of) the transcripts"""
         
         prompt = f"""You are an expert at analyzing interview transcripts. Extract all question-answer pairs from the following interview.
 
@@ -134,9 +603,17 @@ Format:
 
 Return the JSON array now:"""
         
-        response = await self._call_llm(prompt, require_json=True)
-        
-        # Parse JSON response
+        qa_pairs = await self._call_llm_json(prompt, "pairing", self._parse_qa_pairs)
+        # Fallback: return empty list
+        return qa_pairs if qa_pairs is not None else []
+    
+    @staticmethod
+    def _parse_qa_pairs(response: str) -> Optional[List[Dict]]:
+        """
+        Parse the pairing response, or None if it is not a JSON array. Items are
+        normalized to {question, answer} strings; items without a question are dropped
+        so one malformed item does not fail the whole report.
+        """
         try:
             # Try to extract JSON from response
             json_match = re.search(r'\[.*\]', response, re.DOTALL)
@@ -149,22 +626,140 @@ Return the JSON array now:"""
             if not isinstance(qa_pairs, list):
                 raise ValueError("Response is not a list")
             
-            return qa_pairs
+            valid = [
+                {"question": str(pair["question"]).strip(), "answer": str(pair.get("answer") or "").strip()}
+                for pair in qa_pairs
+                if isinstance(pair, dict) and pair.get("question") and str(pair["question"]).strip()
+            ]
+            if qa_pairs and not valid:
+                raise ValueError("No item has a question")
+            if len(valid) < len(qa_pairs):
+                logger.warning("Dropped malformed Q&A pairs", extra={"dropped": len(qa_pairs) - len(valid)})
+            return valid
         except (json.JSONDecodeError, ValueError) as e:
-            print(f"⚠️ Error parsing Q&A pairs: {e}")
-            print(f"Response: {response[:500]}")
-            # Fallback: return empty list or sample
-            return []
+            logger.warning("Error parsing Q&A pairs: %s", e, extra={"response": response[:500]})
+            return None
     
     async def generate_ideal_answer(
-        self, question: str, job_description: str
+        self, question: str, job_description: JobDescription, use_cache: bool = True, hedge: bool = False
     ) -> str:
-        """Generate ideal answer based on question and JD"""
+        """
+        Generate ideal answer based on question and JD.
+        hedge=True (real-time callers) races a second provider when the first is slow.
+        """
+        
+        cache_key = self._ideal_answer_cache_key(question, job_description) if use_cache else None
+        if cache_key is not None:
+            cached = await self.ideal_answer_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        banked = await self._banked_ideal_answer(question, job_description) if use_cache else None
+        if banked is not None:
+            if cache_key is not None:
+                await self.ideal_answer_cache.set(cache_key, banked)
+            return banked
         
-        prompt = f"""Based on the following job description and interview question, generate an ideal answer that a top candidate would give.
+        response, model = await self._call_llm_with_model(
+            self._ideal_answer_prompt(question, job_description), task="ideal_answer", hedge=hedge
+        )
+        ideal_answer = response.strip()
+        
+        await self._store_ideal_answer(cache_key, question, job_description, ideal_answer, model)
+        return ideal_answer
+    
+    async def stream_ideal_answer(
+        self, question: str, job_description: JobDescription, use_cache: bool = True
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Stream an ideal answer as it is generated.
+        Yields ("token", text) chunks, then one ("done", full_answer) event.
+        A cached answer is returned as a single "done" event.
+        """
+        
+        cache_key = self._ideal_answer_cache_key(question, job_description) if use_cache else None
+        if cache_key is not None:
+            cached = await self.ideal_answer_cache.get(cache_key)
+            if cached is not None:
+                yield "done", cached
+                return
+        banked = await self._banked_ideal_answer(question, job_description) if use_cache else None
+        if banked is not None:
+            yield "done", banked
+            return
+        
+        prompt = self._ideal_answer_prompt(question, job_description)
+        parts = []
+        model = None
+        async with self._llm_semaphore:
+            async for text, model in self.llm_router.stream_with_model(prompt, task="ideal_answer"):
+                parts.append(text)
+                yield "token", text
+        
+        ideal_answer = "".join(parts).strip()
+        await self._store_ideal_answer(cache_key, question, job_description, ideal_answer, model)
+        yield "done", ideal_answer
+    
+    def _ideal_answer_cache_key(self, question: str, job_description: JobDescription) -> Optional[str]:
+        if self.ideal_answer_cache is None:
+            return None
+        return make_cache_key(
+            question, str(job_description), self._model_name(), IDEAL_ANSWER_PROMPT_VERSION
+        )
+    
+    async def _banked_ideal_answer(self, question: str, job_description: JobDescription) -> Optional[str]:
+        """Ideal answer of a near-duplicate question already asked for this JD"""
+        if self.question_bank is None:
+            return None
+        return await self.question_bank.get_ideal_answer(
+            question, str(job_description), self._model_name(), IDEAL_ANSWER_PROMPT_VERSION
+        )
+    
+    async def _store_ideal_answer(
+        self,
+        cache_key: Optional[str],
+        question: str,
+        job_description: JobDescription,
+        ideal_answer: str,
+        model: Optional[str]
+    ):
+        if not ideal_answer:
+            return
+        if model != self._model_name():
+            # A fallback target answered: its answer must not be served as the primary model's
+            logger.info("Not caching ideal answer from fallback model", extra={"model": model})
+            return
+        if cache_key is not None:
+            await self.ideal_answer_cache.set(cache_key, ideal_answer)
+        if self.question_bank is not None:
+            await self.question_bank.add_ideal_answer(
+                question, str(job_description), ideal_answer, self._model_name(), IDEAL_ANSWER_PROMPT_VERSION
+            )
+    
+    def prepare_job_description(self, job_description: JobDescription) -> JDContext:
+        """Split and index a JD for section selection (kept for the most recent JDs)"""
+        if isinstance(job_description, JDContext):
+            return job_description
+        context = self._jd_contexts.get(job_description)
+        if context is None:
+            context = JDContext(job_description)
+            self._jd_contexts[job_description] = context
+            while len(self._jd_contexts) > 32:
+                self._jd_contexts.popitem(last=False)
+        else:
+            self._jd_contexts.move_to_end(job_description)
+        return context
+    
+    def _jd_excerpt(self, job_description: JobDescription, query: str, max_tokens: int) -> str:
+        """JD sections most relevant to query, within max_tokens"""
+        return self.prepare_job_description(job_description).select(
+            query, max_tokens, self.jd_context_top_k
+        )
+    
+    def _ideal_answer_prompt(self, question: str, job_description: JobDescription) -> str:
+        return f"""Based on the following job description and interview question, generate an ideal answer that a top candidate would give.
 
 Job Description:
-{job_description[:2000]}
+{self._jd_excerpt(job_description, question, self.jd_ideal_answer_tokens)}
 
 Question:
 {question}
@@ -176,16 +771,14 @@ Generate a comprehensive, well-structured ideal answer that:
 4. Is clear, concise, and professional (2-3 paragraphs max)
 
 Ideal Answer:"""
-        
-        response = await self._call_llm(prompt)
-        return response.strip()
     
     async def score_answer(
         self,
         question: str,
         candidate_answer: str,
         ideal_answer: str,
-        job_description: str
+        job_description: JobDescription,
+        hedge: bool = False
     ) -> Dict:
         """Score candidate answer against ideal answer and JD"""
         
@@ -200,23 +793,26 @@ Ideal Answer:
 {ideal_answer}
 
 Job Description:
-{job_description[:1000]}
+{self._jd_excerpt(job_description, question, self.jd_scoring_tokens)}
 
-Scoring Criteria:
-- 9-10: Excellent - Covers all key points, demonstrates deep understanding
-- 7-8: Good - Covers most key points, shows solid understanding
-- 5-6: Average - Covers some key points, basic understanding
-- 3-4: Below Average - Missing key points, limited understanding
-- 0-2: Poor - Does not address the question or job requirements
+{SCORING_CRITERIA}
 
 Return ONLY a valid JSON object with this exact format:
 {{"score": 8, "justification": "Brief explanation of the score (2-3 sentences)"}}
 
 JSON:"""
         
-        response = await self._call_llm(prompt, require_json=True)
-        
-        # Parse JSON
+        result = await self._call_llm_json(prompt, "scoring", self._parse_score, hedge=hedge)
+        if result is None:
+            return {
+                "score": 5,
+                "justification": "Error parsing score - default score assigned"
+            }
+        return result
+    
+    @classmethod
+    def _parse_score(cls, response: str) -> Optional[Dict]:
+        """Parse a {score, justification} response, or None if it is invalid"""
         try:
             json_match = re.search(r'\{.*\}', response, re.DOTALL)
             if json_match:
@@ -224,23 +820,143 @@ JSON:"""
             else:
                 result = json.loads(response)
             
-            # Validate score is 0-10
-            score = int(result.get("score", 0))
-            score = max(0, min(10, score))  # Clamp to 0-10
-            
-            return {
-                "score": score,
-                "justification": result.get("justification", "No justification provided")
-            }
-        except (json.JSONDecodeError, ValueError, KeyError) as e:
-            print(f"⚠️ Error parsing score: {e}")
-            return {
-                "score": 5,
-                "justification": "Error parsing score - default score assigned"
-            }
+            return cls._validate_score(result)
+        except (json.JSONDecodeError, ValueError, KeyError, TypeError, AttributeError) as e:
+            logger.warning("Error parsing score: %s", e)
+            return None
+    
+    @staticmethod
+    def _validate_score(result: Dict) -> Dict:
+        """Validate a parsed {score, justification} object, clamping score to 0-10"""
+        
+        score = int(result.get("score", 0))
+        score = max(0, min(10, score))  # Clamp to 0-10
+        
+        return {
+            "score": score,
+            "justification": result.get("justification", "No justification provided")
+        }
+    
+    async def score_answers_batch(
+        self, items: List[Dict], job_description: JobDescription
+    ) -> List[Dict]:
+        """
+        Score many (question, candidateAnswer, idealAnswer) items with as few LLM calls as possible.
+        Items are packed into requests up to the token budget; items whose result
+        is missing or invalid are retried individually with score_answer.
+        """
+        
+        if not items:
+            return []
+        
+        # The JD excerpt is selected per batch, so budget for the largest one
+        preamble_tokens = self.jd_scoring_tokens + estimate_tokens(SCORING_CRITERIA) + 150
+        batches: List[List[int]] = [[]]
+        batch_tokens = preamble_tokens
+        for idx, item in enumerate(items):
+            item_tokens = estimate_tokens(
+                item["question"] + item["candidateAnswer"] + item["idealAnswer"]
+            ) + 20
+            if batches[-1] and batch_tokens + item_tokens > self.batch_scoring_token_budget:
+                batches.append([])
+                batch_tokens = preamble_tokens
+            batches[-1].append(idx)
+            batch_tokens += item_tokens
+        
+        logger.info("Batch scoring", extra={"answers": len(items), "requests": len(batches)})
+        
+        batch_results = await asyncio.gather(*[
+            self._score_batch([items[i] for i in batch], job_description)
+            for batch in batches
+        ])
+        
+        results: List[Optional[Dict]] = [None] * len(items)
+        for batch, scored in zip(batches, batch_results):
+            for idx, result in zip(batch, scored):
+                results[idx] = result
+        
+        failed = [idx for idx, result in enumerate(results) if result is None]
+        if failed:
+            logger.warning("Retrying %d answer(s) individually", len(failed))
+            retried = await asyncio.gather(*[
+                self.score_answer(
+                    items[idx]["question"],
+                    items[idx]["candidateAnswer"],
+                    items[idx]["idealAnswer"],
+                    job_description
+                )
+                for idx in failed
+            ])
+            for idx, result in zip(failed, retried):
+                results[idx] = result
+        
+        return results
+    
+    async def _score_batch(
+        self, items: List[Dict], job_description: JobDescription
+    ) -> List[Optional[Dict]]:
+        """Score one packed batch; returns None for items that failed validation"""
+        
+        answers = "\n\n".join([
+            f"""### Item {idx}
+Question: {item["question"]}
+
+Candidate Answer:
+{item["candidateAnswer"]}
+
+Ideal Answer:
+{item["idealAnswer"]}"""
+            for idx, item in enumerate(items)
+        ])
+        questions = "\n".join(item["question"] for item in items)
+        
+        prompt = f"""Score each candidate answer below on a scale of 0-10, comparing it to its ideal answer and the job description requirements.
+
+Job Description:
+{self._jd_excerpt(job_description, questions, self.jd_scoring_tokens)}
+
+{SCORING_CRITERIA}
+
+{answers}
+
+Return ONLY a valid JSON object with one entry per item, in this exact format:
+{{"scores": [{{"item": 0, "score": 8, "justification": "Brief explanation of the score (2-3 sentences)"}}]}}
+
+JSON:"""
+        
+        results: List[Optional[Dict]] = [None] * len(items)
+        try:
+            entries = await self._call_llm_json(prompt, "batch_scoring", self._parse_batch_scores)
+        except Exception as e:
+            logger.warning("Error in batch scoring: %s", e)
+            return results
+        if entries is None:
+            return results
+        
+        for position, entry in enumerate(entries):
+            try:
+                idx = int(entry.get("item", position))
+                if 0 <= idx < len(items) and results[idx] is None and "score" in entry:
+                    results[idx] = self._validate_score(entry)
+            except (ValueError, TypeError, AttributeError):
+                continue
+        
+        return results
+    
+    @staticmethod
+    def _parse_batch_scores(response: str) -> Optional[List]:
+        """Score entries of a batch response, or None if it is not valid JSON"""
+        try:
+            json_match = re.search(r'[\[{].*[\]}]', response, re.DOTALL)
+            parsed = json.loads(json_match.group() if json_match else response)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning("Error parsing batch scores: %s", e)
+            return None
+        entries = parsed.get("scores") if isinstance(parsed, dict) else parsed
+        return entries if isinstance(entries, list) else None
     
     async def generate_hr_summary(
-        self, qa_breakdown: List[Dict], job_description: str, overall_score: float
+        self, qa_breakdown: List[Dict], job_description: JobDescription, overall_score: float
     ) -> str:
         """Generate summary for HR"""
         
@@ -248,6 +964,7 @@ JSON:"""
             f"Q: {qa['question']}\nA: {qa['candidateAnswer'][:200]}... (Score: {qa['score']}/10)"
             for qa in qa_breakdown[:5]  # Limit to first 5 for prompt size
         ])
+        questions = "\n".join(qa["question"] for qa in qa_breakdown)
         
         prompt = f"""Generate a concise, professional summary for HR about the candidate's interview performance.
 
@@ -257,7 +974,7 @@ Key Q&A Performance:
 {qa_summary}
 
 Job Description:
-{job_description[:1000]}
+{self._jd_excerpt(job_description, questions, self.jd_summary_tokens)}
 
 Provide a 2-3 paragraph assessment covering:
 1. Overall fit for the role
@@ -267,7 +984,7 @@ Provide a 2-3 paragraph assessment covering:
 
 Summary:"""
         
-        response = await self._call_llm(prompt)
+        response = await self._call_llm(prompt, task="hr_summary")
         return response.strip()
     
     async def generate_candidate_summary(
@@ -297,32 +1014,63 @@ Use a supportive, encouraging tone. Be specific about what they can improve.
 
 Summary:"""
         
-        response = await self._call_llm(prompt)
+        response = await self._call_llm(prompt, task="candidate_summary")
         return response.strip()
     
-    async def _call_llm(self, prompt: str, require_json: bool = False) -> str:
-        """Call LLM (OpenAI or Anthropic)"""
+    def _model_name(self) -> str:
+        """Model generating ideal answers (part of cache keys)"""
+        return self.llm_router.primary_model("ideal_answer")
+    
+    async def _call_llm_json(self, prompt: str, task: str, parse, hedge: bool = False):
+        """
+        JSON call whose response must pass parse() (None = invalid). If the task runs
+        on a cheaper model than the default targets, an invalid response is retried
+        once on the default targets.
+        """
+        
+        result = parse(await self._call_llm(prompt, require_json=True, task=task, hedge=hedge))
+        if result is None and self.llm_router.can_escalate(task):
+            logger.warning("Invalid JSON response, escalating to the default model", extra={"task": task})
+            result = parse(await self._call_llm(prompt, require_json=True, task=task, escalate=True))
+        return result
+    
+    async def _call_llm(
+        self,
+        prompt: str,
+        require_json: bool = False,
+        task: str = "other",
+        hedge: bool = False,
+        escalate: bool = False
+    ) -> str:
+        """Call LLM (OpenAI or Anthropic); task selects the model profile and labels metrics"""
+        
+        async with self._llm_semaphore:
+            return await self._call_provider(prompt, require_json, task, hedge, escalate)
+    
+    async def _call_llm_with_model(self, prompt: str, task: str = "other", hedge: bool = False) -> Tuple[str, str]:
+        """_call_llm(), also returning the "provider:model" that answered"""
+        
+        async with self._llm_semaphore:
+            try:
+                return await self.llm_router.complete_with_model(prompt, task=task, hedge=hedge)
+            except Exception as e:
+                logger.error("LLM API error: %s", e, extra={"task": task})
+                raise
+    
+    async def _call_provider(
+        self,
+        prompt: str,
+        require_json: bool = False,
+        task: str = "other",
+        hedge: bool = False,
+        escalate: bool = False
+    ) -> str:
+        """Send a single prompt through the router (failover across the task's targets)"""
         
         try:
-            if self.llm_provider == "openai":
-                response = openai_client.chat.completions.create(
-                    model=os.getenv("OPENAI_MODEL", "gpt-4"),
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7,
-                    response_format={"type": "json_object"} if require_json else None
-                )
-                return response.choices[0].message.content
-            else:
-                # Anthropic
-                if not anthropic_client:
-                    raise ValueError("Anthropic API key not configured")
-                
-                message = anthropic_client.messages.create(
-                    model=os.getenv("ANTHROPIC_MODEL", "claude-3-opus-20240229"),
-                    max_tokens=2000,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return message.content[0].text
+            return await self.llm_router.complete(
+                prompt, require_json=require_json, task=task, hedge=hedge, escalate=escalate
+            )
         except Exception as e:
-            print(f"❌ LLM API error: {e}")
+            logger.error("LLM API error: %s", e, extra={"task": task})
             raise
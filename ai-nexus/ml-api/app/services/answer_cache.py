@@ -0,0 +1,212 @@
+"""
+Ideal Answer Cache
+Content-addressed cache for generated ideal answers:
+bounded in-process LRU with TTL, plus an optional persistent tier (SQLite or MongoDB)
+"""
+
+import os
+import re
+import time
+import hashlib
+import asyncio
+import sqlite3
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from services.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, collapse whitespace and strip trailing punctuation"""
+    text = re.sub(r'\s+', ' ', question.strip().lower())
+    return text.rstrip(' ?.!')
+
+
+def make_cache_key(question: str, job_description: str, model: str, prompt_version: str) -> str:
+    """Hash of (normalized question, JD text, model, prompt version)"""
+    digest = hashlib.sha256()
+    for part in (normalize_question(question), job_description.strip(), model, prompt_version):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+class SQLiteCacheStore:
+    """Persistent tier backed by a local SQLite file (shared by workers on one host)"""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ideal_answers "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _get(self, key: str) -> Optional[Tuple[str, float]]:
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM ideal_answers WHERE key = ?", (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0], row[1]
+
+    def _set(self, key: str, value: str, expires_at: float):
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO ideal_answers (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, value: str, expires_at: float):
+        await asyncio.to_thread(self._set, key, value, expires_at)
+
+
+class MongoCacheStore:
+    """Persistent tier backed by a MongoDB collection (shared across hosts)"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            # MongoDB removes expired entries on its own via the TTL index
+            await self.collection.create_index("expiresAt", expireAfterSeconds=0)
+            self._indexes_ready = True
+
+    async def get(self, key: str) -> Optional[Tuple[str, float]]:
+        doc = await self.collection.find_one({"_id": key}, {"value": 1, "expiresAt": 1})
+        if not doc:
+            return None
+        expires_at = doc["expiresAt"].replace(tzinfo=timezone.utc).timestamp()
+        if expires_at < time.time():
+            return None
+        return doc["value"], expires_at
+
+    async def set(self, key: str, value: str, expires_at: float):
+        await self._ensure_indexes()
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"value": value, "expiresAt": datetime.fromtimestamp(expires_at, tz=timezone.utc)}},
+            upsert=True
+        )
+
+
+class IdealAnswerCache:
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 7 * 24 * 3600,
+        store=None,
+        enabled: bool = True
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, db=None) -> "IdealAnswerCache":
+        """Build the cache from IDEAL_ANSWER_CACHE_* environment variables"""
+        backend = os.getenv("IDEAL_ANSWER_CACHE_BACKEND", "memory")  # memory, sqlite or mongo
+        store = None
+        try:
+            if backend == "sqlite":
+                store = SQLiteCacheStore(os.getenv("IDEAL_ANSWER_CACHE_PATH", "ideal_answer_cache.sqlite"))
+            elif backend == "mongo" and db is not None:
+                store = MongoCacheStore(db.idealanswercache)
+        except Exception as e:
+            logger.warning("Ideal answer cache store unavailable, using memory only: %s", e)
+
+        return cls(
+            max_entries=int(os.getenv("IDEAL_ANSWER_CACHE_SIZE", "1000")),
+            ttl_seconds=float(os.getenv("IDEAL_ANSWER_CACHE_TTL", str(7 * 24 * 3600))),
+            store=store,
+            enabled=os.getenv("IDEAL_ANSWER_CACHE_ENABLED", "true").lower() == "true"
+        )
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[1] >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache_lookup("ideal_answer", True)
+                return entry[0]
+            del self._entries[key]
+
+        if self.store is not None:
+            try:
+                stored = await self.store.get(key)
+            except Exception as e:
+                logger.warning("Ideal answer cache read failed: %s", e)
+                stored = None
+            if stored is not None:
+                self._remember(key, *stored)
+                self.hits += 1
+                self.persistent_hits += 1
+                record_cache_lookup("ideal_answer", True)
+                return stored[0]
+
+        self.misses += 1
+        record_cache_lookup("ideal_answer", False)
+        return None
+
+    async def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+
+        if self.store is not None:
+            try:
+                await self.store.set(key, value, expires_at)
+            except Exception as e:
+                logger.warning("Ideal answer cache write failed: %s", e)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.store).__name__ if self.store else "memory",
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "persistentHits": self.persistent_hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
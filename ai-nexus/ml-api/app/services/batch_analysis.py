@@ -0,0 +1,381 @@
+"""
+Batch Analysis
+Re-analyzes many stored interviews in one run (e.g. after a rubric or model change).
+Interviews are read through a single batched cursor with a projection, analyzed with
+bounded concurrency, and reports are written with bulk upserts keyed on interviewId.
+Runs are recorded in the analysisbatches collection so they can be resumed.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from services.database import report_link, report_upsert
+
+logger = logging.getLogger(__name__)
+
+# Only the fields the analysis pipeline reads
+INTERVIEW_PROJECTION = {
+    "_id": 0,
+    "interviewId": 1,
+    "candidateId": 1,
+    "hrId": 1,
+    "jobDescription": 1,
+    "transcripts": 1,
+    "qaPairs": 1
+}
+
+MAX_RECORDED_ERRORS = 100
+
+
+def _date(value):
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Invalid date in filter: {value!r}")
+    return value
+
+
+def _object_id(value):
+    if isinstance(value, str):
+        try:
+            return ObjectId(value)
+        except InvalidId:
+            raise ValueError(f"Invalid id in filter: {value!r}")
+    return value
+
+
+# Interview fields a batch filter may use, with the conversion applied to JSON values
+FILTER_FIELDS = {
+    "interviewId": str,
+    "status": str,
+    "hrId": _object_id,
+    "candidateId": _object_id,
+    "scheduledAt": _date,
+    "completedAt": _date,
+    "createdAt": _date,
+    "updatedAt": _date,
+    "jobDescription.fileName": str
+}
+FILTER_OPERATORS = {"$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin", "$exists"}
+
+
+def job_description_text(interview: Dict) -> str:
+    jd = (interview.get("jobDescription") or {}).get("text", "")
+    if not jd and (interview.get("jobDescription") or {}).get("fileUrl"):
+        # In production, read from file storage
+        jd = "Job description from file"
+    return jd
+
+
+def analysis_inputs(interview: Dict) -> Dict:
+    """analyze_interview() keyword arguments for a stored interview document"""
+    utterances = [t for t in interview.get("transcripts", []) if t.get("isFinal")]
+
+    hr_transcript = " ".join([
+        t["text"] for t in utterances if t.get("role") == "hr"
+    ])
+
+    candidate_transcript = " ".join([
+        t["text"] for t in utterances if t.get("role") == "candidate"
+    ])
+
+    return {
+        "interview_id": interview["interviewId"],
+        "hr_transcript": hr_transcript,
+        "candidate_transcript": candidate_transcript,
+        "job_description": job_description_text(interview),
+        "candidate_id": str(interview["candidateId"]),
+        "hr_id": str(interview["hrId"]),
+        "realtime_pairs": interview.get("qaPairs"),
+        "utterances": utterances
+    }
+
+
+def _field_condition(field: str, condition):
+    convert = FILTER_FIELDS[field]
+    if not isinstance(condition, dict):
+        return convert(condition)
+    checked = {}
+    for operator, value in condition.items():
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {operator}")
+        if operator == "$exists":
+            checked[operator] = bool(value)
+        elif operator in ("$in", "$nin"):
+            if not isinstance(value, list):
+                raise ValueError(f"{operator} needs a list")
+            checked[operator] = [convert(item) for item in value]
+        else:
+            checked[operator] = convert(value)
+    return checked
+
+
+def validate_filter(query: Dict) -> Dict:
+    """
+    A caller-supplied interviews filter restricted to FILTER_FIELDS, comparison
+    operators and $and/$or ($where, $expr, regexes etc. are rejected). ISO date
+    strings and ObjectId strings are converted for the date and id fields.
+    """
+    if not isinstance(query, dict):
+        raise ValueError("The filter must be an object")
+    checked = {}
+    for key, value in query.items():
+        if key in ("$and", "$or"):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"{key} needs a non-empty list")
+            checked[key] = [validate_filter(clause) for clause in value]
+        elif key in FILTER_FIELDS:
+            checked[key] = _field_condition(key, value)
+        else:
+            raise ValueError(f"Filtering on {key!r} is not supported")
+    return checked
+
+
+def batch_query(interview_ids: Optional[List[str]] = None, query: Optional[Dict] = None) -> Dict:
+    """Mongo filter selecting the interviews of a batch"""
+    clauses = []
+    if interview_ids:
+        clauses.append({"interviewId": {"$in": [str(interview_id) for interview_id in interview_ids]}})
+    if query:
+        clauses.append(validate_filter(query))
+    if not clauses:
+        raise ValueError("Provide interviewIds or a filter")
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class BatchAnalysisRunner:
+    def __init__(
+        self,
+        db,
+        analysis_service,
+        checkpoints,
+        concurrency: int = 4,
+        write_batch_size: int = 50,
+        cursor_batch_size: int = 100
+    ):
+        self.db = db
+        self.analysis_service = analysis_service
+        self.checkpoints = checkpoints
+        # Interviews analyzed at once; LLM calls are further capped by the service and rate limiter
+        self.concurrency = max(1, concurrency)
+        self.write_batch_size = max(1, write_batch_size)
+        self.cursor_batch_size = max(1, cursor_batch_size)
+        # Runs executing in this process, by run id
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @classmethod
+    def from_env(cls, db, analysis_service, checkpoints) -> "BatchAnalysisRunner":
+        return cls(
+            db,
+            analysis_service,
+            checkpoints,
+            concurrency=int(os.getenv("ANALYSIS_BATCH_CONCURRENCY", "4")),
+            write_batch_size=int(os.getenv("ANALYSIS_BATCH_WRITE_SIZE", "50"))
+        )
+
+    async def plan(
+        self,
+        interview_ids: Optional[List[str]] = None,
+        query: Optional[Dict] = None,
+        limit: int = 0,
+        resume_run_id: Optional[str] = None
+    ) -> Dict:
+        """Dry run: which interviews a batch would analyze, without calling the LLM or writing"""
+        selection = batch_query(interview_ids, query)
+        done = await self._completed_ids(resume_run_id) if resume_run_id else set()
+
+        cursor = self.db.interviews.find(selection, {"_id": 0, "interviewId": 1}).sort("_id", 1).batch_size(1000)
+        if limit:
+            cursor = cursor.limit(limit)
+        selected = [doc["interviewId"] async for doc in cursor]
+        pending = [interview_id for interview_id in selected if interview_id not in done]
+        return {
+            "dryRun": True,
+            "selected": len(selected),
+            "alreadyDone": len(selected) - len(pending),
+            "toAnalyze": len(pending),
+            "sample": pending[:20]
+        }
+
+    async def create(
+        self,
+        interview_ids: Optional[List[str]] = None,
+        query: Optional[Dict] = None,
+        limit: int = 0
+    ) -> Dict:
+        """Record a new batch run; start it with start() or execute()"""
+        batch_query(interview_ids, query)  # validate
+        now = datetime.utcnow()
+        run = {
+            "_id": uuid.uuid4().hex,
+            "status": "queued",
+            "interviewIds": list(interview_ids) if interview_ids else None,
+            # Stored as JSON: Mongo operators ($in, $gte, ...) are not valid field names
+            "query": json.dumps(query) if query else None,
+            "limit": limit,
+            "counts": {"analyzed": 0, "failed": 0, "skipped": 0},
+            "errors": [],
+            "createdAt": now,
+            "updatedAt": now
+        }
+        await self.db.analysisbatches.insert_one(run)
+        return run
+
+    async def get(self, run_id: str) -> Optional[Dict]:
+        return await self.db.analysisbatches.find_one({"_id": run_id})
+
+    def is_running(self, run_id: str) -> bool:
+        return run_id in self._tasks
+
+    def start(self, run_id: str) -> asyncio.Task:
+        """Run in the background (API); stop() cancels it and the run can be resumed"""
+        task = asyncio.create_task(self.execute(run_id))
+        self._tasks[run_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(run_id, None))
+        return task
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def execute(self, run_id: str) -> Dict:
+        """
+        Analyze every selected interview that does not yet have a report from this run.
+        Calling it again for an interrupted run resumes it.
+        """
+        run = await self.get(run_id)
+        if run is None:
+            raise ValueError(f"Batch run {run_id} not found")
+
+        selection = batch_query(run.get("interviewIds"), json.loads(run["query"]) if run.get("query") else None)
+        done = await self._completed_ids(run_id)
+        counts = {"analyzed": 0, "failed": 0, "skipped": 0}
+        errors: List[Dict] = []
+        pending_writes: List[UpdateOne] = []
+        pending_ids: List[str] = []
+
+        await self._update(run_id, {"status": "running", "startedAt": datetime.utcnow()})
+        logger.info("Batch analysis started", extra={"runId": run_id, "alreadyDone": len(done)})
+
+        queue: "asyncio.Queue[Optional[Dict]]" = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def flush():
+            if not pending_writes:
+                return
+            writes, ids = pending_writes[:], pending_ids[:]
+            pending_writes.clear()
+            pending_ids.clear()
+            result = await self.db.interviewreports.bulk_write(writes, ordered=False)
+            if result.upserted_ids:
+                # Reports created by this run (replaced ones keep their _id and link)
+                await self.db.interviews.bulk_write([
+                    UpdateOne(*report_link(ids[idx], report_id)) for idx, report_id in result.upserted_ids.items()
+                ], ordered=False)
+            if self.checkpoints is not None:
+                await asyncio.gather(*[self.checkpoints.clear(i) for i in ids], return_exceptions=True)
+            await self._update(run_id, {"counts": dict(counts), "errors": errors[:MAX_RECORDED_ERRORS]})
+
+        async def produce():
+            # Stable order, so a limited run selects the same interviews when resumed
+            cursor = self.db.interviews.find(selection, INTERVIEW_PROJECTION).sort("_id", 1).batch_size(
+                self.cursor_batch_size
+            )
+            if run.get("limit"):
+                cursor = cursor.limit(run["limit"])
+            try:
+                # The cursor fetches cursor_batch_size documents per round trip
+                async for interview in cursor:
+                    if interview["interviewId"] in done:
+                        counts["skipped"] += 1
+                        continue
+                    await queue.put(interview)
+            finally:
+                await cursor.close()
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def work():
+            while True:
+                interview = await queue.get()
+                if interview is None:
+                    return
+                interview_id = interview["interviewId"]
+                try:
+                    # Re-score everything: reusing real-time scores would skip the rubric/model change
+                    report = await self.analysis_service.analyze_interview(
+                        **{**analysis_inputs(interview), "realtime_pairs": None}
+                    )
+                except Exception as e:
+                    counts["failed"] += 1
+                    errors.append({"interviewId": interview_id, "error": str(e)})
+                    logger.warning("Batch analysis failed for interview: %s", e, extra={
+                        "runId": run_id, "interviewId": interview_id
+                    })
+                    continue
+                report["batchRunId"] = run_id
+                pending_writes.append(UpdateOne(*report_upsert(report), upsert=True))
+                pending_ids.append(interview_id)
+                counts["analyzed"] += 1
+                if len(pending_writes) >= self.write_batch_size:
+                    await flush()
+
+        tasks = [asyncio.create_task(produce())] + [
+            asyncio.create_task(work()) for _ in range(self.concurrency)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+            await flush()
+        except asyncio.CancelledError:
+            # Interrupted (shutdown): save what finished and leave the run resumable
+            for task in tasks:
+                task.cancel()
+            await asyncio.shield(flush())
+            await asyncio.shield(self._update(run_id, {"status": "interrupted", "counts": counts}))
+            raise
+        except Exception as e:
+            for task in tasks:
+                task.cancel()
+            await self._update(run_id, {"status": "failed", "error": str(e), "counts": counts})
+            raise
+
+        await self._update(run_id, {
+            "status": "completed",
+            "counts": counts,
+            "errors": errors[:MAX_RECORDED_ERRORS],
+            "finishedAt": datetime.utcnow()
+        })
+        logger.info("Batch analysis completed", extra={"runId": run_id, **counts})
+        return {"runId": run_id, "status": "completed", "counts": counts, "errors": errors[:MAX_RECORDED_ERRORS]}
+
+    async def _completed_ids(self, run_id: str) -> Set[str]:
+        return set(await self.db.interviewreports.distinct("interviewId", {"batchRunId": run_id}))
+
+    async def _update(self, run_id: str, fields: Dict):
+        fields["updatedAt"] = datetime.utcnow()
+        await self.db.analysisbatches.update_one({"_id": run_id}, {"$set": fields})
+
+
+def serialize_batch(run: Dict) -> Dict:
+    """Shape a batch run document for the API response"""
+    return {
+        "runId": run["_id"],
+        "status": run["status"],
+        "interviewIds": run.get("interviewIds"),
+        "filter": json.loads(run["query"]) if run.get("query") else None,
+        "limit": run.get("limit", 0),
+        "counts": run.get("counts", {}),
+        "errors": run.get("errors", []),
+        "error": run.get("error"),
+        "createdAt": run["createdAt"].isoformat() if run.get("createdAt") else None,
+        "finishedAt": run["finishedAt"].isoformat() if run.get("finishedAt") else None
+    }
@@ -0,0 +1,143 @@
+"""
+Analysis Checkpoints
+Per-interview partial results (Q&A pairs, per-pair qaBreakdown entries and summaries)
+so a failed analysis can resume instead of recomputing everything.
+"""
+
+import os
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional
+import pymongo.errors
+
+
+def analysis_fingerprint(*parts: str) -> str:
+    """Hash of the analysis inputs; checkpoints from different inputs are ignored"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()
+
+
+def empty_checkpoint() -> Dict:
+    return {"qaPairs": None, "entries": {}, "summaries": {}}
+
+
+class MemoryCheckpointStore:
+    """Process-local checkpoints (used when MongoDB is not available)"""
+
+    def __init__(self):
+        self._checkpoints: Dict[str, Dict] = {}
+
+    async def load(self, interview_id: str, fingerprint: str) -> Dict:
+        doc = self._checkpoints.get(interview_id)
+        if not doc or doc.get("fingerprint") != fingerprint:
+            return empty_checkpoint()
+        return {
+            "qaPairs": doc.get("qaPairs"),
+            "entries": dict(doc.get("entries", {})),
+            "summaries": dict(doc.get("summaries", {}))
+        }
+
+    def _doc(self, interview_id: str, fingerprint: str) -> Dict:
+        doc = self._checkpoints.get(interview_id)
+        if not doc or doc.get("fingerprint") != fingerprint:
+            doc = {"fingerprint": fingerprint, "qaPairs": None, "entries": {}, "summaries": {}}
+            self._checkpoints[interview_id] = doc
+        return doc
+
+    async def save_pairs(self, interview_id: str, fingerprint: str, qa_pairs: List[Dict]):
+        doc = self._doc(interview_id, fingerprint)
+        doc["qaPairs"] = qa_pairs
+        doc["entries"] = {}
+        doc["summaries"] = {}
+
+    async def save_entry(self, interview_id: str, fingerprint: str, index: int, entry: Dict):
+        self._doc(interview_id, fingerprint)["entries"][index] = entry
+
+    async def save_summary(self, interview_id: str, fingerprint: str, kind: str, summary: str):
+        self._doc(interview_id, fingerprint)["summaries"][kind] = summary
+
+    async def clear(self, interview_id: str):
+        self._checkpoints.pop(interview_id, None)
+
+
+class MongoCheckpointStore:
+    """Checkpoints in a MongoDB collection, one document per interview"""
+
+    def __init__(self, collection, ttl_seconds: int = 7 * 24 * 3600):
+        self.collection = collection
+        self.ttl_seconds = ttl_seconds
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            # Abandoned checkpoints expire on their own
+            await self.collection.create_index("updatedAt", expireAfterSeconds=self.ttl_seconds)
+            self._indexes_ready = True
+
+    async def load(self, interview_id: str, fingerprint: str) -> Dict:
+        await self._ensure_indexes()
+        doc = await self.collection.find_one({"_id": interview_id})
+        if not doc or doc.get("fingerprint") != fingerprint:
+            return empty_checkpoint()
+        return {
+            "qaPairs": doc.get("qaPairs"),
+            "entries": {int(idx): entry for idx, entry in (doc.get("entries") or {}).items()},
+            "summaries": doc.get("summaries") or {}
+        }
+
+    async def _set(self, interview_id: str, fingerprint: str, fields: Dict):
+        fields["updatedAt"] = datetime.utcnow()
+        result = await self.collection.update_one(
+            {"_id": interview_id, "fingerprint": fingerprint}, {"$set": fields}
+        )
+        if result.matched_count:
+            return
+        # No checkpoint for these inputs (none yet, or one from older inputs, e.g. when the
+        # pairs came from the live interview and save_pairs was skipped): start a fresh one
+        try:
+            await self.collection.replace_one(
+                {"_id": interview_id, "fingerprint": {"$ne": fingerprint}},
+                {"fingerprint": fingerprint, "qaPairs": None, "entries": {}, "summaries": {}},
+                upsert=True
+            )
+        except pymongo.errors.DuplicateKeyError:
+            pass  # a concurrent save already started it
+        await self.collection.update_one(
+            {"_id": interview_id, "fingerprint": fingerprint}, {"$set": fields}
+        )
+
+    async def save_pairs(self, interview_id: str, fingerprint: str, qa_pairs: List[Dict]):
+        # Replacing the pairs (or the inputs) invalidates all per-pair results
+        await self.collection.replace_one(
+            {"_id": interview_id},
+            {
+                "fingerprint": fingerprint,
+                "qaPairs": qa_pairs,
+                "entries": {},
+                "summaries": {},
+                "updatedAt": datetime.utcnow()
+            },
+            upsert=True
+        )
+
+    async def save_entry(self, interview_id: str, fingerprint: str, index: int, entry: Dict):
+        await self._set(interview_id, fingerprint, {f"entries.{index}": entry})
+
+    async def save_summary(self, interview_id: str, fingerprint: str, kind: str, summary: str):
+        await self._set(interview_id, fingerprint, {f"summaries.{kind}": summary})
+
+    async def clear(self, interview_id: str):
+        await self.collection.delete_one({"_id": interview_id})
+
+
+def checkpoint_store_from_env(db=None):
+    """Mongo-backed checkpoints when a database is available, in-memory otherwise"""
+    if db is not None and os.getenv("ANALYSIS_CHECKPOINT_BACKEND", "mongo") == "mongo":
+        return MongoCheckpointStore(
+            db.analysischeckpoints,
+            ttl_seconds=int(os.getenv("ANALYSIS_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+        )
+    return MemoryCheckpointStore()
@@ -0,0 +1,255 @@
+"""
+Completed Interview Consumer
+Queues an analysis whenever an interview's status becomes "completed", so a report is
+produced even if the /api/analyze call from the backend is lost. Uses a MongoDB change
+stream (replica sets) and falls back to polling completedAt on a standalone mongod.
+Progress (resume token / polling watermark) is saved after each interview is queued:
+delivery is at-least-once, and repeats are absorbed by remembering the completions
+already handled in the polling overlap and by skipping interviews that already have a
+report or whose analysis is queued, running or failed since they were completed.
+One process at a time holds the consumer lease, so several workers can run it safely.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+import pymongo
+import pymongo.errors
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_ID = "completed-interviews"
+
+# Re-scan this far behind the polling watermark (clock skew, late completedAt writes)
+POLL_OVERLAP = timedelta(seconds=60)
+
+# Server codes meaning change streams cannot be used here (standalone mongod, unsupported
+# stage) or the saved resume token is no longer in the oplog
+CHANGE_STREAM_UNSUPPORTED = {40573, 40324, 115}
+CHANGE_STREAM_HISTORY_LOST = {286, 280}
+
+COMPLETED_EVENTS = [{
+    "$match": {
+        "$or": [
+            {"operationType": "update", "updateDescription.updatedFields.status": "completed"},
+            {"operationType": {"$in": ["insert", "replace"]}, "fullDocument.status": "completed"}
+        ]
+    }
+}]
+
+
+class ChangeStreamUnavailable(Exception):
+    pass
+
+
+class CompletedInterviewConsumer:
+    """
+    mode: "auto" (change stream, polling if unsupported), "changestream", "poll" or "off".
+    enqueue(interview_id) must persist the job before returning; it is only called for
+    interviews without a report.
+    """
+
+    def __init__(
+        self,
+        db,
+        enqueue: Callable[[str], Awaitable[Dict]],
+        mode: str = "auto",
+        poll_seconds: float = 10,
+        lease_seconds: float = 30,
+        batch_size: int = 200
+    ):
+        self.db = db
+        self.state = db.analysisconsumers
+        # AnalysisJobQueue's collection, to see whether a completion was already handled
+        self.jobs = db.analysisjobs
+        self.enqueue = enqueue
+        self.mode = mode
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.batch_size = batch_size
+        self.owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, db, enqueue: Callable[[str], Awaitable[Dict]]) -> "CompletedInterviewConsumer":
+        return cls(
+            db,
+            enqueue,
+            mode=os.getenv("ANALYSIS_AUTO_TRIGGER", "auto").lower(),
+            poll_seconds=float(os.getenv("ANALYSIS_TRIGGER_POLL_SECONDS", "10")),
+            lease_seconds=float(os.getenv("ANALYSIS_TRIGGER_LEASE_SECONDS", "30"))
+        )
+
+    def start(self):
+        if self.mode == "off":
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Completed interview consumer started", extra={"mode": self.mode})
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            # Let another worker take over without waiting for the lease to expire
+            await self.state.update_one(
+                {"_id": CONSUMER_ID, "owner": self.owner}, {"$set": {"leaseUntil": None}}
+            )
+        except pymongo.errors.PyMongoError:
+            pass
+
+    async def _run(self):
+        try:
+            # Polling and catch-up scans
+            await self.db.interviews.create_index([("status", pymongo.ASCENDING), ("completedAt", pymongo.ASCENDING)])
+        except pymongo.errors.PyMongoError as e:
+            logger.warning("Could not create completion index: %s", e)
+
+        use_stream = self.mode in ("auto", "changestream")
+        while True:
+            try:
+                if not await self._acquire_lease():
+                    await asyncio.sleep(self.poll_seconds)
+                    continue
+                if use_stream:
+                    try:
+                        await self._consume_stream()
+                    except ChangeStreamUnavailable as e:
+                        if self.mode == "changestream":
+                            raise
+                        logger.warning("Change streams unavailable, polling instead: %s", e)
+                        use_stream = False
+                else:
+                    await self._poll()
+                    await asyncio.sleep(self.poll_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Completed interview consumer error: %s", e)
+                await asyncio.sleep(self.poll_seconds)
+
+    async def _acquire_lease(self) -> bool:
+        """Take or renew the consumer lease; False while another process holds it"""
+        now = datetime.utcnow()
+        try:
+            await self.state.find_one_and_update(
+                {
+                    "_id": CONSUMER_ID,
+                    "$or": [{"owner": self.owner}, {"leaseUntil": {"$lt": now}}, {"leaseUntil": None}]
+                },
+                {"$set": {"owner": self.owner, "leaseUntil": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except pymongo.errors.DuplicateKeyError:
+            return False
+
+    async def _save(self, fields: Dict):
+        await self.state.update_one(
+            {"_id": CONSUMER_ID, "owner": self.owner},
+            {"$set": {**fields, "updatedAt": datetime.utcnow()}}
+        )
+
+    async def _handle(self, interview_id: Optional[str], completed_at: Optional[datetime] = None):
+        """
+        Queue the analysis unless the interview already has a report, an active job, or a
+        job that failed after it was completed (retrying that is left to /api/analyze)
+        """
+        if not interview_id:
+            return
+        if await self.db.interviewreports.find_one({"interviewId": interview_id}, {"_id": 1}):
+            return
+        latest = await self.jobs.find_one(
+            {"interviewId": interview_id},
+            {"status": 1, "active": 1, "createdAt": 1},
+            sort=[("createdAt", pymongo.DESCENDING)]
+        )
+        if latest is not None and (
+            latest.get("active")
+            or (
+                latest.get("status") == "failed"
+                and (completed_at is None or latest.get("createdAt") is None or latest["createdAt"] >= completed_at)
+            )
+        ):
+            logger.debug("Analysis already handled", extra={
+                "interviewId": interview_id, "jobId": latest["_id"], "status": latest.get("status")
+            })
+            return
+        await self.enqueue(interview_id)
+        logger.info("Analysis triggered by interview completion", extra={"interviewId": interview_id})
+
+    async def _consume_stream(self):
+        state = await self.state.find_one({"_id": CONSUMER_ID}) or {}
+        token = state.get("resumeToken")
+        try:
+            async with self.db.interviews.watch(
+                COMPLETED_EVENTS,
+                resume_after=token,
+                max_await_time_ms=int(self.poll_seconds * 1000)
+            ) as stream:
+                logger.info("Watching interviews for completion", extra={"resumed": token is not None})
+                if token is None:
+                    # First run or lost history: pick up completions since the last checkpoint
+                    # (the stream is already open, so nothing completed meanwhile is missed)
+                    await self._poll()
+                while stream.alive:
+                    change = await stream.try_next()
+                    if change is not None:
+                        interview = await self.db.interviews.find_one(
+                            {"_id": change["documentKey"]["_id"], "status": "completed"},
+                            {"_id": 0, "interviewId": 1, "completedAt": 1}
+                        ) or {}
+                        await self._handle(interview.get("interviewId"), interview.get("completedAt"))
+                    # Also advances the token while idle so a restart does not replay old events
+                    if stream.resume_token is not None and stream.resume_token != token:
+                        token = stream.resume_token
+                        await self._save({"resumeToken": token, "polledUntil": datetime.utcnow()})
+                    if not await self._acquire_lease():
+                        return
+        except NotImplementedError as e:
+            raise ChangeStreamUnavailable(str(e) or "watch() not supported")
+        except pymongo.errors.OperationFailure as e:
+            if e.code in CHANGE_STREAM_UNSUPPORTED:
+                raise ChangeStreamUnavailable(str(e))
+            if e.code in CHANGE_STREAM_HISTORY_LOST:
+                logger.warning("Resume token expired, catching up by polling: %s", e)
+                await self._save({"resumeToken": None})
+                return
+            raise
+
+    async def _poll(self):
+        """Queue completed interviews with completedAt after the saved watermark"""
+        state = await self.state.find_one({"_id": CONSUMER_ID}) or {}
+        watermark = state.get("polledUntil")
+        if watermark is None:
+            # No history to replay on the very first run
+            await self._save({"polledUntil": datetime.utcnow()})
+            return
+
+        # Completions already handled inside the overlap window, so re-scans skip them
+        handled = {(item["interviewId"], item["completedAt"]) for item in state.get("pollHandled") or []}
+        cursor = self.db.interviews.find(
+            {"status": "completed", "completedAt": {"$gte": watermark - POLL_OVERLAP}},
+            {"_id": 0, "interviewId": 1, "completedAt": 1},
+            batch_size=self.batch_size
+        ).sort("completedAt", pymongo.ASCENDING)
+        async for interview in cursor:
+            key = (interview.get("interviewId"), interview["completedAt"])
+            if key in handled:
+                continue
+            await self._handle(*key)
+            watermark = max(watermark, interview["completedAt"])
+            handled = {item for item in handled if item[1] >= watermark - POLL_OVERLAP}
+            handled.add(key)
+            await self._save({
+                "polledUntil": watermark,
+                "pollHandled": [
+                    {"interviewId": interview_id, "completedAt": completed_at}
+                    for interview_id, completed_at in handled
+                ]
+            })
@@ -0,0 +1,65 @@
+"""
+MongoDB Access
+Async (Motor) client with a configured connection pool. The client is created at
+import without connecting; the app lifespan connects it (ping + indexes) and closes it.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Tuple
+import pymongo.errors
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = "ai-nexus"
+
+
+def mongo_client_from_env() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        os.getenv("MONGODB_URI", "mongodb://localhost:27017/ai-nexus"),
+        maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+        minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        serverSelectionTimeoutMS=int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+    )
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """interviewId lookups on interviews and interviewreports (one report per interview)"""
+    for collection in (db.interviews, db.interviewreports):
+        try:
+            await collection.create_index("interviewId", unique=True)
+        except pymongo.errors.OperationFailure as e:
+            # e.g. an existing index with other options, or duplicate reports from older versions
+            logger.warning("Could not create interviewId index on %s: %s", collection.name, e)
+
+
+async def connect(db: AsyncIOMotorDatabase) -> bool:
+    """Check the connection and create indexes; returns False if MongoDB is unreachable"""
+    try:
+        await db.client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        logger.warning("MongoDB connection failed: %s", e)
+        return False
+    await ensure_indexes(db)
+    logger.info("Connected to MongoDB")
+    return True
+
+
+def report_upsert(report: Dict) -> Tuple[Dict, Dict]:
+    """
+    Filter and update that upsert a report keyed on interviewId, so reruns replace it.
+    A report not written by a batch run drops any earlier batchRunId, so resuming that
+    run does not take the interview for done.
+    """
+    now = datetime.utcnow()
+    update = {"$set": {**report, "generatedAt": now, "updatedAt": now}, "$setOnInsert": {"createdAt": now}}
+    if "batchRunId" not in report:
+        update["$unset"] = {"batchRunId": ""}
+    return {"interviewId": report["interviewId"]}, update
+
+
+def report_link(interview_id: str, report_id) -> Tuple[Dict, Dict]:
+    """Filter and update pointing Interview.reportId at the interview's saved report"""
+    return {"interviewId": interview_id}, {"$set": {"reportId": report_id}}
@@ -0,0 +1,167 @@
+"""
+Fake LLM Provider
+Offline, deterministic stand-in for OpenAI/Anthropic (LLM_PROVIDER=fake).
+Returns schema-valid responses for every prompt in the analysis pipeline,
+with configurable latency and error rate, for local development and benchmarks.
+"""
+
+import os
+import re
+import json
+import random
+import asyncio
+import hashlib
+from typing import AsyncIterator, Dict, Optional, Tuple
+from services.llm_client import LLMProvider
+from services.tokens import estimate_tokens
+
+FILLER_WORDS = (
+    "the candidate should explain their experience with the core requirements of the role "
+    "using concrete examples measurable outcomes and clear reasoning about trade offs"
+).split()
+
+
+class FakeLLMError(Exception):
+    """Injected provider failure, treated like a 503 so it exercises the retry path"""
+
+    status_code = 503
+
+
+class FakeProvider(LLMProvider):
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        answer_words: int = 120,
+        seed: int = 42,
+        max_connections: int = 100
+    ):
+        super().__init__("fake-model", max_connections)
+        # Latency is lognormal around latency_ms; sigma 0 gives a fixed delay
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.answer_words = answer_words
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @classmethod
+    def from_env(cls) -> "FakeProvider":
+        return cls(
+            latency_ms=float(os.getenv("FAKE_LLM_LATENCY_MS", "50")),
+            latency_sigma=float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),
+            answer_words=int(os.getenv("FAKE_LLM_ANSWER_WORDS", "120")),
+            seed=int(os.getenv("FAKE_LLM_SEED", "42"))
+        )
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "promptTokens": self.prompt_tokens,
+            "completionTokens": self.completion_tokens
+        }
+
+    def reset_stats(self):
+        self.calls = self.errors = self.prompt_tokens = self.completion_tokens = 0
+
+    async def _delay(self, scale: float = 1.0):
+        if self.latency_ms <= 0:
+            return
+        latency = self.latency_ms * (
+            self._random.lognormvariate(0, self.latency_sigma) if self.latency_sigma > 0 else 1.0
+        )
+        await asyncio.sleep(latency * scale / 1000)
+
+    def _maybe_fail(self):
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self.errors += 1
+            raise FakeLLMError("Injected fake LLM failure")
+
+    async def _complete(
+        self, prompt: str, require_json: bool, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> Tuple[str, int, int]:
+        self.calls += 1
+        prompt_tokens = estimate_tokens(prompt)
+        self.prompt_tokens += prompt_tokens
+        await self._delay()
+        self._maybe_fail()
+
+        response = self.respond(prompt)
+        completion_tokens = estimate_tokens(response)
+        self.completion_tokens += completion_tokens
+        return response, prompt_tokens, completion_tokens
+
+    async def _stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> AsyncIterator[str]:
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        # Time to first token is a fraction of a full completion
+        await self._delay(0.2)
+        self._maybe_fail()
+
+        words = self.respond(prompt).split(" ")
+        for idx, word in enumerate(words):
+            chunk = word if idx == 0 else " " + word
+            self.completion_tokens += estimate_tokens(chunk)
+            yield chunk
+            await asyncio.sleep(0)
+
+    # --- Deterministic responses -------------------------------------------------
+
+    def respond(self, prompt: str) -> str:
+        if "Extract all question-answer pairs" in prompt:
+            return json.dumps(self._pairs(prompt))
+        if "### Item" in prompt:
+            items = sorted({int(n) for n in re.findall(r'^### Item (\d+)', prompt, re.MULTILINE)})
+            return json.dumps({"scores": [
+                {"item": idx, **self._score(f"{prompt}:{idx}")} for idx in items
+            ]})
+        if '"score"' in prompt:
+            return json.dumps(self._score(prompt))
+        return self._text(prompt)
+
+    @staticmethod
+    def _section(prompt: str, start: str, end: str) -> str:
+        match = re.search(re.escape(start) + r'\s*(.*?)\s*' + re.escape(end), prompt, re.DOTALL)
+        return match.group(1) if match else ""
+
+    def _pairs(self, prompt: str):
+        hr = self._section(prompt, "HR Transcript:", "Candidate Transcript:")
+        candidate = self._section(prompt, "Candidate Transcript:", "Instructions:")
+        questions = [q.strip() + "?" for q in hr.split("?") if q.strip()]
+        answers = [a.strip() for a in re.split(r'(?<=[.!])\s+', candidate) if a.strip()]
+        if not questions:
+            return []
+        # Spread the candidate sentences evenly over the questions
+        per_question = max(1, len(answers) // len(questions))
+        return [
+            {
+                "question": question,
+                "answer": " ".join(answers[idx * per_question:(idx + 1) * per_question])
+            }
+            for idx, question in enumerate(questions)
+        ]
+
+    @staticmethod
+    def _score(seed_text: str) -> Dict:
+        score = int(hashlib.sha256(seed_text.encode('utf-8')).hexdigest(), 16) % 11
+        return {
+            "score": score,
+            "justification": f"Deterministic fake score of {score}/10 based on coverage of the key points."
+        }
+
+    def _text(self, prompt: str) -> str:
+        offset = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest(), 16) % len(FILLER_WORDS)
+        words = [
+            FILLER_WORDS[(offset + idx) % len(FILLER_WORDS)] for idx in range(self.answer_words)
+        ]
+        return " ".join(words).capitalize() + "."
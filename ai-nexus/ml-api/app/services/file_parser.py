@@ -1,101 +1,283 @@
 """
-File parsing utilities for JD and transcript processing
+File parsing utilities for job description uploads
 """
 
+import io
+import os
 import re
-from typing import Tuple
+import time
+import asyncio
+import hashlib
+import logging
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from typing import Optional, Tuple
+from xml.etree import ElementTree
 
+logger = logging.getLogger(__name__)
 
-async def parse_jd_file(file) -> str:
-    """Parse JD file (TXT, MD, or PDF) and extract text"""
-    
-    filename = file.filename.lower()
-    content = await file.read()
-    
-    if filename.endswith('.pdf'):
-        # PDF parsing - requires PyPDF2 or pdfplumber
-        try:
-            import PyPDF2
-            import io
-            
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            return text.strip()
-        except ImportError:
-            # Fallback: return placeholder
-            return "PDF file uploaded. Install PyPDF2 for PDF parsing: pip install PyPDF2"
-        except Exception as e:
-            raise ValueError(f"Error parsing PDF: {str(e)}")
-    
-    elif filename.endswith(('.txt', '.md')):
-        # Text file
+SUPPORTED_JD_EXTENSIONS = ('.txt', '.md', '.pdf', '.docx', '.html', '.htm')
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class FileTooLargeError(ValueError):
+    """The upload exceeded the configured size limit"""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting multipart requests whose Content-Length exceeds max_bytes
+    with 413, before Starlette spools the body to memory/disk. Chunked requests carry no
+    Content-Length; for them only JDFileParser.read_upload's check applies.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.max_bytes > 0:
+            headers = dict(scope["headers"])
+            length = headers.get(b"content-length", b"")
+            if (
+                headers.get(b"content-type", b"").startswith(b"multipart/form-data")
+                and length.isdigit()
+                and int(length) > self.max_bytes
+            ):
+                body = f'{{"detail":"Request body exceeds the {self.max_bytes}-byte limit"}}'.encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 413,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
+
+
+def decode_text(content: bytes) -> str:
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return content.decode('latin-1')
+
+
+def extract_pdf_text(content: bytes, max_pages: int, deadline: float) -> str:
+    """
+    Extract PDF text page by page. PyPDF2 parses each page only when it is accessed,
+    so stopping at max_pages or the deadline skips the work for the remaining pages.
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(io.BytesIO(content), strict=False)
+    page_count = len(reader.pages)
+    parts = []
+    for index in range(min(page_count, max_pages)):
+        # Runs in a worker; checking between pages lets a timed-out extraction stop early
+        if time.monotonic() > deadline:
+            raise TimeoutError("PDF extraction timed out")
+        parts.append(reader.pages[index].extract_text() or "")
+    if page_count > max_pages:
+        logger.warning("PDF truncated to the first %d of %d pages", max_pages, page_count)
+    return "\n".join(parts).strip()
+
+
+def extract_docx_text(content: bytes, max_xml_bytes: int) -> str:
+    """Paragraph text from word/document.xml (no python-docx needed)"""
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
         try:
-            return content.decode('utf-8')
-        except UnicodeDecodeError:
-            return content.decode('latin-1')
-    
-    else:
-        raise ValueError(f"Unsupported file type: {filename}")
+            info = archive.getinfo('word/document.xml')
+        except KeyError:
+            raise ValueError("Not a Word document (word/document.xml missing)")
+        # Compression ratios this high are a zip bomb, not a job description
+        if info.file_size > max_xml_bytes:
+            raise ValueError("DOCX document is too large to extract")
+        paragraphs, runs = [], []
+        with archive.open(info) as document:
+            for event, element in ElementTree.iterparse(document, events=('end',)):
+                if element.tag == f'{WORD_NAMESPACE}t' and element.text:
+                    runs.append(element.text)
+                elif element.tag == f'{WORD_NAMESPACE}tab':
+                    runs.append('\t')
+                elif element.tag == f'{WORD_NAMESPACE}p':
+                    paragraphs.append(''.join(runs))
+                    runs.clear()
+                    # Free finished paragraphs so large documents stay small in memory
+                    element.clear()
+    return '\n'.join(p for p in paragraphs if p.strip()).strip()
+
+
+class _HTMLTextExtractor(HTMLParser):
+    SKIP_TAGS = {'script', 'style', 'head', 'noscript', 'template'}
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'ul', 'ol', 'tr', 'section', 'article', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
 
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
 
-def parse_mock_transcript(transcript: str) -> Tuple[str, str]:
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append('\n')
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self.parts.append(data)
+
+
+def extract_html_text(content: bytes) -> str:
+    parser = _HTMLTextExtractor()
+    parser.feed(decode_text(content))
+    parser.close()
+    lines = (re.sub(r'[ \t\r\f\v]+', ' ', line).strip() for line in ''.join(parser.parts).split('\n'))
+    return '\n'.join(line for line in lines if line)
+
+
+def extract_jd_text(extension: str, content: bytes, max_pages: int, max_docx_xml_bytes: int, deadline: float) -> str:
+    """Text of a JD file by extension; runs in the parser's executor"""
+    if extension == '.pdf':
+        return extract_pdf_text(content, max_pages, deadline)
+    if extension == '.docx':
+        return extract_docx_text(content, max_docx_xml_bytes)
+    if extension in ('.html', '.htm'):
+        return extract_html_text(content)
+    return decode_text(content)
+
+
+class JDFileParser:
     """
-    Parse mock transcript text into HR and Candidate transcripts.
-    Handles formats like:
-    - "HR: ... Candidate: ..."
-    - "Interviewer: ... Interviewee: ..."
-    - Line-by-line format
+    JD upload ingestion: the upload is read in chunks up to max_bytes, extraction of
+    binary formats runs in a thread (or process) pool with a timeout so a large or
+    hostile file cannot stall the event loop, and extracted text is cached by content hash.
     """
-    
-    hr_lines = []
-    candidate_lines = []
-    
-    # Split by lines
-    lines = transcript.split('\n')
-    
-    current_speaker = None
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # Detect speaker
-        if re.match(r'^(HR|Interviewer|Recruiter):', line, re.IGNORECASE):
-            current_speaker = 'hr'
-            text = re.sub(r'^(HR|Interviewer|Recruiter):\s*', '', line, flags=re.IGNORECASE)
-            hr_lines.append(text)
-        elif re.match(r'^(Candidate|Interviewee|Student):', line, re.IGNORECASE):
-            current_speaker = 'candidate'
-            text = re.sub(r'^(Candidate|Interviewee|Student):\s*', '', line, flags=re.IGNORECASE)
-            candidate_lines.append(text)
-        else:
-            # Continue with current speaker
-            if current_speaker == 'hr':
-                hr_lines.append(line)
-            elif current_speaker == 'candidate':
-                candidate_lines.append(line)
+
+    def __init__(
+        self,
+        max_bytes: int = 10 * 1024 * 1024,
+        timeout: float = 20.0,
+        max_pdf_pages: int = 50,
+        executor: str = "thread",
+        workers: int = 2,
+        cache_size: int = 100,
+        chunk_size: int = 64 * 1024
+    ):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.max_pdf_pages = max(1, max_pdf_pages)
+        self.executor_kind = executor
+        self.workers = max(1, workers)
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size
+        self._executor: Optional[Executor] = None
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> "JDFileParser":
+        return cls(
+            max_bytes=int(os.getenv("JD_MAX_FILE_BYTES", str(10 * 1024 * 1024))),
+            timeout=float(os.getenv("JD_PARSE_TIMEOUT", "20")),
+            max_pdf_pages=int(os.getenv("JD_MAX_PDF_PAGES", "50")),
+            executor=os.getenv("JD_PARSE_EXECUTOR", "thread").lower(),
+            workers=int(os.getenv("JD_PARSE_WORKERS", "2")),
+            cache_size=int(os.getenv("JD_TEXT_CACHE_SIZE", "100"))
+        )
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
             else:
-                # Default to candidate if no speaker detected
-                candidate_lines.append(line)
-    
-    hr_transcript = ' '.join(hr_lines)
-    candidate_transcript = ' '.join(candidate_lines)
-    
-    # If parsing failed, try alternative method
-    if not hr_transcript and not candidate_transcript:
-        # Try splitting by common patterns
-        parts = re.split(r'(HR|Interviewer|Candidate|Interviewee):', transcript, flags=re.IGNORECASE)
-        if len(parts) > 1:
-            for i in range(1, len(parts), 2):
-                speaker = parts[i].lower()
-                text = parts[i+1] if i+1 < len(parts) else ""
-                if 'hr' in speaker or 'interviewer' in speaker:
-                    hr_transcript += text + " "
-                else:
-                    candidate_transcript += text + " "
-    
-    return hr_transcript.strip(), candidate_transcript.strip()
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="jd-parse")
+        return self._executor
 
+    def close(self):
+        if self._executor is not None:
+            # Drop queued parses instead of finishing them (cancel_futures: Python 3.9+, see run.py)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def read_upload(self, file) -> Tuple[bytes, str]:
+        """
+        Read the upload in chunks and return (content, sha256); FileTooLargeError if it
+        exceeds max_bytes. Starlette has already received the whole request body by now,
+        so this only bounds what is kept in memory and hashed. UploadSizeLimitMiddleware
+        rejects oversized requests before their body is read.
+        """
+        digest = hashlib.sha256()
+        chunks = []
+        size = 0
+        while True:
+            chunk = await file.read(self.chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > self.max_bytes:
+                raise FileTooLargeError(f"File exceeds the {self.max_bytes}-byte limit")
+            digest.update(chunk)
+            chunks.append(chunk)
+        return b''.join(chunks), digest.hexdigest()
+
+    async def parse(self, file) -> str:
+        """Parse a JD upload (TXT, MD, PDF, DOCX or HTML) and extract text"""
+        filename = (file.filename or '').lower()
+        extension = os.path.splitext(filename)[1]
+        if extension not in SUPPORTED_JD_EXTENSIONS:
+            raise ValueError(f"Unsupported file type: {filename}")
+
+        content, content_hash = await self.read_upload(file)
+        cache_key = f"{extension}:{content_hash}"
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._cache.move_to_end(cache_key)
+            return cached
+
+        if extension in ('.txt', '.md'):
+            text = decode_text(content)
+        else:
+            text = await self._extract(extension, content, filename)
+
+        if self.cache_size > 0:
+            self._cache[cache_key] = text
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    async def _extract(self, extension: str, content: bytes, filename: str) -> str:
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        future = loop.run_in_executor(
+            self._get_executor(),
+            extract_jd_text,
+            extension,
+            content,
+            self.max_pdf_pages,
+            # Word XML is ~10-50x the zipped size; anything far beyond is rejected
+            self.max_bytes * 50,
+            started + self.timeout
+        )
+        try:
+            text = await asyncio.wait_for(future, self.timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            raise ValueError(f"Timed out extracting text from {filename}")
+        except ImportError:
+            # Fallback: return placeholder
+            return "PDF file uploaded. Install PyPDF2 for PDF parsing: pip install PyPDF2"
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Error parsing {extension[1:].upper()}: {str(e)}")
+        logger.debug("Extracted JD text", extra={
+            "fileType": extension, "chars": len(text), "ms": round((time.monotonic() - started) * 1000)
+        })
+        return text
@@ -0,0 +1,189 @@
+"""
+Job Description Context
+Splits a JD into sections once per analysis, drops repeated and legal boilerplate,
+and indexes the sections with BM25 so each prompt gets the sections most relevant
+to its question within a token budget instead of the first N characters.
+"""
+
+import re
+import math
+from collections import Counter
+from typing import Dict, Iterable, List
+from services.tokens import estimate_tokens
+
+# Markdown headings, "Requirements:" lines, short ALL-CAPS lines and short
+# Title Case lines without punctuation ("About Us", "What You'll Do") start a section
+HEADING = re.compile(
+    r"^(#{1,6}\s+\S.*|[A-Z][A-Za-z0-9 &/,()'-]{1,60}:|[A-Z][A-Z0-9 &/,()'-]{2,60}|"
+    r"[A-Z][A-Za-z0-9&/'-]*(?: (?:[A-Z][A-Za-z0-9&/'-]*|a|an|and|for|of|the|to|we|you)){0,4})$"
+)
+BULLET = re.compile(r"^([-*•●▪]|\d+[.)])\s+")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+|\s+(?=[•●▪]\s)")
+WORD = re.compile(r"[a-z0-9][a-z0-9+#]*(?:\.[a-z0-9]+)*")
+
+# Sections that say nothing about the role itself
+BOILERPLATE = re.compile(
+    r"equal (employment )?opportunity|\beeo\b|regardless of (race|age|gender|religion)|"
+    r"reasonable accommodations?|without regard to|privacy (notice|policy)|"
+    r"unsolicited (resumes|applications)|recruitment agencies",
+    re.IGNORECASE
+)
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being both but by can could did do does
+doing for from had has have having he her here hers him his how i if in into is it its just me more
+most my no nor not of off on once only or other our ours out over own same she should so some such
+than that the their theirs them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours yourself
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased content words; keeps terms like c++, c#, node.js and ci/cd parts"""
+    terms = []
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        # Cheap plural folding so "APIs" matches "API"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def _chunk(lines: List[str], heading: str, max_tokens: int) -> List[str]:
+    """Split a section's lines into pieces of at most max_tokens, each keeping the heading"""
+    pieces, current = [], []
+    used = estimate_tokens(heading) if heading else 0
+    for line in lines:
+        line_tokens = estimate_tokens(line)
+        if current and used + line_tokens > max_tokens:
+            pieces.append(current)
+            current, used = [], estimate_tokens(heading) if heading else 0
+        current.append(line)
+        used += line_tokens
+    if current:
+        pieces.append(current)
+    return ["\n".join(([heading] if heading else []) + piece) for piece in pieces]
+
+
+def split_sections(job_description: str, max_section_tokens: int = 120) -> List[str]:
+    """
+    Split a JD into sections at headings and blank lines. Long sections are cut at
+    line (or, for text extracted without line breaks, sentence) boundaries so each
+    piece fits max_section_tokens and repeats its heading for context.
+    """
+    sections: List[str] = []
+    heading, lines = "", []
+    paragraph_break = False
+
+    def close():
+        if lines:
+            sections.extend(_chunk(lines, heading, max_section_tokens))
+        lines.clear()
+
+    for raw in job_description.splitlines():
+        line = raw.strip()
+        if not line:
+            paragraph_break = True
+            continue
+        if HEADING.match(line) and not BULLET.match(line):
+            close()
+            heading, paragraph_break = line, False
+            continue
+        # A blank line ends a paragraph, except between items of one bullet list
+        if paragraph_break and not (lines and BULLET.match(lines[-1]) and BULLET.match(line)):
+            close()
+        paragraph_break = False
+        if estimate_tokens(line) > max_section_tokens:
+            lines.extend(part.strip() for part in SENTENCE_BREAK.split(line) if part.strip())
+        else:
+            lines.append(line)
+    close()
+    return sections
+
+
+def _normalized(section: str) -> str:
+    return " ".join(WORD.findall(section.lower()))
+
+
+def dedupe_sections(sections: Iterable[str]) -> List[str]:
+    """Drop repeated sections and legal/EEO boilerplate (unless nothing else is left)"""
+    seen, kept, boilerplate = set(), [], []
+    for section in sections:
+        key = _normalized(section)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        (boilerplate if BOILERPLATE.search(section) else kept).append(section)
+    return kept or boilerplate
+
+
+class BM25Index:
+    """Okapi BM25 over pre-tokenized documents"""
+
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(doc) for doc in documents]
+        self.lengths = [len(doc) for doc in documents]
+        self.avg_length = (sum(self.lengths) / len(documents)) if documents else 0.0
+        doc_freq: Counter = Counter()
+        for counts in self.term_counts:
+            doc_freq.update(counts.keys())
+        total = len(documents)
+        self.idf: Dict[str, float] = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()
+        }
+
+    def scores(self, query_terms: Iterable[str]) -> List[float]:
+        terms = [term for term in set(query_terms) if term in self.idf]
+        results = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            score = 0.0
+            for term in terms:
+                tf = counts.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+class JDContext:
+    """A job description prepared once per analysis for per-prompt section selection"""
+
+    def __init__(self, job_description: str, max_section_tokens: int = 120):
+        self.text = job_description
+        self.sections = dedupe_sections(split_sections(job_description, max_section_tokens))
+        self.section_tokens = [estimate_tokens(section) for section in self.sections]
+        self.index = BM25Index([tokenize(section) for section in self.sections])
+        self.cleaned = "\n\n".join(self.sections)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def select(self, query: str, max_tokens: int, top_k: int = 4) -> str:
+        """
+        The top_k sections most relevant to query that fit in max_tokens, in document
+        order. A JD that fits entirely is returned whole (minus boilerplate); without
+        any matching terms the leading sections are used.
+        """
+        if estimate_tokens(self.cleaned) <= max_tokens:
+            return self.cleaned
+
+        scores = self.index.scores(tokenize(query))
+        ranked = sorted(range(len(self.sections)), key=lambda i: (-scores[i], i))
+        chosen, used = [], 0
+        for idx in ranked:
+            if len(chosen) >= top_k or (chosen and scores[idx] <= 0 < scores[chosen[0]]):
+                break
+            if used + self.section_tokens[idx] > max_tokens:
+                continue
+            chosen.append(idx)
+            used += self.section_tokens[idx]
+
+        if not chosen:
+            # Sections are capped well below typical budgets; cut the best one if not
+            return self.sections[ranked[0]][:max_tokens * 4] if self.sections else ""
+        return "\n\n".join(self.sections[idx] for idx in sorted(chosen))
@@ -0,0 +1,243 @@
+"""
+Analysis Job Queue
+Runs interview analyses in background asyncio workers.
+Jobs are persisted in MongoDB so they survive restarts and worker crashes.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import pymongo
+import pymongo.errors
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+# Server workers started together resume each active job once: the first to stamp it wins
+RESUME_WINDOW = timedelta(seconds=15)
+
+# handler(interview_id, progress_callback) -> result document
+JobHandler = Callable[[str, Callable[[str, int, int], Awaitable[None]]], Awaitable[Dict]]
+
+
+class AnalysisJobQueue:
+    def __init__(self, collection, handler: JobHandler, num_workers: int = 2, lease_seconds: int = 600):
+        self.collection = collection
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        # A running job whose lease expired is assumed to belong to a crashed worker
+        self.lease_seconds = lease_seconds
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        # Workers currently running a job, and whether shutdown has begun
+        self._busy: Set[asyncio.Task] = set()
+        self._draining = False
+
+    @classmethod
+    def from_env(cls, collection, handler: JobHandler) -> "AnalysisJobQueue":
+        return cls(
+            collection,
+            handler,
+            num_workers=int(os.getenv("ANALYSIS_WORKERS", "2")),
+            lease_seconds=int(os.getenv("ANALYSIS_JOB_LEASE_SECONDS", "600"))
+        )
+
+    async def start(self):
+        try:
+            await self._ensure_indexes()
+
+            # Resume jobs that were queued or running when the process last stopped
+            now = datetime.utcnow()
+            pending = []
+            async for doc in self.collection.find({"active": True}, {"_id": 1}).sort("createdAt", pymongo.ASCENDING):
+                stamped = await self.collection.find_one_and_update(
+                    {
+                        "_id": doc["_id"],
+                        "active": True,
+                        "$or": [{"resumedAt": None}, {"resumedAt": {"$lt": now - RESUME_WINDOW}}]
+                    },
+                    {"$set": {"resumedAt": now}},
+                    projection={"_id": 1}
+                )
+                if stamped is not None:
+                    pending.append(doc["_id"])
+            for job_id in pending:
+                self._queue.put_nowait(job_id)
+            if pending:
+                logger.info("Resuming %d analysis job(s)", len(pending))
+        except Exception as e:
+            logger.warning("Could not resume analysis jobs: %s", e)
+
+        self._workers = [
+            asyncio.create_task(self._worker(n)) for n in range(self.num_workers)
+        ]
+        logger.info("Analysis job queue started", extra={"workers": self.num_workers})
+
+    async def stop(self, drain_seconds: float = 0):
+        """
+        Stop the workers. Running jobs get up to drain_seconds to finish; jobs still
+        running after that (and queued ones) stay active and are resumed on the next start.
+        """
+        self._draining = True
+        busy = [worker for worker in self._workers if worker in self._busy]
+        if busy and drain_seconds > 0:
+            logger.info("Draining %d running analysis job(s)", len(busy))
+            await asyncio.wait(busy, timeout=drain_seconds)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._busy.clear()
+
+    async def _ensure_indexes(self):
+        await self.collection.create_index(
+            "interviewId",
+            unique=True,
+            partialFilterExpression={"active": True},
+            name="interviewId_active_unique"
+        )
+        await self.collection.create_index([("status", pymongo.ASCENDING), ("createdAt", pymongo.ASCENDING)])
+
+    async def enqueue(self, interview_id: str) -> Dict:
+        """Queue an analysis, returning the existing active job for this interview if there is one"""
+
+        now = datetime.utcnow()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "interviewId": interview_id,
+            "status": "queued",
+            "active": True,
+            "progress": {"stage": "queued", "completed": 0, "total": 0},
+            "result": None,
+            "error": None,
+            "attempts": 0,
+            "createdAt": now,
+            "updatedAt": now
+        }
+
+        # Upsert on (interviewId, active) so duplicate submissions share one job;
+        # the partial unique index turns a concurrent double insert into a retry
+        for attempt in range(2):
+            try:
+                existing = await self.collection.find_one_and_update(
+                    {"interviewId": interview_id, "active": True},
+                    {"$setOnInsert": job},
+                    upsert=True,
+                    return_document=ReturnDocument.BEFORE
+                )
+                break
+            except pymongo.errors.DuplicateKeyError:
+                if attempt:
+                    raise
+        if existing is not None:
+            logger.info("Analysis already queued", extra={"interviewId": interview_id, "jobId": existing["_id"]})
+            return existing
+
+        self._queue.put_nowait(job["_id"])
+        logger.info("Queued analysis job", extra={"interviewId": interview_id, "jobId": job["_id"]})
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        return await self.collection.find_one({"_id": job_id})
+
+    async def _claim(self, job_id: str) -> Optional[Dict]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {
+                "_id": job_id,
+                "$or": [
+                    {"status": "queued"},
+                    {"status": "running", "leaseUntil": {"$lt": now}}
+                ]
+            },
+            {
+                "$set": {
+                    "status": "running",
+                    "leaseUntil": now + timedelta(seconds=self.lease_seconds),
+                    "updatedAt": now
+                },
+                "$inc": {"attempts": 1}
+            },
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _update(self, job_id: str, fields: Dict):
+        fields["updatedAt"] = datetime.utcnow()
+        await self.collection.update_one({"_id": job_id}, {"$set": fields})
+
+    async def _worker(self, worker_number: int):
+        worker = asyncio.current_task()
+        while not self._draining:
+            job_id = await self._queue.get()
+            self._busy.add(worker)
+            try:
+                await self._run(job_id)
+            except Exception:
+                logger.exception("Job worker %d error", worker_number, extra={"jobId": job_id})
+            finally:
+                self._busy.discard(worker)
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        job = await self._claim(job_id)
+        if job is None:
+            # Finished already, or a (possibly crashed) worker still holds a live lease
+            current = await self.get(job_id)
+            if current and current.get("active") and current.get("leaseUntil"):
+                delay = (current["leaseUntil"] - datetime.utcnow()).total_seconds()
+                asyncio.get_running_loop().call_later(
+                    max(1.0, delay), self._queue.put_nowait, job_id
+                )
+            return
+
+        logger.info("Running analysis job", extra={"interviewId": job["interviewId"], "jobId": job_id})
+
+        async def progress(stage: str, completed: int, total: int):
+            # Each progress update also renews the lease
+            await self._update(job_id, {
+                "progress": {"stage": stage, "completed": completed, "total": total},
+                "leaseUntil": datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+            })
+
+        try:
+            result = await self.handler(job["interviewId"], progress)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job active so it is resumed on restart
+            await asyncio.shield(self._update(job_id, {"status": "queued"}))
+            raise
+        except Exception as e:
+            logger.error("Analysis job failed: %s", e, extra={"interviewId": job["interviewId"], "jobId": job_id})
+            await self._update(job_id, {"status": "failed", "active": False, "error": str(e)})
+            return
+
+        await self._update(job_id, {
+            "status": "completed",
+            "active": False,
+            "result": result,
+            "progress.stage": "completed"
+        })
+        logger.info("Analysis job completed", extra={"interviewId": job["interviewId"], "jobId": job_id})
+
+
+def serialize_job(job: Dict) -> Dict:
+    """Shape a job document for the API response"""
+    progress = job.get("progress") or {}
+    total = progress.get("total", 0)
+    message = progress.get("stage", "")
+    if progress.get("stage") == "scoring" and total:
+        message = f"{progress.get('completed', 0)}/{total} questions scored"
+
+    return {
+        "jobId": job["_id"],
+        "interviewId": job["interviewId"],
+        "status": job["status"],
+        "progress": {**progress, "message": message},
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "attempts": job.get("attempts", 0),
+        "createdAt": job["createdAt"].isoformat() if job.get("createdAt") else None,
+        "updatedAt": job["updatedAt"].isoformat() if job.get("updatedAt") else None
+    }
@@ -0,0 +1,225 @@
+"""
+Live Incremental Analysis
+Consumes final transcript segments while the interview is running. Question/answer
+boundaries are detected as turns arrive: when HR speaks after a candidate reply to an
+HR question, that pair is complete and its ideal answer and score are computed in the
+background. At the end the collected pairs are handed to the regular pipeline, which
+then only has to pair leftovers and write the summaries.
+Sessions live in the worker process that receives the segments, so with several
+workers this only works if the load balancer routes an interview's requests to one
+worker (LIVE_ANALYSIS_STICKY_ROUTING=true); otherwise it is disabled.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from services.batch_analysis import job_description_text
+from services.qa_pairing import is_question, segment_utterances
+from services.workers import server_workers
+
+logger = logging.getLogger(__name__)
+
+PairKey = Tuple[str, str]
+
+
+class LiveAnalysisDisabled(RuntimeError):
+    pass
+
+
+class LiveSession:
+    def __init__(self, interview_id: str, job_description: Optional[str] = None):
+        self.interview_id = interview_id
+        self.job_description = job_description
+        self.utterances: List[Dict] = []
+        # Consecutive same-speaker utterances merged, in arrival order
+        self.turns: List[Dict] = []
+        # Pairs in detection order, their background tasks and finished qaBreakdown entries
+        self.order: List[PairKey] = []
+        self.tasks: Dict[PairKey, asyncio.Task] = {}
+        self.entries: Dict[PairKey, Dict] = {}
+        self.touched = time.monotonic()
+
+    def add(self, role: str, text: str, timestamp=None) -> Optional[PairKey]:
+        """Add a final utterance; returns the (question, answer) pair it completes, if any"""
+        self.utterances.append({"role": role, "text": text, "timestamp": timestamp})
+        self.touched = time.monotonic()
+        if self.turns and self.turns[-1]["role"] == role:
+            self.turns[-1]["text"] += " " + text
+            return None
+
+        completed = None
+        if (
+            role == "hr"
+            and len(self.turns) >= 2
+            and self.turns[-1]["role"] == "candidate"
+            and self.turns[-2]["role"] == "hr"
+            and is_question(self.turns[-2]["text"])
+        ):
+            completed = (self.turns[-2]["text"], self.turns[-1]["text"])
+        self.turns.append({"role": role, "text": text})
+        return completed
+
+    def rolling_report(self) -> Dict:
+        breakdown = [self.entries[key] for key in self.order if key in self.entries]
+        scores = [entry["score"] for entry in breakdown]
+        return {
+            "interviewId": self.interview_id,
+            "utterances": len(self.utterances),
+            "pairsDetected": len(self.order),
+            "pairsScored": len(breakdown),
+            "pending": sum(1 for task in self.tasks.values() if not task.done()),
+            "runningScore": round(sum(scores) / len(scores) * 10, 2) if scores else None,
+            "qaBreakdown": breakdown
+        }
+
+
+class LiveAnalysisManager:
+    def __init__(
+        self,
+        analysis_service,
+        db=None,
+        max_sessions: int = 200,
+        idle_seconds: float = 4 * 3600,
+        enabled: bool = True
+    ):
+        self.analysis_service = analysis_service
+        self.db = db
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        # Sessions without new segments for this long are dropped (interview abandoned)
+        self.idle_seconds = idle_seconds
+        self.sessions: "OrderedDict[str, LiveSession]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls, analysis_service, db=None) -> "LiveAnalysisManager":
+        workers = server_workers()
+        enabled = os.getenv("LIVE_ANALYSIS_ENABLED", "true").lower() == "true"
+        if enabled and workers > 1 and os.getenv("LIVE_ANALYSIS_STICKY_ROUTING", "false").lower() != "true":
+            # Segments of one interview would be spread over workers, each scoring fragments
+            logger.warning("Live analysis disabled: %d workers without sticky routing", workers)
+            enabled = False
+        return cls(
+            analysis_service,
+            db,
+            max_sessions=int(os.getenv("LIVE_ANALYSIS_MAX_SESSIONS", "200")),
+            idle_seconds=float(os.getenv("LIVE_ANALYSIS_IDLE_SECONDS", str(4 * 3600))),
+            enabled=enabled
+        )
+
+    def _session(self, interview_id: str, job_description: Optional[str]) -> LiveSession:
+        self._expire()
+        session = self.sessions.get(interview_id)
+        if session is None:
+            session = LiveSession(interview_id, job_description)
+            self.sessions[interview_id] = session
+            while len(self.sessions) > self.max_sessions:
+                _, evicted = self.sessions.popitem(last=False)
+                self._cancel(evicted)
+                logger.warning("Live analysis session evicted", extra={"interviewId": evicted.interview_id})
+        elif job_description and not session.job_description:
+            session.job_description = job_description
+        self.sessions.move_to_end(interview_id)
+        return session
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for interview_id in [i for i, s in self.sessions.items() if s.touched < cutoff]:
+            self._cancel(self.sessions.pop(interview_id))
+
+    @staticmethod
+    def _cancel(session: LiveSession):
+        for task in session.tasks.values():
+            task.cancel()
+
+    async def append(self, interview_id: str, segments: List[Dict], job_description: Optional[str] = None) -> Dict:
+        """Add transcript segments (interim ones are ignored) and start work for completed pairs"""
+        if not self.enabled:
+            raise LiveAnalysisDisabled("Live analysis is disabled")
+        session = self._session(interview_id, job_description)
+        for segment in segments:
+            text = (segment.get("text") or "").strip()
+            if not segment.get("isFinal", True) or segment.get("role") not in ("hr", "candidate") or not text:
+                continue
+            pair = session.add(segment["role"], text, segment.get("timestamp"))
+            if pair is not None and pair not in session.tasks:
+                session.order.append(pair)
+                session.tasks[pair] = asyncio.create_task(self._score(session, pair))
+        return session.rolling_report()
+
+    def report(self, interview_id: str) -> Optional[Dict]:
+        session = self.sessions.get(interview_id)
+        return session.rolling_report() if session else None
+
+    async def _job_description(self, session: LiveSession) -> str:
+        if session.job_description is None:
+            session.job_description = ""
+            if self.db is not None:
+                try:
+                    interview = await self.db.interviews.find_one(
+                        {"interviewId": session.interview_id}, {"_id": 0, "jobDescription": 1}
+                    )
+                    session.job_description = job_description_text(interview or {})
+                except Exception as e:
+                    logger.warning("Could not load job description for live analysis: %s", e)
+        return session.job_description
+
+    async def _score(self, session: LiveSession, pair: PairKey):
+        question, answer = pair
+        try:
+            job_description = await self._job_description(session)
+            session.entries[pair] = await self.analysis_service.score_qa_pair(question, answer, job_description)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The pair is scored again when the report is finalized
+            logger.warning("Live scoring failed: %s", e, extra={"interviewId": session.interview_id})
+
+    async def finish(self, interview_id: str, stored_utterances: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        End the session and return its pairs in interview order, in Interview.qaPairs shape:
+        scored where live scoring finished, question/answer only otherwise. Returns None
+        (regular analysis) if there is no session or it missed stored transcript segments.
+        """
+        session = self.sessions.pop(interview_id, None)
+        if session is None:
+            return None
+        if stored_utterances is not None and len(session.utterances) < stored_utterances:
+            logger.warning("Live session is missing transcript segments; running full analysis", extra={
+                "interviewId": interview_id, "received": len(session.utterances), "stored": stored_utterances
+            })
+            self._cancel(session)
+            return None
+
+        await asyncio.gather(*session.tasks.values(), return_exceptions=True)
+
+        # Re-segment in timestamp order: HR and candidate segments can arrive slightly out of order
+        pairs: List[Dict] = []
+        for segment in segment_utterances(session.utterances):
+            if segment["type"] == "pair":
+                key = (segment["question"], segment["answer"])
+                pairs.append(session.entries.get(key) or {
+                    "question": segment["question"], "candidateAnswer": segment["answer"]
+                })
+            elif segment["hr"] and segment["candidate"]:
+                resolved = await self.analysis_service.pair_questions_and_answers(
+                    segment["hr"], segment["candidate"]
+                )
+                # The LLM's items are not guaranteed to be objects
+                pairs.extend(
+                    {"question": pair.get("question", ""), "candidateAnswer": pair.get("answer", "")}
+                    for pair in resolved if isinstance(pair, dict)
+                )
+        logger.info("Live session finished", extra={
+            "interviewId": interview_id, "pairs": len(pairs), "scoredLive": len(session.entries)
+        })
+        return pairs
+
+    async def close(self):
+        tasks = [task for session in self.sessions.values() for task in session.tasks.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.sessions.clear()
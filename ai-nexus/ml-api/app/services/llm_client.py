@@ -0,0 +1,365 @@
+"""
+LLM Client Layer
+Async provider clients that share one pooled HTTP connection pool.
+Every call goes through the provider's rate limiter, retry policy and circuit breaker.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Optional, Tuple
+import httpx
+import openai
+import anthropic
+from openai import AsyncOpenAI
+from anthropic import AsyncAnthropic
+from services.metrics import record_llm_call, record_retry
+from services.rate_limit import RateLimiter, RetryPolicy, CircuitBreaker
+from services.tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# 529 is Anthropic's "overloaded"
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+CONNECTION_ERRORS = (
+    openai.APIConnectionError, anthropic.APIConnectionError, httpx.TransportError, asyncio.TimeoutError
+)
+
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, server errors, timeouts and dropped connections are worth retrying"""
+    return isinstance(error, CONNECTION_ERRORS) or getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from the Retry-After (or retry-after-ms) header of a failed response"""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            # HTTP-date form
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMProvider:
+    """Base class for an async LLM provider"""
+
+    name = "base"
+
+    def __init__(self, default_model: str, max_connections: int):
+        self.default_model = default_model
+        # Per-provider cap on concurrent requests (one request per pooled connection)
+        self._connection_slots = asyncio.Semaphore(max_connections)
+        self.limiter = RateLimiter.from_env(self.name)
+        self.retry = RetryPolicy.from_env()
+        self.breaker = CircuitBreaker.from_env(self.name)
+
+    async def complete(
+        self,
+        prompt: str,
+        require_json: bool = False,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        task: str = "other"
+    ) -> str:
+        model = model or self.default_model
+        # Providers count max_tokens against the tokens/min limit up front
+        reserved = estimate_tokens(prompt) + (max_tokens or 0)
+        attempt = 0
+        while True:
+            trial = await self._admit(reserved)
+            try:
+                text, prompt_tokens, completion_tokens = await self._attempt(
+                    prompt, require_json, model, temperature, max_tokens, task
+                )
+            except Exception as e:
+                await self._after_failure(e, attempt, task, trial)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release(trial)
+                raise
+            self._after_success(reserved, prompt_tokens + completion_tokens, trial)
+            return text
+
+    async def _attempt(
+        self, prompt: str, require_json: bool, model: str, temperature: float, max_tokens: Optional[int], task: str
+    ) -> Tuple[str, int, int]:
+        async with self._connection_slots:
+            started = time.perf_counter()
+            prompt_tokens = completion_tokens = 0
+            ok = False
+            try:
+                text, prompt_tokens, completion_tokens = await self._complete(
+                    prompt, require_json, model, temperature, max_tokens
+                )
+                ok = True
+                return text, prompt_tokens, completion_tokens
+            finally:
+                record_llm_call(
+                    self.name, model, task, time.perf_counter() - started,
+                    prompt_tokens, completion_tokens, ok
+                )
+
+    async def stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        task: str = "other"
+    ) -> AsyncIterator[str]:
+        """
+        Yield text chunks as the provider generates them.
+        Failures before the first chunk are retried; later ones are raised to the caller.
+        """
+        model = model or self.default_model
+        reserved = estimate_tokens(prompt) + (max_tokens or 0)
+        attempt = 0
+        while True:
+            trial = await self._admit(reserved)
+            completion_tokens = 0
+            started_output = False
+            try:
+                async for text in self._stream_attempt(prompt, model, temperature, max_tokens, task):
+                    started_output = True
+                    completion_tokens += estimate_tokens(text)
+                    yield text
+            except Exception as e:
+                if started_output:
+                    self._record_failure(e, trial)
+                    raise
+                await self._after_failure(e, attempt, task, trial)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release(trial)
+                raise
+            self._after_success(reserved, estimate_tokens(prompt) + completion_tokens, trial)
+            return
+
+    async def _stream_attempt(
+        self, prompt: str, model: str, temperature: float, max_tokens: Optional[int], task: str
+    ) -> AsyncIterator[str]:
+        async with self._connection_slots:
+            started = time.perf_counter()
+            completion_tokens = 0
+            ok = False
+            try:
+                async for text in self._stream(prompt, model, temperature, max_tokens):
+                    # Streaming responses carry no usage block, so tokens are estimated
+                    completion_tokens += estimate_tokens(text)
+                    yield text
+                ok = True
+            finally:
+                record_llm_call(
+                    self.name, model, task, time.perf_counter() - started,
+                    estimate_tokens(prompt), completion_tokens, ok
+                )
+
+    async def _admit(self, reserved: int) -> Optional[object]:
+        """
+        Circuit check, then the rate limit wait; returns the half-open trial token, if any.
+        A cancelled wait (router timeout, losing hedge) must give back a half-open trial,
+        or the circuit would never close again.
+        """
+        trial = self.breaker.check()
+        try:
+            await self.limiter.acquire(reserved)
+        except BaseException:
+            self.breaker.release(trial)
+            raise
+        return trial
+
+    def _after_success(self, reserved: int, used: int, trial: Optional[object] = None):
+        self.breaker.record_success(trial)
+        self.limiter.on_success()
+        self.limiter.record_usage(reserved, used)
+
+    def _record_failure(self, error: Exception, trial: Optional[object] = None):
+        if getattr(error, "status_code", None) == 429:
+            # Throttled, not down: slow every caller instead of tripping the breaker
+            self.limiter.on_rate_limited(retry_after(error))
+            self.breaker.release(trial)
+        elif is_transient(error):
+            self.breaker.record_failure(trial)
+        else:
+            self.breaker.release(trial)
+
+    async def _after_failure(self, error: Exception, attempt: int, task: str, trial: Optional[object] = None):
+        """Record a failed attempt, then re-raise it or sleep before the next one"""
+        self._record_failure(error, trial)
+        if attempt >= self.retry.max_retries or not is_transient(error):
+            raise error
+        delay = self.retry.delay(attempt, retry_after(error))
+        logger.warning("LLM request failed, retrying in %.2fs: %s", delay, error, extra={
+            "provider": self.name, "task": task, "attempt": attempt + 1
+        })
+        record_retry(self.name)
+        await asyncio.sleep(delay)
+
+    async def _complete(
+        self, prompt: str, require_json: bool, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> Tuple[str, int, int]:
+        """Returns (text, prompt tokens, completion tokens)"""
+        raise NotImplementedError
+
+    def _stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> AsyncIterator[str]:
+        raise NotImplementedError
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, http_client: httpx.AsyncClient, timeout: httpx.Timeout, max_connections: int):
+        super().__init__(os.getenv("OPENAI_MODEL", "gpt-4"), max_connections)
+        self.client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            timeout=timeout,
+            # Retries are handled by LLMProvider so they respect the shared rate limiter
+            max_retries=0
+        )
+
+    async def _complete(
+        self, prompt: str, require_json: bool, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> Tuple[str, int, int]:
+        kwargs = {}
+        if require_json:
+            kwargs["response_format"] = {"type": "json_object"}
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            **kwargs
+        )
+        usage = response.usage
+        return (
+            response.choices[0].message.content,
+            usage.prompt_tokens if usage else 0,
+            usage.completion_tokens if usage else 0
+        )
+
+    async def _stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> AsyncIterator[str]:
+        kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            stream=True,
+            **kwargs
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class AnthropicProvider(LLMProvider):
+    name = "anthropic"
+
+    def __init__(self, http_client: httpx.AsyncClient, timeout: httpx.Timeout, max_connections: int):
+        super().__init__(os.getenv("ANTHROPIC_MODEL", "claude-3-opus-20240229"), max_connections)
+        self.client = AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            http_client=http_client,
+            timeout=timeout,
+            max_retries=0
+        )
+
+    async def _complete(
+        self, prompt: str, require_json: bool, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> Tuple[str, int, int]:
+        message = await self.client.messages.create(
+            model=model,
+            max_tokens=max_tokens or 2000,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return message.content[0].text, message.usage.input_tokens, message.usage.output_tokens
+
+    async def _stream(
+        self, prompt: str, model: str, temperature: float, max_tokens: Optional[int]
+    ) -> AsyncIterator[str]:
+        async with self.client.messages.stream(
+            model=model,
+            max_tokens=max_tokens or 2000,
+            temperature=temperature,
+            messages=[{"role": "user", "content": prompt}]
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+
+class LLMClients:
+    """
+    Owns the shared HTTP pool and the configured providers.
+    Created once per process: call start() on app startup and close() on shutdown.
+    """
+
+    def __init__(self):
+        self.providers: Dict[str, LLMProvider] = {}
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._http_client is not None:
+            return
+
+        openai_limit = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+        anthropic_limit = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "20"))
+        timeout = httpx.Timeout(
+            float(os.getenv("LLM_REQUEST_TIMEOUT", "60")),
+            connect=float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+        )
+
+        self._http_client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=openai_limit + anthropic_limit,
+                max_keepalive_connections=openai_limit + anthropic_limit,
+                keepalive_expiry=float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+            )
+        )
+
+        if os.getenv("OPENAI_API_KEY"):
+            self.providers["openai"] = OpenAIProvider(self._http_client, timeout, openai_limit)
+        if os.getenv("ANTHROPIC_API_KEY"):
+            self.providers["anthropic"] = AnthropicProvider(self._http_client, timeout, anthropic_limit)
+        if os.getenv("LLM_PROVIDER") == "fake" or os.getenv("FAKE_LLM_ENABLED", "false").lower() == "true":
+            # Offline stand-in for development and benchmarks
+            from services.fake_llm import FakeProvider
+            self.providers["fake"] = FakeProvider.from_env()
+
+        logger.info("LLM clients ready", extra={"providers": list(self.providers)})
+
+    def get(self, name: str) -> LLMProvider:
+        provider = self.providers.get(name)
+        if provider is None:
+            raise ValueError(f"LLM provider '{name}' is not configured")
+        return provider
+
+    async def close(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+        self.providers = {}
@@ -0,0 +1,289 @@
+"""
+LLM Routing
+Sends each request to an ordered list of provider/model targets, falling back
+to the next target on errors or timeouts. Latency-critical calls can be hedged:
+if the first target has not answered by its recent p95 latency, a second request
+goes to the next target and whichever finishes first wins.
+Each pipeline task has its own targets, temperature and max tokens, so mechanical
+JSON tasks can run on a small model and escalate to the default (strong) targets.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, NamedTuple, Optional, Tuple
+from services.llm_client import LLMClients, LLMProvider
+
+logger = logging.getLogger(__name__)
+
+
+class LLMTarget(NamedTuple):
+    provider: str
+    model: Optional[str] = None  # None uses the provider's default model
+
+    def __str__(self) -> str:
+        return f"{self.provider}:{self.model}" if self.model else self.provider
+
+
+class TaskProfile(NamedTuple):
+    targets: List[LLMTarget]
+    temperature: float = 0.7
+    max_tokens: Optional[int] = None
+
+
+# (temperature, max tokens) per task; JSON tasks run cold for stable output
+TASK_DEFAULTS: Dict[str, Tuple[float, Optional[int]]] = {
+    "pairing": (0.0, None),
+    "ideal_answer": (0.7, 800),
+    "scoring": (0.0, 300),
+    "hr_summary": (0.7, 800),
+    "candidate_summary": (0.7, 800)
+}
+
+
+def parse_targets(spec: str) -> List[LLMTarget]:
+    """Parse "openai:gpt-4,anthropic" into targets, in order"""
+    targets = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        provider, _, model = item.partition(":")
+        targets.append(LLMTarget(provider.strip(), model.strip() or None))
+    return targets
+
+
+class LatencyWindow:
+    """Recent successful latencies for one target, used to pick the hedge deadline"""
+
+    def __init__(self, size: int = 200):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        llm_clients: LLMClients,
+        targets: List[LLMTarget],
+        profiles: Optional[Dict[str, TaskProfile]] = None,
+        target_timeout: float = 120.0,
+        hedge_enabled: bool = False,
+        hedge_percentile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_default_delay: float = 3.0
+    ):
+        self.llm_clients = llm_clients
+        # Default targets: used for tasks without their own, and for escalation
+        self.targets = targets
+        self.profiles = profiles or {}
+        # Upper bound on one target (including its retries) before falling back
+        self.target_timeout = target_timeout
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        # Used until a target has enough samples for a percentile
+        self.hedge_default_delay = hedge_default_delay
+        self._latencies: Dict[Tuple[LLMTarget, str], LatencyWindow] = {}
+
+    @classmethod
+    def from_env(cls, llm_clients: LLMClients) -> "LLMRouter":
+        """
+        Targets come from LLM_TARGETS ("openai:gpt-4,anthropic:claude-3-opus-20240229");
+        without it, LLM_PROVIDER is the only target. Each task in TASK_DEFAULTS reads
+        LLM_<TASK>_TARGETS, LLM_<TASK>_TEMPERATURE and LLM_<TASK>_MAX_TOKENS.
+        """
+        spec = os.getenv("LLM_TARGETS") or os.getenv("LLM_PROVIDER", "openai")
+        targets = parse_targets(spec)
+
+        profiles = {}
+        for task, (temperature, max_tokens) in TASK_DEFAULTS.items():
+            prefix = f"LLM_{task.upper()}"
+            task_max_tokens = os.getenv(f"{prefix}_MAX_TOKENS")
+            profiles[task] = TaskProfile(
+                targets=parse_targets(os.getenv(f"{prefix}_TARGETS", "")) or targets,
+                temperature=float(os.getenv(f"{prefix}_TEMPERATURE", str(temperature))),
+                max_tokens=int(task_max_tokens) if task_max_tokens else max_tokens
+            )
+        # Batch scoring runs on the scoring model, but its output grows with the batch
+        profiles["batch_scoring"] = profiles["scoring"]._replace(max_tokens=None)
+
+        return cls(
+            llm_clients,
+            targets,
+            profiles,
+            target_timeout=float(os.getenv("LLM_TARGET_TIMEOUT", "120")),
+            hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+            hedge_default_delay=float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "3"))
+        )
+
+    def available(self, targets: Optional[List[LLMTarget]] = None) -> List[Tuple[LLMTarget, LLMProvider]]:
+        """Targets whose provider is configured, in order"""
+        resolved = [
+            (target, self.llm_clients.providers.get(target.provider))
+            for target in (targets or self.targets)
+        ]
+        resolved = [(target, provider) for target, provider in resolved if provider is not None]
+        if not resolved:
+            names = ", ".join(str(target) for target in (targets or self.targets))
+            raise ValueError(f"No configured LLM provider among targets: {names}")
+        return resolved
+
+    def profile(self, task: str) -> TaskProfile:
+        return self.profiles.get(task) or TaskProfile(self.targets)
+
+    def can_escalate(self, task: str) -> bool:
+        """Whether the task runs on targets other than the default (stronger) ones"""
+        return self.profile(task).targets != self.targets
+
+    @staticmethod
+    def model_name(target: LLMTarget, provider: LLMProvider) -> str:
+        return f"{target.provider}:{target.model or provider.default_model}"
+
+    def primary_model(self, task: Optional[str] = None) -> str:
+        """"provider:model" of the task's first configured target (part of cache keys)"""
+        targets = self.profile(task).targets if task else self.targets
+        try:
+            target, provider = self.available(targets)[0]
+        except ValueError:
+            return f"{targets[0].provider}:unconfigured"
+        return self.model_name(target, provider)
+
+    def hedge_delay(self, target: LLMTarget, task: str) -> float:
+        window = self._latencies.get((target, task))
+        if window is None or len(window.samples) < self.hedge_min_samples:
+            return self.hedge_default_delay
+        return window.percentile(self.hedge_percentile)
+
+    async def complete(
+        self,
+        prompt: str,
+        require_json: bool = False,
+        task: str = "other",
+        hedge: bool = False,
+        escalate: bool = False
+    ) -> str:
+        """
+        Complete with the task's profile. escalate=True uses the default targets
+        instead, e.g. after the task's model returned invalid JSON.
+        """
+        text, _ = await self.complete_with_model(prompt, require_json, task, hedge, escalate)
+        return text
+
+    async def complete_with_model(
+        self,
+        prompt: str,
+        require_json: bool = False,
+        task: str = "other",
+        hedge: bool = False,
+        escalate: bool = False
+    ) -> Tuple[str, str]:
+        """complete(), also returning the "provider:model" that answered (differs after a fallback)"""
+        profile = self.profile(task)
+        targets = self.targets if escalate else profile.targets
+        temperature, max_tokens = profile.temperature, profile.max_tokens
+        candidates = self.available(targets)
+
+        async def call(target: LLMTarget, provider: LLMProvider) -> Tuple[str, str]:
+            started = time.perf_counter()
+            text = await asyncio.wait_for(
+                provider.complete(
+                    prompt, require_json=require_json, model=target.model,
+                    temperature=temperature, max_tokens=max_tokens, task=task
+                ),
+                self.target_timeout
+            )
+            self._latencies.setdefault((target, task), LatencyWindow()).add(time.perf_counter() - started)
+            return text, self.model_name(target, provider)
+
+        last_error: Optional[Exception] = None
+        idx = 0
+        if hedge and self.hedge_enabled and len(candidates) > 1:
+            try:
+                return await self._hedged(call, candidates[0], candidates[1], task)
+            except Exception as e:
+                last_error = e
+            idx = 2
+
+        for target, provider in candidates[idx:]:
+            try:
+                return await call(target, provider)
+            except Exception as e:
+                last_error = e
+                logger.warning("LLM target failed, trying next: %s", str(e) or type(e).__name__, extra={
+                    "target": str(target), "task": task
+                })
+        raise last_error
+
+    async def _hedged(self, call, first, second, task: str) -> Tuple[str, str]:
+        """Race `first` against a `second` request started after the hedge delay"""
+        delay = self.hedge_delay(first[0], task)
+        primary = asyncio.create_task(call(*first))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done or primary.exception() is not None:
+                logger.info("Hedging LLM request", extra={
+                    "target": str(second[0]), "task": task, "afterMs": round(delay * 1000)
+                })
+                pending.add(asyncio.create_task(call(*second)))
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task_done in done:
+                    if task_done.exception() is None:
+                        return task_done.result()
+                    error = task_done.exception()
+            raise error
+        finally:
+            # Cancel the loser (or both, if the caller was cancelled)
+            for pending_task in pending:
+                pending_task.cancel()
+
+    async def stream(
+        self,
+        prompt: str,
+        task: str = "other"
+    ) -> AsyncIterator[str]:
+        """Stream from the first target that produces output; falls back only before the first chunk"""
+        async for text, _ in self.stream_with_model(prompt, task):
+            yield text
+
+    async def stream_with_model(
+        self,
+        prompt: str,
+        task: str = "other"
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """stream(), yielding (text, "provider:model" of the target producing it)"""
+        profile = self.profile(task)
+        temperature, max_tokens = profile.temperature, profile.max_tokens
+        last_error: Optional[Exception] = None
+        for target, provider in self.available(profile.targets):
+            started_output = False
+            try:
+                async for text in provider.stream(
+                    prompt, model=target.model, temperature=temperature, max_tokens=max_tokens, task=task
+                ):
+                    started_output = True
+                    yield text, self.model_name(target, provider)
+                return
+            except Exception as e:
+                if started_output:
+                    raise
+                last_error = e
+                logger.warning("LLM target failed, trying next: %s", str(e) or type(e).__name__, extra={
+                    "target": str(target), "task": task
+                })
+        raise last_error
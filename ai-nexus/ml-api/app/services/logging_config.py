@@ -0,0 +1,46 @@
+"""
+Logging configuration
+Leveled logging for the ML API, as JSON lines (default) or plain text.
+Pass structured fields with `extra={...}`; they become top-level JSON keys.
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timezone
+
+# Attributes every LogRecord has; anything else came in through `extra`
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    """Configure the root logger from LOG_LEVEL and LOG_FORMAT (json or text)"""
+    root = logging.getLogger()
+    if getattr(root, "_ai_nexus_configured", False):
+        return
+
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    root._ai_nexus_configured = True
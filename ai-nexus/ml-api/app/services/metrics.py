@@ -0,0 +1,181 @@
+"""
+Metrics and Tracing
+Prometheus counters/histograms for the /metrics route, plus a per-report trace
+that collects pipeline stage timings and LLM call usage for the report document.
+With several server workers, PROMETHEUS_MULTIPROC_DIR (set by run.py --production)
+makes every worker write its samples there and each scrape aggregates all of them.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from prometheus_client import CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+
+LLM_REQUESTS = Counter(
+    "llm_requests_total", "LLM requests by outcome", ["provider", "model", "task", "status"]
+)
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "LLM request latency", ["provider", "model", "task"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "LLM tokens consumed", ["provider", "model", "kind"]
+)
+LLM_RETRIES = Counter(
+    "llm_retries_total", "LLM request retries", ["provider"]
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by result", ["cache", "result"]
+)
+STAGE_LATENCY = Histogram(
+    "analysis_stage_duration_seconds", "Analysis pipeline stage latency", ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+ANALYSES = Counter(
+    "analyses_total", "Completed analyses by outcome", ["status"]
+)
+PRESCORES = Counter(
+    "answer_prescores_total", "Answers by local pre-scoring band", ["band"]
+)
+
+
+class Trace:
+    """Timing and usage collected while producing one report"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.tasks: Dict[str, Dict] = {}
+        self.retries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.prescored = 0
+
+    def add_stage(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_llm_call(self, task: str, seconds: float, prompt_tokens: int, completion_tokens: int, ok: bool):
+        entry = self.tasks.setdefault(task, {
+            "calls": 0, "errors": 0, "ms": 0.0, "promptTokens": 0, "completionTokens": 0
+        })
+        entry["calls"] += 1
+        entry["errors"] += 0 if ok else 1
+        entry["ms"] += seconds * 1000
+        entry["promptTokens"] += prompt_tokens
+        entry["completionTokens"] += completion_tokens
+
+    def summary(self) -> Dict:
+        tasks = {
+            task: {**entry, "ms": round(entry["ms"], 1)} for task, entry in self.tasks.items()
+        }
+        return {
+            "totalMs": round((time.perf_counter() - self.started) * 1000, 1),
+            "stagesMs": {name: round(seconds * 1000, 1) for name, seconds in self.stages.items()},
+            "llmCalls": sum(entry["calls"] for entry in tasks.values()),
+            "promptTokens": sum(entry["promptTokens"] for entry in tasks.values()),
+            "completionTokens": sum(entry["completionTokens"] for entry in tasks.values()),
+            "retries": self.retries,
+            "cacheHits": self.cache_hits,
+            "cacheMisses": self.cache_misses,
+            "prescored": self.prescored,
+            "byTask": tasks
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("analysis_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_scope() -> Iterator[Trace]:
+    """Join the active trace, or start one for the duration of the block"""
+    trace = _current_trace.get()
+    if trace is not None:
+        yield trace
+        return
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage into the stage histogram and the active trace"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_LATENCY.labels(name).observe(elapsed)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_stage(name, elapsed)
+
+
+def record_llm_call(
+    provider: str,
+    model: str,
+    task: str,
+    seconds: float,
+    prompt_tokens: int,
+    completion_tokens: int,
+    ok: bool
+):
+    LLM_REQUESTS.labels(provider, model, task, "ok" if ok else "error").inc()
+    LLM_LATENCY.labels(provider, model, task).observe(seconds)
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion_tokens)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_llm_call(task, seconds, prompt_tokens, completion_tokens, ok)
+
+
+def record_retry(provider: str):
+    LLM_RETRIES.labels(provider).inc()
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.retries += 1
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+    trace = _current_trace.get()
+    if trace is not None:
+        if hit:
+            trace.cache_hits += 1
+        else:
+            trace.cache_misses += 1
+
+
+def record_prescore(band: str, local: bool):
+    """local=True when the answer's score was decided without an LLM call"""
+    PRESCORES.labels(band).inc()
+    trace = _current_trace.get()
+    if trace is not None and local:
+        trace.prescored += 1
+
+
+def record_analysis(ok: bool):
+    ANALYSES.labels("ok" if ok else "error").inc()
+
+
+def render_metrics():
+    """(body, content type) for the Prometheus scrape endpoint, summed over all workers"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
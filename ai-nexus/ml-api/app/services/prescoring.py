@@ -0,0 +1,212 @@
+"""
+Answer Pre-Scoring
+Local TF-IDF similarity between each candidate answer, its ideal answer and the
+relevant JD sections, computed with NumPy for all answers of a report at once.
+Empty and near-verbatim answers get a deterministic score; everything else is sent
+to the LLM. Short and low-similarity answers are not scored locally (a terse "Yes"
+or a paraphrase can be a good answer) but their local estimate is recorded for
+calibration. In offline mode every answer is scored locally. Off by default.
+"""
+
+import os
+import random
+import logging
+from collections import deque
+from typing import Deque, Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+from services.jd_context import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class PreScore(NamedTuple):
+    similarity: float              # weighted cosine similarity, 0-1
+    score: Optional[int]           # None = needs the LLM
+    band: str                      # empty, short, off_topic, high, ambiguous or offline
+    justification: str
+    estimate: Optional[int] = None  # local score when the LLM decides, for calibration
+
+
+def tfidf_matrix(documents: Sequence[List[str]]) -> np.ndarray:
+    """L2-normalized TF-IDF rows (sublinear tf, smoothed idf) over the documents' own vocabulary"""
+    vocabulary: Dict[str, int] = {}
+    for doc in documents:
+        for term in doc:
+            vocabulary.setdefault(term, len(vocabulary))
+    matrix = np.zeros((len(documents), max(1, len(vocabulary))), dtype=np.float32)
+    for row, doc in enumerate(documents):
+        for term in doc:
+            matrix[row, vocabulary[term]] += 1
+    np.log1p(matrix, out=matrix)
+    doc_freq = np.count_nonzero(matrix, axis=0)
+    matrix *= np.log((1 + len(documents)) / (1 + doc_freq)) + 1
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class AnswerPreScorer:
+    """
+    mode: "off" (every answer goes to the LLM), "hybrid" (empty and near-verbatim answers
+    are scored locally) or "offline" (no LLM scoring calls at all).
+    Similarity is a weighted sum of the answer's cosine similarity to the ideal answer
+    and to the JD sections selected for the question.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        low_threshold: float = 0.05,
+        high_threshold: float = 0.8,
+        min_answer_terms: int = 3,
+        jd_weight: float = 0.2,
+        calibration_sample_rate: float = 0.0,
+        calibration_size: int = 2000
+    ):
+        self.mode = mode
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.min_answer_terms = min_answer_terms
+        self.jd_weight = min(1.0, max(0.0, jd_weight))
+        # Share of clear-cut answers still scored by the LLM, to measure local accuracy
+        self.calibration_sample_rate = calibration_sample_rate
+        self.samples: Deque[Dict] = deque(maxlen=calibration_size)
+
+    @classmethod
+    def from_env(cls) -> "AnswerPreScorer":
+        return cls(
+            mode=os.getenv("PRESCORE_MODE", "off").lower(),
+            low_threshold=float(os.getenv("PRESCORE_LOW_THRESHOLD", "0.05")),
+            high_threshold=float(os.getenv("PRESCORE_HIGH_THRESHOLD", "0.8")),
+            min_answer_terms=int(os.getenv("PRESCORE_MIN_ANSWER_TERMS", "3")),
+            jd_weight=float(os.getenv("PRESCORE_JD_WEIGHT", "0.2")),
+            calibration_sample_rate=float(os.getenv("PRESCORE_CALIBRATION_SAMPLE_RATE", "0"))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("hybrid", "offline")
+
+    def similarities(self, items: List[Dict], jd_excerpts: List[str]) -> np.ndarray:
+        """Weighted similarity for each {question, candidateAnswer, idealAnswer} item"""
+        count = len(items)
+        if not count:
+            return np.zeros(0, dtype=np.float32)
+        # Rows: answers, then ideal answers, then JD excerpts; one shared vocabulary and idf
+        documents = (
+            [tokenize(item["candidateAnswer"]) for item in items]
+            + [tokenize(item["idealAnswer"] or item["question"]) for item in items]
+            + [tokenize(excerpt) for excerpt in jd_excerpts]
+        )
+        matrix = tfidf_matrix(documents)
+        answers, ideals, jds = matrix[:count], matrix[count:2 * count], matrix[2 * count:]
+        ideal_similarity = np.einsum("ij,ij->i", answers, ideals)
+        jd_similarity = np.einsum("ij,ij->i", answers, jds)
+        return (1 - self.jd_weight) * ideal_similarity + self.jd_weight * jd_similarity
+
+    def score(self, items: List[Dict], jd_excerpts: List[str]) -> List[PreScore]:
+        """Pre-scores for all items; score is None where the LLM should decide"""
+        similarities = self.similarities(items, jd_excerpts)
+        return [
+            self._decide(item, float(similarity))
+            for item, similarity in zip(items, similarities)
+        ]
+
+    def _decide(self, item: Dict, similarity: float) -> PreScore:
+        similarity = round(similarity, 4)
+        answer_terms = len(tokenize(item["candidateAnswer"]))
+        if answer_terms == 0:
+            return PreScore(similarity, 0, "empty", "No answer was given.")
+        if answer_terms < self.min_answer_terms:
+            return self._uncalibrated(
+                PreScore(similarity, 1, "short", "The answer is too short to address the question.")
+            )
+        if similarity <= self.low_threshold:
+            return self._uncalibrated(PreScore(
+                similarity, 1, "off_topic",
+                "The answer does not address the question or the role's requirements."
+            ))
+        if similarity >= self.high_threshold:
+            return PreScore(
+                similarity, 9 if similarity < 0.9 else 10, "high",
+                "The answer closely matches the key points of the ideal answer."
+            )
+        if self.mode == "offline":
+            return PreScore(
+                similarity, self.offline_score(similarity), "offline",
+                f"Estimated locally from {round(similarity * 100)}% similarity to the ideal answer."
+            )
+        return PreScore(similarity, None, "ambiguous", "")
+
+    def _uncalibrated(self, prescore: PreScore) -> PreScore:
+        """
+        Term overlap cannot tell a short or paraphrased valid answer from an off-topic one,
+        so outside offline mode these go to the LLM; the local score is kept as an estimate
+        """
+        if self.mode == "offline":
+            return prescore
+        return PreScore(prescore.similarity, None, prescore.band, "", prescore.score)
+
+    def offline_score(self, similarity: float) -> int:
+        """Linear map of the ambiguous band onto 2-8"""
+        span = max(self.high_threshold - self.low_threshold, 1e-6)
+        fraction = min(1.0, max(0.0, (similarity - self.low_threshold) / span))
+        return int(round(2 + fraction * 6))
+
+    def should_sample(self, prescore: PreScore) -> bool:
+        """Whether to also send a clear-cut answer to the LLM for calibration"""
+        return (
+            self.mode == "hybrid"
+            and prescore.score is not None
+            and random.random() < self.calibration_sample_rate
+        )
+
+    def record(self, prescore: PreScore, llm_score: int):
+        """Store an (local, LLM) outcome for the calibration report"""
+        self.samples.append({
+            "similarity": prescore.similarity,
+            "band": prescore.band,
+            "predicted": prescore.score if prescore.score is not None else prescore.estimate,
+            "llmScore": llm_score
+        })
+
+    def calibration_report(self) -> Dict:
+        """
+        Agreement of local scores (or estimates, for bands the LLM decides) with LLM scores
+        per band, and the mean LLM score per similarity bucket, for choosing the thresholds.
+        """
+        bands: Dict[str, Dict] = {}
+        for sample in self.samples:
+            if sample["predicted"] is None:
+                continue
+            entry = bands.setdefault(sample["band"], {"samples": 0, "absError": 0, "withinOne": 0})
+            error = abs(sample["predicted"] - sample["llmScore"])
+            entry["samples"] += 1
+            entry["absError"] += error
+            entry["withinOne"] += 1 if error <= 1 else 0
+
+        buckets: Dict[float, List[int]] = {}
+        for sample in self.samples:
+            bucket = min(0.9, int(sample["similarity"] * 10) / 10)
+            buckets.setdefault(bucket, []).append(sample["llmScore"])
+
+        return {
+            "mode": self.mode,
+            "thresholds": {"low": self.low_threshold, "high": self.high_threshold},
+            "samples": len(self.samples),
+            "bands": {
+                band: {
+                    "samples": entry["samples"],
+                    "meanAbsError": round(entry["absError"] / entry["samples"], 2),
+                    "withinOnePoint": round(entry["withinOne"] / entry["samples"], 3)
+                }
+                for band, entry in bands.items()
+            },
+            "llmScoreBySimilarity": [
+                {
+                    "similarity": f"{bucket:.1f}-{bucket + 0.1:.1f}",
+                    "samples": len(scores),
+                    "meanLlmScore": round(sum(scores) / len(scores), 2)
+                }
+                for bucket, scores in sorted(buckets.items())
+            ]
+        }
@@ -0,0 +1,173 @@
+"""
+Deterministic Q&A Pairing
+Groups time-ordered transcript utterances into question/answer pairs without an LLM.
+Consecutive HR turns form a question and the candidate turns that follow form its answer.
+Also splits long transcripts into overlapping windows for LLM extraction.
+"""
+
+import re
+import math
+from typing import Dict, List, Tuple
+from services.answer_cache import normalize_question
+from services.tokens import estimate_tokens
+
+# Openers that make an HR turn a question even without a question mark
+QUESTION_OPENERS = re.compile(
+    r"\b(what|why|how|when|where|which|who|whom|whose|"
+    r"can you|could you|would you|will you|do you|did you|have you|are you|is there|"
+    r"tell me|tell us|describe|explain|walk me through|walk us through|talk about|"
+    r"share|give me an example|give us an example)\b",
+    re.IGNORECASE
+)
+
+
+def is_question(text: str) -> bool:
+    return "?" in text or bool(QUESTION_OPENERS.search(text))
+
+
+def order_utterances(utterances: List[Dict]) -> List[Dict]:
+    """Sort utterances by timestamp, keeping the stored order when timestamps are missing or mixed"""
+    if not all(u.get("timestamp") is not None for u in utterances):
+        return list(utterances)
+    try:
+        return sorted(utterances, key=lambda u: u["timestamp"])
+    except TypeError:
+        return list(utterances)
+
+
+def group_turns(utterances: List[Dict]) -> List[Dict]:
+    """Merge consecutive utterances from the same speaker into turns"""
+    turns: List[Dict] = []
+    for utterance in order_utterances(utterances):
+        role = utterance.get("role")
+        text = (utterance.get("text") or "").strip()
+        if role not in ("hr", "candidate") or not text:
+            continue
+        if turns and turns[-1]["role"] == role:
+            turns[-1]["parts"].append(text)
+        else:
+            turns.append({"role": role, "parts": [text]})
+    return [{"role": turn["role"], "text": " ".join(turn["parts"])} for turn in turns]
+
+
+def segment_utterances(utterances: List[Dict]) -> List[Dict]:
+    """
+    Split a conversation into ordered segments:
+    - {"type": "pair", "question": ..., "answer": ...} for a clear HR question
+      followed by the candidate's reply
+    - {"type": "ambiguous", "hr": ..., "candidate": ...} for stretches that need
+      the LLM, e.g. HR turns that do not read as a question
+    Consecutive ambiguous stretches are merged into one segment.
+    """
+    segments: List[Dict] = []
+
+    def add_ambiguous(hr_text: str, candidate_text: str):
+        if segments and segments[-1]["type"] == "ambiguous":
+            last = segments[-1]
+            last["hr"] = " ".join(filter(None, [last["hr"], hr_text]))
+            last["candidate"] = " ".join(filter(None, [last["candidate"], candidate_text]))
+        else:
+            segments.append({"type": "ambiguous", "hr": hr_text, "candidate": candidate_text})
+
+    turns = group_turns(utterances)
+    idx = 0
+    while idx < len(turns):
+        turn = turns[idx]
+        if turn["role"] == "candidate":
+            # Candidate speaking before any HR turn: nothing to attach it to
+            add_ambiguous("", turn["text"])
+            idx += 1
+            continue
+
+        answer = ""
+        if idx + 1 < len(turns) and turns[idx + 1]["role"] == "candidate":
+            answer = turns[idx + 1]["text"]
+
+        if is_question(turn["text"]):
+            segments.append({"type": "pair", "question": turn["text"], "answer": answer})
+        else:
+            add_ambiguous(turn["text"], answer)
+        idx += 2 if answer else 1
+
+    return segments
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', text.strip()) if sentence]
+
+
+def _window(sentences: List[str], start: float, end: float) -> str:
+    """Sentences whose position (as a fraction of the transcript) overlaps [start, end)"""
+    total = sum(len(sentence) + 1 for sentence in sentences) or 1
+    selected, offset = [], 0
+    for sentence in sentences:
+        sentence_start = offset / total
+        offset += len(sentence) + 1
+        if sentence_start < end and offset / total > start:
+            selected.append(sentence)
+    return " ".join(selected)
+
+
+def chunk_transcripts(
+    hr_transcript: str, candidate_transcript: str, chunk_tokens: int, overlap_tokens: int
+) -> List[Tuple[str, str]]:
+    """
+    Split the HR and candidate transcripts into overlapping windows of about
+    chunk_tokens combined. Both transcripts advance proportionally, so window k
+    covers the same stretch of the interview on each side.
+    """
+    total = estimate_tokens(hr_transcript) + estimate_tokens(candidate_transcript)
+    if chunk_tokens <= 0 or total <= chunk_tokens:
+        return [(hr_transcript, candidate_transcript)]
+
+    overlap_tokens = min(max(0, overlap_tokens), chunk_tokens // 2)
+    step = chunk_tokens - overlap_tokens
+    count = math.ceil((total - overlap_tokens) / step)
+
+    hr_sentences = split_sentences(hr_transcript)
+    candidate_sentences = split_sentences(candidate_transcript)
+
+    windows = []
+    for k in range(count):
+        start = k * step / total
+        end = 1.0 if k == count - 1 else (k * step + chunk_tokens) / total
+        windows.append((
+            _window(hr_sentences, start, end),
+            _window(candidate_sentences, start, end)
+        ))
+    return windows
+
+
+def merge_window_pairs(window_pairs: List[List[Dict]], lookback: int = 5) -> List[Dict]:
+    """
+    Concatenate per-window pairs in order, dropping duplicates from window overlaps.
+    A pair whose question matches (or is a truncated form of) one of the last few
+    questions from the previous windows is merged into it, keeping the longer
+    question and answer.
+    """
+    merged: List[Dict] = []
+    for pairs in window_pairs:
+        # Only the tail of earlier windows can overlap with this one
+        edge = merged[-lookback:]
+        for pair in pairs:
+            if not isinstance(pair, dict) or not pair.get("question"):
+                continue
+            key = normalize_question(pair["question"])
+            duplicate = None
+            for existing in edge:
+                existing_key = normalize_question(existing["question"])
+                if key == existing_key or (
+                    min(len(key), len(existing_key)) >= 20
+                    and (key.startswith(existing_key) or existing_key.startswith(key))
+                ):
+                    duplicate = existing
+                    break
+
+            if duplicate is None:
+                merged.append({"question": pair["question"], "answer": pair.get("answer", "")})
+                continue
+            if len(pair["question"]) > len(duplicate["question"]):
+                duplicate["question"] = pair["question"]
+            if len(pair.get("answer") or "") > len(duplicate.get("answer") or ""):
+                duplicate["answer"] = pair["answer"]
+    return merged
@@ -0,0 +1,364 @@
+"""
+Question Bank
+Canonical interview questions per role (job description) with their ideal answers.
+Questions are canonicalized (politeness fillers dropped, common phrasings unified),
+fingerprinted with MinHash over character shingles and grouped with LSH banding, so
+wording variants of a question ("Tell me about yourself" / "Can you introduce
+yourself?") reuse one stored ideal answer instead of a new LLM call.
+MinHash only finds candidates: a match also needs (nearly) the same content words, so
+"experience with React" and "experience with Angular" stay separate questions.
+"""
+
+import os
+import re
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pymongo.errors
+from pymongo import ReturnDocument
+from services.answer_cache import normalize_question
+from services.metrics import record_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 4
+
+# Universal hashing (a * x + b) mod p with p = 2^31 - 1; products stay inside int64
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20240501)
+_HASH_A = _rng.randint(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_HASH_B = _rng.randint(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+
+FILLERS = re.compile(
+    r"^(so|ok|okay|alright|right|great|good|thanks|thank you|now|next)\b[ ,]*|"
+    r"\b(can|could|would|will) you( please)?\b|\bplease\b|\bi'?d like (you )?to\b|"
+    r"\b(go ahead and|briefly|quickly|in a few words)\b"
+)
+# Common interviewer phrasings mapped onto one form
+PHRASINGS: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bintroduce yourself\b"), "describe yourself"),
+    (re.compile(r"\btell (me|us)( a (little )?bit| more| something)? about\b"), "describe"),
+    (re.compile(r"\b(walk (me|us) through|talk (me |us )?about|explain)\b"), "describe"),
+    (re.compile(r"\bwhat (is|are|was|were) your\b"), "your"),
+]
+# Words that change between variants without changing the question
+QUESTION_STOPWORDS = frozenset(
+    "a an the do does did is are was were be been would will should can could you your me us i "
+    "we our to of in on for with at by that this it some any".split()
+)
+
+
+def canonicalize_question(question: str) -> str:
+    """Lowercased question text with fillers dropped and common phrasings unified"""
+    text = normalize_question(question)
+    text = FILLERS.sub(" ", text)
+    for pattern, replacement in PHRASINGS:
+        text = pattern.sub(replacement, text)
+    text = re.sub(r"[^\w\s+#]", " ", text)
+    words = []
+    for word in text.split():
+        if word in QUESTION_STOPWORDS:
+            continue
+        # Fold plurals and 3rd person verbs: "maps work" / "map works"
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        words.append(word)
+    return " ".join(words)
+
+
+def shingles(text: str) -> List[str]:
+    if len(text) <= SHINGLE_SIZE:
+        return [text]
+    return [text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)]
+
+
+def minhash(text: str) -> np.ndarray:
+    """MinHash signature of the text's character shingles"""
+    hashes = np.fromiter(
+        (
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") % _PRIME
+            for shingle in set(shingles(text))
+        ),
+        dtype=np.int64
+    )
+    return ((np.outer(hashes, _HASH_A) + _HASH_B) % _PRIME).min(axis=0)
+
+
+def lsh_bands(signature: np.ndarray) -> List[str]:
+    """One key per band of rows; near-duplicates share at least one band with high probability"""
+    return [
+        f"{band}:{hashlib.blake2b(signature[band * LSH_ROWS:(band + 1) * LSH_ROWS].tobytes(), digest_size=8).hexdigest()}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+def signature_similarity(a, b) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def token_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two canonical questions' word sets"""
+    words_a, words_b = set(a.split()), set(b.split())
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def role_key(job_description: str) -> str:
+    """Questions are clustered per job description"""
+    normalized = " ".join(job_description.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:24]
+
+
+class MemoryQuestionStore:
+    """Per-process store, used when MongoDB is not configured"""
+
+    def __init__(self):
+        self._entries: Dict[str, List[Dict]] = {}
+
+    async def candidates(self, role: str, canonical_key: str, bands: List[str]) -> List[Dict]:
+        wanted = set(bands)
+        return [
+            entry for entry in self._entries.get(role, [])
+            if entry["canonicalKey"] == canonical_key or wanted.intersection(entry["lshBands"])
+        ]
+
+    async def insert(self, entry: Dict) -> Dict:
+        entries = self._entries.setdefault(entry["roleKey"], [])
+        for existing in entries:
+            if existing["canonicalKey"] == entry["canonicalKey"]:
+                return existing
+        entry = {**entry, "_id": f"{entry['roleKey']}:{entry['canonicalKey']}"}
+        entries.append(entry)
+        return entry
+
+    async def set_answer(self, entry: Dict, ideal_answer: str, model: str, prompt_version: str):
+        for existing in self._entries.get(entry["roleKey"], []):
+            if existing["_id"] == entry["_id"]:
+                existing.update(idealAnswer=ideal_answer, model=model, promptVersion=prompt_version)
+
+    async def record_variant(self, entry: Dict, question: str):
+        for existing in self._entries.get(entry["roleKey"], []):
+            if existing["_id"] == entry["_id"]:
+                existing["hits"] = existing.get("hits", 0) + 1
+                if question not in existing["variants"]:
+                    existing["variants"].append(question)
+
+
+class MongoQuestionStore:
+    """questionbank collection, indexed on (roleKey, lshBands) and unique (roleKey, canonicalKey)"""
+
+    PROJECTION = {
+        "roleKey": 1, "canonicalKey": 1, "canonicalQuestion": 1, "signature": 1,
+        "lshBands": 1, "idealAnswer": 1, "model": 1, "promptVersion": 1
+    }
+
+    def __init__(self, collection):
+        self.collection = collection
+        self._indexes_ready = False
+
+    async def _ensure_indexes(self):
+        if not self._indexes_ready:
+            # Multikey index: one entry per band key, so an LSH probe is a single indexed query
+            await self.collection.create_index([("roleKey", 1), ("lshBands", 1)])
+            await self.collection.create_index([("roleKey", 1), ("canonicalKey", 1)], unique=True)
+            self._indexes_ready = True
+
+    async def candidates(self, role: str, canonical_key: str, bands: List[str]) -> List[Dict]:
+        await self._ensure_indexes()
+        cursor = self.collection.find(
+            {"roleKey": role, "$or": [{"canonicalKey": canonical_key}, {"lshBands": {"$in": bands}}]},
+            self.PROJECTION
+        ).limit(20)
+        return [entry async for entry in cursor]
+
+    async def insert(self, entry: Dict) -> Dict:
+        await self._ensure_indexes()
+        now = datetime.utcnow()
+        try:
+            # Concurrent inserts of the same question converge on one document
+            return await self.collection.find_one_and_update(
+                {"roleKey": entry["roleKey"], "canonicalKey": entry["canonicalKey"]},
+                {"$setOnInsert": {**entry, "createdAt": now, "updatedAt": now}},
+                upsert=True,
+                projection=self.PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+        except pymongo.errors.DuplicateKeyError:
+            return await self.collection.find_one(
+                {"roleKey": entry["roleKey"], "canonicalKey": entry["canonicalKey"]}, self.PROJECTION
+            )
+
+    async def set_answer(self, entry: Dict, ideal_answer: str, model: str, prompt_version: str):
+        await self.collection.update_one({"_id": entry["_id"]}, {"$set": {
+            "idealAnswer": ideal_answer,
+            "model": model,
+            "promptVersion": prompt_version,
+            "updatedAt": datetime.utcnow()
+        }})
+
+    async def record_variant(self, entry: Dict, question: str):
+        await self.collection.update_one(
+            {"_id": entry["_id"]},
+            {"$addToSet": {"variants": question}, "$inc": {"hits": 1}, "$set": {"lastUsedAt": datetime.utcnow()}}
+        )
+
+
+class QuestionBank:
+    """
+    Lookups go through an in-process LRU of (role, canonical question) first, then one
+    indexed LSH probe against the store. A candidate counts as the same question when
+    its estimated similarity reaches `threshold` and its content words overlap by at
+    least `token_threshold` (1.0 = the same words after canonicalization; one differing
+    word, e.g. a technology name, is enough to keep two questions apart).
+    """
+
+    def __init__(
+        self,
+        store=None,
+        threshold: float = 0.85,
+        token_threshold: float = 1.0,
+        max_entries: int = 2000,
+        enabled: bool = False
+    ):
+        self.store = store if store is not None else MemoryQuestionStore()
+        self.threshold = threshold
+        self.token_threshold = token_threshold
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._recent: "OrderedDict[Tuple[str, str], Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, db=None) -> "QuestionBank":
+        """Build the bank from QUESTION_BANK_* environment variables"""
+        store = None
+        if db is not None and os.getenv("QUESTION_BANK_BACKEND", "mongo") == "mongo":
+            store = MongoQuestionStore(db.questionbank)
+        return cls(
+            store=store,
+            threshold=float(os.getenv("QUESTION_BANK_THRESHOLD", "0.85")),
+            token_threshold=float(os.getenv("QUESTION_BANK_TOKEN_THRESHOLD", "1.0")),
+            max_entries=int(os.getenv("QUESTION_BANK_CACHE_SIZE", "2000")),
+            enabled=os.getenv("QUESTION_BANK_ENABLED", "false").lower() == "true"
+        )
+
+    def use_memory_store(self):
+        """Switch to the per-process store, e.g. when MongoDB is unreachable at startup"""
+        if not isinstance(self.store, MemoryQuestionStore):
+            logger.warning("Question bank using the in-process store: MongoDB is not connected")
+            self.store = MemoryQuestionStore()
+
+    def _remember(self, key: Tuple[str, str], entry: Dict):
+        self._recent[key] = entry
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    async def match(self, question: str, job_description: str) -> Optional[Dict]:
+        """The bank entry for this question (or a near-duplicate) under this JD, if any"""
+        canonical = canonicalize_question(question)
+        if not canonical:
+            return None
+        key = (role_key(job_description), canonical)
+        entry = self._recent.get(key)
+        if entry is not None:
+            self._recent.move_to_end(key)
+            return entry
+
+        signature = minhash(canonical)
+        candidates = await self.store.candidates(key[0], canonical, lsh_bands(signature))
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            if candidate["canonicalKey"] == canonical:
+                similarity = 1.0
+            elif token_similarity(canonical, candidate["canonicalKey"]) < self.token_threshold:
+                continue
+            else:
+                similarity = signature_similarity(signature, candidate["signature"])
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is None or best_similarity < self.threshold:
+            return None
+        self._remember(key, best)
+        if question.strip() != best["canonicalQuestion"]:
+            await self.store.record_variant(best, question)
+        return best
+
+    async def get_ideal_answer(
+        self, question: str, job_description: str, model: str, prompt_version: str
+    ) -> Optional[str]:
+        """Stored ideal answer for the question's cluster, if generated by the same model and prompt"""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        try:
+            entry = await self.match(question, job_description)
+        except Exception as e:
+            logger.warning("Question bank lookup failed: %s", e)
+            entry = None
+        hit = (
+            entry is not None
+            and bool(entry.get("idealAnswer"))
+            and entry.get("model") == model
+            and entry.get("promptVersion") == prompt_version
+        )
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        record_cache_lookup("question_bank", hit)
+        if hit:
+            logger.debug("Question bank hit", extra={
+                "question": question[:50], "canonical": entry["canonicalQuestion"][:50],
+                "ms": round((time.perf_counter() - started) * 1000, 2)
+            })
+            return entry["idealAnswer"]
+        return None
+
+    async def add_ideal_answer(
+        self, question: str, job_description: str, ideal_answer: str, model: str, prompt_version: str
+    ):
+        """Store the answer on the question's cluster, creating the cluster if it is new"""
+        if not self.enabled or not ideal_answer:
+            return
+        try:
+            entry = await self.match(question, job_description)
+            if entry is None:
+                canonical = canonicalize_question(question)
+                if not canonical:
+                    return
+                signature = minhash(canonical)
+                entry = await self.store.insert({
+                    "roleKey": role_key(job_description),
+                    "canonicalKey": canonical,
+                    "canonicalQuestion": question.strip(),
+                    "signature": signature.tolist(),
+                    "lshBands": lsh_bands(signature),
+                    "variants": [],
+                    "hits": 0
+                })
+                self._remember((entry["roleKey"], canonical), entry)
+            await self.store.set_answer(entry, ideal_answer, model, prompt_version)
+            entry.update(idealAnswer=ideal_answer, model=model, promptVersion=prompt_version)
+        except Exception as e:
+            logger.warning("Question bank write failed: %s", e)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.store).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,223 @@
+"""
+Provider Rate Limiting
+Token-bucket limits on requests/min and tokens/min, jittered exponential backoff
+and a circuit breaker. One instance of each per provider, shared by every
+coroutine in the worker process.
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Optional
+from services.workers import server_workers
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """The provider failed repeatedly and is not being called until the reset timeout"""
+
+
+class TokenBucket:
+    """
+    Continuously refilling bucket holding up to per_minute units.
+    A limit of 0 disables the bucket. The level may go negative when actual usage
+    exceeds what was reserved; later callers then wait for the debt to refill.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.level = float(per_minute)
+        self.scale = 1.0
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self, now: float):
+        rate = self.per_minute * self.scale / 60
+        self.level = min(self.per_minute, self.level + (now - self._updated) * rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount units are available"""
+        if not self.enabled:
+            return 0.0
+        self._refill(now)
+        # A single request larger than the whole bucket waits for a full bucket
+        amount = min(amount, self.per_minute)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / (self.per_minute * self.scale)
+
+    def take(self, amount: float):
+        if self.enabled:
+            self.level -= amount
+
+
+class RateLimiter:
+    """
+    Requests/min and tokens/min buckets for one provider.
+    Waiters are served in arrival order. A 429 pauses every caller for the
+    Retry-After period and halves the refill rate, which then recovers
+    gradually on successful calls (additive increase, multiplicative decrease).
+    """
+
+    MIN_SCALE = 0.25
+    RECOVERY_STEP = 0.05
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, name: str) -> "RateLimiter":
+        """
+        Limits from <NAME>_RPM_LIMIT and <NAME>_TPM_LIMIT (0 = no limit). The limits are
+        account-wide, so each server worker process gets an equal share.
+        """
+        prefix = name.upper()
+        workers = server_workers()
+        return cls(
+            name,
+            requests_per_minute=float(os.getenv(f"{prefix}_RPM_LIMIT", "0")) / workers,
+            tokens_per_minute=float(os.getenv(f"{prefix}_TPM_LIMIT", "0")) / workers
+        )
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens fit within the limits, then reserve them"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(tokens, now)
+                )
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(tokens)
+                    return
+                await asyncio.sleep(wait)
+
+    def record_usage(self, reserved: int, actual: int):
+        """Settle the difference between the reserved and actual token count"""
+        self.tokens.take(actual - reserved)
+
+    def on_success(self):
+        for bucket in (self.requests, self.tokens):
+            bucket.scale = min(1.0, bucket.scale + self.RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        now = time.monotonic()
+        self._paused_until = max(self._paused_until, now + (retry_after or 1.0))
+        for bucket in (self.requests, self.tokens):
+            # Refill from the current time at the reduced rate
+            bucket.wait_time(0, now)
+            bucket.scale = max(self.MIN_SCALE, bucket.scale * 0.5)
+        logger.warning("LLM provider rate limited", extra={
+            "provider": self.name, "retryAfter": retry_after, "rateScale": self.requests.scale
+        })
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honoring the server's Retry-After"""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0):
+        self.max_retries = max(0, max_retries)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> "RetryPolicy":
+        return cls(
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+            base_delay=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+            max_delay=float(os.getenv("LLM_BACKOFF_MAX", "30"))
+        )
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retry number `attempt` (0-based)"""
+        if retry_after is not None:
+            # Never retry before the server asked us to; jitter spreads the herd
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and rejects
+    calls for `reset_seconds`; then lets one trial call through (half-open) and
+    closes again if it succeeds. check() hands the trial call a token; only that
+    token can end the trial, so other calls finishing meanwhile cannot start a second one.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial: Optional[object] = None
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        return cls(
+            name,
+            failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURES", "5")),
+            reset_seconds=float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+        )
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    def check(self) -> Optional[object]:
+        """
+        Raise CircuitOpenError unless a call may go through now. Returns the trial
+        token when this call is the half-open trial, None otherwise.
+        """
+        state = self.state
+        if state == "closed":
+            return None
+        if state == "half_open" and self._trial is None:
+            self._trial = object()
+            return self._trial
+        raise CircuitOpenError(f"LLM provider '{self.name}' circuit is open")
+
+    def _owns_trial(self, trial: Optional[object]) -> bool:
+        return trial is not None and trial is self._trial
+
+    def record_success(self, trial: Optional[object] = None):
+        if self._opened_at is not None:
+            logger.info("LLM provider circuit closed", extra={"provider": self.name})
+        self.failures = 0
+        self._opened_at = None
+        self._trial = None
+
+    def record_failure(self, trial: Optional[object] = None):
+        self.failures += 1
+        failed_trial = self._owns_trial(trial)
+        if failed_trial or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning("LLM provider circuit opened", extra={
+                    "provider": self.name, "failures": self.failures
+                })
+            self._opened_at = time.monotonic()
+        if failed_trial:
+            self._trial = None
+
+    def release(self, trial: Optional[object] = None):
+        """End a half-open trial that neither succeeded nor failed transiently (no-op for other calls)"""
+        if self._owns_trial(trial):
+            self._trial = None
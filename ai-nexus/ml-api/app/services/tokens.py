@@ -0,0 +1,8 @@
+"""
+Token estimation helpers
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token)"""
+    return len(text) // 4 + 1
@@ -0,0 +1,157 @@
+"""
+Transcript Parsing
+Single-pass parser for pasted interview transcripts ("HR: ...", "[00:12:03] Candidate: ...").
+Produces ordered turns ({role, speaker, text, timestamp}) that the timestamp pairing
+stage can use directly, and can consume a large transcript incrementally in chunks.
+"""
+
+import os
+import re
+import codecs
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SPEAKER_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "hr": ("HR", "Interviewer", "Recruiter"),
+    "candidate": ("Candidate", "Interviewee", "Student")
+}
+
+# [00:12:03], 00:12:03, [12:03] or (12:03.5) before the speaker label
+TIMESTAMP = r"[\[(]?(?P<timestamp>\d{1,2}:\d{2}(?::\d{2})?(?:\.\d+)?)[\])]?[ \t]*(?:[-–][ \t]*)?"
+
+
+def parse_timestamp(value: str) -> float:
+    """Seconds from "hh:mm:ss", "mm:ss" (optionally with a fraction)"""
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def speaker_aliases_from_env() -> Dict[str, Tuple[str, ...]]:
+    """Default aliases plus TRANSCRIPT_HR_ALIASES / TRANSCRIPT_CANDIDATE_ALIASES (comma-separated)"""
+    aliases = {}
+    for role, defaults in DEFAULT_SPEAKER_ALIASES.items():
+        extra = [name.strip() for name in os.getenv(f"TRANSCRIPT_{role.upper()}_ALIASES", "").split(",")]
+        aliases[role] = defaults + tuple(name for name in extra if name)
+    return aliases
+
+
+class TranscriptParser:
+    """
+    Compiled once per alias set and safe to share; each parse keeps its own state in a
+    TranscriptStream. A speaker label starts a turn at the beginning of a line or after
+    a sentence end on the same line ("HR: Hi. Candidate: Hello."). Lines without a label
+    continue the current turn; text before any label is attributed to the candidate.
+    """
+
+    def __init__(self, speaker_aliases: Optional[Dict[str, Iterable[str]]] = None):
+        aliases = speaker_aliases or DEFAULT_SPEAKER_ALIASES
+        self.roles: Dict[str, str] = {
+            alias.lower(): role for role, names in aliases.items() for alias in names
+        }
+        # Longest first so "HR Manager" wins over "HR"
+        names = sorted(self.roles, key=len, reverse=True)
+        self.label = re.compile(
+            rf"(?:^|(?<=[.!?])[ \t]+)[ \t]*(?:{TIMESTAMP})?"
+            rf"(?P<speaker>{'|'.join(re.escape(name) for name in names)})"
+            r"(?:[ \t]*\([^)\n]{0,40}\))?[ \t]*:[ \t]*",
+            re.IGNORECASE | re.MULTILINE
+        )
+
+    @classmethod
+    def from_env(cls) -> "TranscriptParser":
+        return cls(speaker_aliases_from_env())
+
+    def stream(self) -> "TranscriptStream":
+        return TranscriptStream(self)
+
+    def parse(self, transcript: str) -> List[Dict]:
+        stream = self.stream()
+        return stream.feed(transcript) + stream.close()
+
+    async def parse_chunks(self, chunks: AsyncIterator[str]) -> AsyncIterator[Dict]:
+        """Yield turns as they complete while reading the transcript chunk by chunk"""
+        stream = self.stream()
+        async for chunk in chunks:
+            for turn in stream.feed(chunk):
+                yield turn
+        for turn in stream.close():
+            yield turn
+
+
+class TranscriptStream:
+    """Incremental parse: feed() returns the turns completed by each chunk, close() the rest"""
+
+    def __init__(self, parser: TranscriptParser):
+        self.parser = parser
+        self._pending = ""
+        self._turn: Optional[Dict] = None
+        self._parts: List[str] = []
+
+    def feed(self, chunk: str) -> List[Dict]:
+        completed: List[Dict] = []
+        text = self._pending + chunk
+        end = text.rfind("\n")
+        if end < 0:
+            self._pending = text
+            return completed
+        # Only whole lines are parsed; a label may be split across chunks
+        self._pending = text[end + 1:]
+        self._consume(text[:end], completed)
+        return completed
+
+    def close(self) -> List[Dict]:
+        completed: List[Dict] = []
+        if self._pending:
+            self._consume(self._pending, completed)
+            self._pending = ""
+        self._finish(completed)
+        return completed
+
+    def _consume(self, text: str, completed: List[Dict]):
+        position = 0
+        for match in self.parser.label.finditer(text):
+            self._append(text[position:match.start()])
+            self._finish(completed)
+            timestamp = match.group("timestamp")
+            speaker = match.group("speaker")
+            self._turn = {
+                "role": self.parser.roles[speaker.lower()],
+                "speaker": speaker,
+                "timestamp": parse_timestamp(timestamp) if timestamp else None
+            }
+            position = match.end()
+        self._append(text[position:])
+
+    def _append(self, text: str):
+        text = " ".join(text.split())
+        if text:
+            self._parts.append(text)
+
+    def _finish(self, completed: List[Dict]):
+        if self._parts:
+            turn = self._turn or {"role": "candidate", "speaker": None, "timestamp": None}
+            completed.append({**turn, "text": " ".join(self._parts)})
+        self._parts = []
+        self._turn = None
+
+
+async def upload_text_chunks(file, chunk_size: int = 64 * 1024) -> AsyncIterator[str]:
+    """Decode an uploaded text file chunk by chunk (UTF-8, invalid bytes replaced)"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield decoder.decode(chunk)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def split_roles(turns: Iterable[Dict]) -> Tuple[str, str]:
+    """Flatten turns into (HR transcript, candidate transcript)"""
+    hr_parts, candidate_parts = [], []
+    for turn in turns:
+        (hr_parts if turn["role"] == "hr" else candidate_parts).append(turn["text"])
+    return " ".join(hr_parts), " ".join(candidate_parts)
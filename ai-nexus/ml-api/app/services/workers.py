@@ -0,0 +1,10 @@
+"""
+Server worker count helpers
+"""
+
+import os
+
+
+def server_workers() -> int:
+    """Worker processes serving the API (run.py sets ML_API_WORKERS; uvicorn reads WEB_CONCURRENCY)"""
+    return max(1, int(os.getenv("ML_API_WORKERS") or os.getenv("WEB_CONCURRENCY") or "1"))
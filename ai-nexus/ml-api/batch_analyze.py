@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+AI-NEXUS Batch Analysis
+Re-analyzes many stored interviews in-process (no API server needed), e.g. after a
+rubric or model change. Uses the same MongoDB and LLM settings as the API (.env).
+
+Usage:
+    python batch_analyze.py --ids interview-1 interview-2
+    python batch_analyze.py --ids-file ids.txt --concurrency 8
+    python batch_analyze.py --filter '{"status": "completed"}' --limit 1000 --dry-run
+    python batch_analyze.py --resume <runId>
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent / "app"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-analyze stored interviews in bulk")
+    parser.add_argument("--ids", nargs="+", help="interviewIds to analyze")
+    parser.add_argument("--ids-file", help="File with one interviewId per line")
+    parser.add_argument("--filter", help="Mongo filter on the interviews collection, as JSON")
+    parser.add_argument("--limit", type=int, default=0, help="Analyze at most this many interviews")
+    parser.add_argument("--concurrency", type=int, help="Interviews analyzed at once (ANALYSIS_BATCH_CONCURRENCY)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which interviews would be analyzed")
+    parser.add_argument("--resume", metavar="RUN_ID", help="Continue an interrupted run")
+    return parser.parse_args()
+
+
+async def run(args) -> int:
+    sys.path.insert(0, str(APP_DIR))
+    import main
+    from services.database import connect
+
+    # Same clients and services the API builds per worker, without its background tasks
+    main.create_resources()
+    if main.batch_runner is None or not await connect(main.db):
+        print("[ERROR] MongoDB is not connected")
+        return 1
+    try:
+        return await run_batch(args, main)
+    finally:
+        main.mongo_client.close()
+
+
+async def run_batch(args, main) -> int:
+    runner = main.batch_runner
+    if args.concurrency:
+        runner.concurrency = max(1, args.concurrency)
+
+    interview_ids = list(args.ids or [])
+    if args.ids_file:
+        interview_ids += [line.strip() for line in Path(args.ids_file).read_text().splitlines() if line.strip()]
+    query = json.loads(args.filter) if args.filter else None
+
+    if args.resume:
+        batch = await runner.get(args.resume)
+        if batch is None:
+            print(f"[ERROR] Batch run {args.resume} not found")
+            return 1
+        run_id = batch["_id"]
+        interview_ids = batch.get("interviewIds")
+        query = json.loads(batch["query"]) if batch.get("query") else None
+        args.limit = batch.get("limit", 0)
+    else:
+        run_id = None
+
+    if args.dry_run:
+        print(json.dumps(await runner.plan(interview_ids, query, args.limit, resume_run_id=run_id), indent=2))
+        return 0
+
+    if run_id is None:
+        run_id = (await runner.create(interview_ids, query, args.limit))["_id"]
+    print(f"[INFO] Batch run {run_id} (resume with --resume {run_id})")
+
+    await main.llm_clients.start()
+    try:
+        result = await runner.execute(run_id)
+    finally:
+        await main.llm_clients.close()
+
+    print(json.dumps(result, indent=2))
+    return 1 if result["counts"]["failed"] else 0
+
+
+def main():
+    args = parse_args()
+    if not (args.ids or args.ids_file or args.filter or args.resume):
+        print("[ERROR] Provide --ids, --ids-file, --filter or --resume")
+        sys.exit(2)
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted; resume with --resume <runId>")
+        sys.exit(130)
+    except ValueError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+AI-NEXUS ML API Benchmark
+Drives the FastAPI app in-process against the offline fake LLM provider
+(LLM_PROVIDER=fake) with synthetic interviews, and reports latency percentiles,
+throughput, LLM calls and tokens per request as JSON.
+
+Usage:
+    python benchmarks/run_benchmark.py --output results.json
+    python benchmarks/run_benchmark.py --questions 5 20 --concurrency 1 8 --latency-ms 20
+    python benchmarks/run_benchmark.py --compare baseline.json results.json
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+# App settings copied into each result's config block
+RECORDED_ENV_PREFIXES = (
+    "ANALYSIS_", "BATCH_", "PAIRING_", "IDEAL_ANSWER_", "QUESTION_BANK_", "PRESCORE_", "LLM_"
+)
+
+TOPICS = [
+    "distributed systems", "database indexing", "API design", "caching strategies",
+    "team leadership", "incident response", "testing practices", "cloud cost control",
+    "security reviews", "performance tuning"
+]
+
+
+def configure_environment(args):
+    """Must run before the app is imported: the app reads its config at import time"""
+    os.environ["LLM_PROVIDER"] = "fake"
+    # LLM_TARGETS and LLM_<TASK>_TARGETS take precedence over LLM_PROVIDER: drop them so
+    # every call stays on the fake provider
+    for key in [key for key in os.environ if key.startswith("LLM_") and key.endswith("_TARGETS")]:
+        del os.environ[key]
+    os.environ["FAKE_LLM_LATENCY_MS"] = str(args.latency_ms)
+    os.environ["FAKE_LLM_LATENCY_SIGMA"] = str(args.latency_sigma)
+    os.environ["FAKE_LLM_ERROR_RATE"] = str(args.error_rate)
+    # Pin every shortcut that skips LLM calls so runs stay comparable whatever the shell exports
+    os.environ["IDEAL_ANSWER_CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["QUESTION_BANK_ENABLED"] = "true" if args.question_bank else "false"
+    # MongoDB is never connected here: keep every store in process
+    os.environ["IDEAL_ANSWER_CACHE_BACKEND"] = "memory"
+    os.environ["QUESTION_BANK_BACKEND"] = "memory"
+    os.environ["ANALYSIS_CHECKPOINT_BACKEND"] = "memory"
+    os.environ["PRESCORE_MODE"] = args.prescore
+    sys.path.insert(0, str(APP_DIR))
+
+
+def synthetic_jd(chars: int) -> str:
+    base = (
+        "We are hiring a senior software engineer to build and operate scalable backend services. "
+        "Requirements: Python, FastAPI, MongoDB, cloud infrastructure, observability and mentoring. "
+    )
+    return (base * (chars // len(base) + 1))[:chars]
+
+
+def synthetic_transcript(questions: int) -> str:
+    lines = []
+    for idx in range(questions):
+        topic = TOPICS[idx % len(TOPICS)]
+        lines.append(f"HR: Question {idx + 1}, can you walk me through your experience with {topic}?")
+        lines.append(
+            f"Candidate: I have worked on {topic} for several years. "
+            f"In my last role I owned the {topic} roadmap and measured the results carefully."
+        )
+    return "\n".join(lines)
+
+
+def percentile(values, pct: float) -> float:
+    """Nearest-rank percentile"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True, cwd=APP_DIR
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+async def run_scenario(client, provider, name: str, make_request, total: int, concurrency: int, **labels):
+    """Issue `total` requests with `concurrency` in flight and summarize them"""
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for n in range(total):
+        queue.put_nowait(n)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            n = queue.get_nowait()
+            start = time.perf_counter()
+            response = await make_request(client, n)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    provider.reset_stats()
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    llm = provider.stats()
+
+    result = {
+        "scenario": name,
+        **labels,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50), 2),
+            "p95": round(percentile(latencies, 95), 2),
+            "p99": round(percentile(latencies, 99), 2),
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+        },
+        "throughputRps": round(total / elapsed, 3) if elapsed else 0.0,
+        "llmCallsPerRequest": round(llm["calls"] / total, 2),
+        "promptTokensPerRequest": round(llm["promptTokens"] / total, 1),
+        "completionTokensPerRequest": round(llm["completionTokens"] / total, 1),
+        "llmErrors": llm["errors"]
+    }
+    print(
+        f"  {name:<16} q={labels.get('questions', '-'):<4} jd={labels['jdChars']:<6} c={concurrency:<3} "
+        f"p50={result['latencyMs']['p50']:>9.1f}ms p95={result['latencyMs']['p95']:>9.1f}ms "
+        f"rps={result['throughputRps']:>7.2f} calls/req={result['llmCallsPerRequest']:>6.1f} errors={errors}"
+    )
+    return result
+
+
+async def run_benchmarks(args):
+    import httpx
+    import main
+
+    # ASGITransport does not run the lifespan
+    main.create_resources()
+    await main.llm_clients.start()
+    provider = main.llm_clients.get("fake")
+    results = []
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for jd_chars in args.jd_sizes:
+            jd = synthetic_jd(jd_chars)
+
+            for questions in args.questions:
+                transcript = synthetic_transcript(questions)
+
+                async def analyze_mock(client, n, transcript=transcript, jd=jd):
+                    return await client.post("/api/analyze-mock", data={
+                        "jobDescriptionText": jd,
+                        "mockTranscript": transcript
+                    })
+
+                for concurrency in args.concurrency:
+                    results.append(await run_scenario(
+                        client, provider, "analyze-mock", analyze_mock,
+                        args.requests, concurrency, questions=questions, jdChars=jd_chars
+                    ))
+
+            async def ideal_answer(client, n, jd=jd):
+                return await client.post("/api/generate-ideal-answer", json={
+                    "question": f"Question {n}: how do you approach {TOPICS[n % len(TOPICS)]}?",
+                    "jobDescription": jd
+                })
+
+            async def score_answer(client, n, jd=jd):
+                return await client.post("/api/score-answer-realtime", data={
+                    "question": f"How do you approach {TOPICS[n % len(TOPICS)]}?",
+                    "candidateAnswer": "I start from the requirements and measure the results.",
+                    "idealAnswer": "A strong answer covers requirements, trade offs and measurable outcomes.",
+                    "jobDescription": jd
+                })
+
+            for concurrency in args.concurrency:
+                realtime_requests = args.requests * 4
+                results.append(await run_scenario(
+                    client, provider, "ideal-answer", ideal_answer,
+                    realtime_requests, concurrency, jdChars=jd_chars
+                ))
+                results.append(await run_scenario(
+                    client, provider, "score-realtime", score_answer,
+                    realtime_requests, concurrency, jdChars=jd_chars
+                ))
+
+    await main.close_resources()
+    return results
+
+
+def scenario_key(result) -> tuple:
+    return (result["scenario"], result.get("questions"), result["jdChars"], result["concurrency"])
+
+
+def compare(baseline_path: str, current_path: str, threshold: float) -> int:
+    """Print per-scenario deltas; returns the number of regressions above threshold (%)"""
+    baseline = {scenario_key(r): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    current = json.loads(Path(current_path).read_text())["results"]
+
+    regressions = 0
+    for result in current:
+        before = baseline.get(scenario_key(result))
+        if before is None:
+            continue
+        p95_delta = _pct_change(before["latencyMs"]["p95"], result["latencyMs"]["p95"])
+        rps_delta = _pct_change(before["throughputRps"], result["throughputRps"])
+        regressed = p95_delta > threshold or rps_delta < -threshold
+        regressions += regressed
+        label = "/".join(str(part) for part in scenario_key(result) if part is not None)
+        print(f"  {'[REGRESSION]' if regressed else '[OK]':<13} {label:<40} "
+              f"p95 {p95_delta:+7.1f}%  throughput {rps_delta:+7.1f}%")
+    return regressions
+
+
+def _pct_change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI-NEXUS ML API against a fake LLM")
+    parser.add_argument("--questions", type=int, nargs="+", default=[5, 20, 100])
+    parser.add_argument("--jd-sizes", type=int, nargs="+", default=[1000, 8000], help="JD length in characters")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=8, help="Reports per analyze-mock scenario")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Median fake LLM latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Lognormal latency spread")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake LLM calls that fail")
+    parser.add_argument("--cache", action="store_true", help="Keep the ideal answer cache enabled")
+    parser.add_argument("--question-bank", action="store_true", help="Enable the question bank")
+    parser.add_argument("--prescore", choices=["off", "hybrid", "offline"], default="off",
+                        help="Local pre-scoring mode (PRESCORE_MODE)")
+    parser.add_argument("--output", help="Write machine-readable results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                        help="Compare two result files instead of running")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+
+    if args.compare:
+        print("=" * 50)
+        print("  Benchmark comparison")
+        print("=" * 50)
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    configure_environment(args)
+
+    print("=" * 50)
+    print("  AI-NEXUS ML API Benchmark (fake LLM)")
+    print("=" * 50)
+    results = asyncio.run(run_benchmarks(args))
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "questions": args.questions,
+            "jdSizes": args.jd_sizes,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "latencyMs": args.latency_ms,
+            "latencySigma": args.latency_sigma,
+            "errorRate": args.error_rate,
+            "cache": args.cache,
+            "questionBank": args.question_bank,
+            "prescore": args.prescore,
+            "env": {
+                key: value for key, value in os.environ.items()
+                if key.startswith(RECORDED_ENV_PREFIXES)
+            }
+        },
+        "results": results
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"\n[OK] Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,17 +2,23 @@
 """
 AI-NEXUS ML API Runner
 Simple Python script to run the ML API server
+
+    python run.py                  # development: one process with auto-reload
+    python run.py --production     # one worker per CPU, no reload, graceful shutdown
 """
 
 import os
 import sys
+import shutil
+import argparse
+import tempfile
 import subprocess
 from pathlib import Path
 
 def check_python_version():
-    """Check if Python version is 3.8+"""
-    if sys.version_info < (3, 8):
-        print("[ERROR] Python 3.8+ is required")
+    """Check if Python version is 3.9+ (asyncio.to_thread, numpy 1.26)"""
+    if sys.version_info < (3, 9):
+        print("[ERROR] Python 3.9+ is required")
         print(f"Current version: {sys.version}")
         sys.exit(1)
     print(f"[OK] Python {sys.version.split()[0]}")
@@ -44,13 +50,44 @@ def install_dependencies(python_exe):
     subprocess.run([str(python_exe), "-m", "pip", "install", "-r", "requirements.txt"], check=True)
     print("[OK] Dependencies installed")
 
-def run_server(python_exe):
+def cpu_count():
+    """CPUs this process may run on (respects container CPU affinity)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def server_options(args):
+    """uvicorn options for the selected mode"""
+    options = ["--host", args.host, "--port", str(args.port)]
+    if not args.production:
+        return options + ["--reload"]
+    
+    # Each worker is a separate process with its own Mongo client, LLM clients, caches
+    # and analysis job workers, created by the app's lifespan
+    workers = args.workers or int(os.getenv("WEB_CONCURRENCY", "0")) or cpu_count()
+    return options + [
+        "--workers", str(workers),
+        # Idle keep-alive connections are closed after this many seconds; keep it above
+        # the backend's / load balancer's idle timeout to avoid reset connections
+        "--timeout-keep-alive", os.getenv("ML_API_KEEPALIVE_TIMEOUT", "30"),
+        # Per worker: requests beyond this get 503 instead of queueing without bound
+        "--limit-concurrency", os.getenv("ML_API_LIMIT_CONCURRENCY", "200"),
+        "--backlog", os.getenv("ML_API_BACKLOG", "2048"),
+        # On shutdown, in-flight requests get this long; running analyses then get
+        # ANALYSIS_DRAIN_SECONDS and anything unfinished is resumed on the next start
+        "--timeout-graceful-shutdown", os.getenv("ML_API_GRACEFUL_TIMEOUT", "30")
+    ]
+
+def run_server(python_exe, args):
     """Run the FastAPI server"""
+    options = server_options(args)
     print("[3/3] Starting ML API server...")
     print("=" * 50)
-    print("  URL: http://localhost:8000")
-    print("  Docs: http://localhost:8000/docs")
-    print("  Health: http://localhost:8000/api/health")
+    print(f"  URL: http://localhost:{args.port}")
+    print(f"  Docs: http://localhost:{args.port}/docs")
+    print(f"  Health: http://localhost:{args.port}/api/health")
+    if args.production:
+        print(f"  Mode: production ({options[options.index('--workers') + 1]} workers)")
     print("=" * 50)
     print("\nPress Ctrl+C to stop the server\n")
     
@@ -61,17 +98,40 @@ def run_server(python_exe):
     app_dir = Path("app").resolve()
     os.chdir(app_dir)
     
+    # The app splits per-process limits (LLM rate limits) by the worker count
+    env = dict(os.environ)
+    if args.production:
+        env["ML_API_WORKERS"] = options[options.index("--workers") + 1]
+        # Workers write Prometheus samples to a shared directory so /metrics covers all of
+        # them; it must start empty, or counters from the previous run are added in
+        metrics_dir = Path(
+            env.get("PROMETHEUS_MULTIPROC_DIR") or Path(tempfile.gettempdir()) / "ai-nexus-ml-api-metrics"
+        )
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        metrics_dir.mkdir(parents=True)
+        env["PROMETHEUS_MULTIPROC_DIR"] = str(metrics_dir)
+    
     # Use absolute path for Python executable
     subprocess.run([
         str(python_exe), "-m", "uvicorn",
         "main:app",
-        "--reload",
-        "--host", "0.0.0.0",
-        "--port", "8000"
-    ], check=False)  # Don't raise on exit, let user handle Ctrl+C
+        *options
+    ], check=False, env=env)  # Don't raise on exit, let user handle Ctrl+C
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the AI-NEXUS ML API server")
+    parser.add_argument("--production", action="store_true",
+                        help="Multi-worker server without auto-reload (also ML_API_ENV=production)")
+    parser.add_argument("--workers", type=int, help="Worker processes in production mode (default: CPU count)")
+    parser.add_argument("--host", default=os.getenv("ML_API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ML_API_PORT", "8000")))
+    args = parser.parse_args()
+    args.production = args.production or os.getenv("ML_API_ENV", "").lower() == "production"
+    return args
 
 def main():
     """Main function"""
+    args = parse_args()
     print("=" * 50)
     print("  AI-NEXUS ML API Server")
     print("=" * 50)
@@ -85,7 +145,7 @@ def main():
         check_python_version()
         python_exe = setup_venv()
         install_dependencies(python_exe)
-        run_server(python_exe)
+        run_server(python_exe, args)
     except subprocess.CalledProcessError as e:
         print(f"\n[ERROR] Command failed: {e}")
         sys.exit(1)
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.completion_consumer import CONSUMER_ID, CompletedInterviewConsumer
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_consumer(db):
+    queued = []
+
+    async def enqueue(interview_id):
+        queued.append(interview_id)
+        return {"interviewId": interview_id}
+
+    return CompletedInterviewConsumer(db, enqueue, mode="poll"), queued
+
+
+async def poll_twice(db, consumer):
+    await consumer._acquire_lease()
+    await db.analysisconsumers.update_one(
+        {"_id": CONSUMER_ID}, {"$set": {"polledUntil": datetime.utcnow() - timedelta(minutes=5)}}
+    )
+    await consumer._poll()
+    await consumer._poll()
+
+
+def test_failed_job_is_not_requeued_by_later_polls():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        completed_at = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=10)
+        await db.interviews.insert_one({"interviewId": "iv-1", "status": "completed", "completedAt": completed_at})
+        await db.analysisjobs.insert_one({
+            "_id": "job-1", "interviewId": "iv-1", "status": "failed", "active": False,
+            "createdAt": completed_at + timedelta(seconds=1)
+        })
+        consumer, queued = make_consumer(db)
+        await poll_twice(db, consumer)
+        return queued
+
+    assert asyncio.run(scenario()) == []
+
+
+def test_completion_is_queued_once_across_overlapping_polls():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        completed_at = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=10)
+        await db.interviews.insert_one({"interviewId": "iv-2", "status": "completed", "completedAt": completed_at})
+        consumer, queued = make_consumer(db)
+        await poll_twice(db, consumer)
+        state = await db.analysisconsumers.find_one({"_id": CONSUMER_ID})
+        return queued, state["polledUntil"]
+
+    queued, polled_until = asyncio.run(scenario())
+    assert queued == ["iv-2"]
+    assert polled_until is not None
+
+
+def test_job_failed_before_a_new_completion_is_requeued():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["test"]
+        completed_at = datetime.utcnow().replace(microsecond=0) - timedelta(seconds=10)
+        await db.interviews.insert_one({"interviewId": "iv-3", "status": "completed", "completedAt": completed_at})
+        await db.analysisjobs.insert_one({
+            "_id": "job-3", "interviewId": "iv-3", "status": "failed", "active": False,
+            "createdAt": completed_at - timedelta(hours=1)
+        })
+        consumer, queued = make_consumer(db)
+        await poll_twice(db, consumer)
+        return queued
+
+    assert asyncio.run(scenario()) == ["iv-3"]
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from services.fake_llm import FakeProvider, FakeLLMError
+from services.rate_limit import CircuitBreaker, CircuitOpenError
+
+
+def opened_breaker(reset_seconds: float = 60.0) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=reset_seconds)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = opened_breaker()
+    breaker.reset_seconds = 0.0
+    assert breaker.state == "half_open"
+    return breaker
+
+
+def test_opens_after_consecutive_failures_and_rejects_calls():
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=60.0)
+    assert breaker.check() is None
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_half_open_admits_a_single_trial():
+    breaker = half_open_breaker()
+    trial = breaker.check()
+    assert trial is not None
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+
+
+def test_trial_success_closes_the_circuit():
+    breaker = half_open_breaker()
+    breaker.record_success(breaker.check())
+    assert breaker.state == "closed"
+    assert breaker.check() is None
+
+
+def test_trial_failure_reopens_the_circuit():
+    breaker = half_open_breaker()
+    trial = breaker.check()
+    breaker.reset_seconds = 60.0
+    breaker.record_failure(trial)
+    assert breaker.state == "open"
+    breaker.reset_seconds = 0.0
+    assert breaker.check() is not None
+
+
+def test_released_trial_lets_the_next_call_through():
+    breaker = half_open_breaker()
+    breaker.release(breaker.check())
+    assert breaker.check() is not None
+
+
+def test_other_calls_cannot_end_the_trial():
+    breaker = half_open_breaker()
+    trial = breaker.check()
+    # Calls admitted before the circuit opened finish while the trial is running
+    breaker.release(None)
+    breaker.release(object())
+    breaker.record_failure(None)
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.release(trial)
+    assert breaker.check() is not None
+
+
+def test_cancelled_non_trial_call_keeps_the_trial_in_flight():
+    async def scenario():
+        provider = FakeProvider(latency_ms=200, latency_sigma=0)
+        provider.breaker = CircuitBreaker("fake", failure_threshold=1, reset_seconds=60.0)
+        earlier = asyncio.create_task(provider.complete("earlier call"))
+        await asyncio.sleep(0.01)
+
+        provider.breaker.record_failure()
+        provider.breaker.reset_seconds = 0.0
+        trial = asyncio.create_task(provider.complete("trial call"))
+        await asyncio.sleep(0.01)
+
+        earlier.cancel()
+        await asyncio.gather(earlier, return_exceptions=True)
+        with pytest.raises(CircuitOpenError):
+            provider.breaker.check()
+
+        await trial
+        return provider.breaker.state
+
+    assert asyncio.run(scenario()) == "closed"
+
+
+def test_failed_trial_call_reopens_the_circuit():
+    async def scenario():
+        provider = FakeProvider(latency_ms=0, error_rate=1.0)
+        provider.retry.max_retries = 0
+        provider.breaker = half_open_breaker()
+        provider.breaker.reset_seconds = 60.0
+        provider.breaker._opened_at -= 120
+        with pytest.raises(FakeLLMError):
+            await provider.complete("trial call")
+        return provider.breaker.state
+
+    assert asyncio.run(scenario()) == "open"